@@ -1,6 +1,23 @@
-from locust import HttpUser, task, between
+import os
+import random
+import sys
 from uuid import uuid4
 
+from locust import HttpUser, task, between
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "trips"))
+from src.datasets import DatasetGenerator, PROFILES  # noqa: E402
+
+# Same profile as the seeded database (python -m src.datasets --profile ...), so
+# queries and new documents follow its destination popularity and time distributions
+DATASET = DatasetGenerator(PROFILES[os.getenv("DATASET_PROFILE", "small")])
+
+
+def api_payload(doc: dict, fields: list) -> dict:
+    """JSON body of a generated document for the create endpoints."""
+    return {f: v.isoformat() if hasattr(v, "isoformat") else v for f, v in doc.items() if f in fields and v is not None}
+
+
 class ViewerUser(HttpUser):
     # Wait between 1 and 3 seconds between tasks (simulates real human behavior)
     wait_time = between(1, 3)
@@ -8,42 +25,44 @@ class ViewerUser(HttpUser):
     @task(1)
     def view_trips(self):
         """Simulates a user loading the main page (GET request)"""
+        destination = DATASET.sample_destination(random)[0]
         self.client.get("/trips")
-        self.client.get("/trips/requests")
+        self.client.get("/trips", params={"destination": destination}, name="/trips?destination")
+        self.client.get("/trips/requests", params={"destination": destination}, name="/trips/requests?destination")
 
 class CreatorUser(HttpUser):
     wait_time = between(5, 10)
-    
+
+    def on_start(self):
+        # Each user draws its own endless stream of upcoming, profile-shaped documents
+        profile = DATASET.profile.model_copy(
+            update={"seed": random.getrandbits(32), "past_share": 0.0, "trips": 10**9, "requests": 10**9}
+        )
+        generator = DatasetGenerator(profile, DATASET.anchor)
+        self.trips = generator.trips()
+        self.trip_requests = generator.trip_requests()
+
     @task(2)
     def create_trip(self):
         """Simulates a user creating a trip (POST request)"""
         # Sending random data to avoid "duplicate" errors if your backend checks
-        payload = {
-            "capacity": 1,
-            "cost_per_passenger": 0,
-            "destination": "test",
-            "driver_car": "test",
-            "driver_id": str(uuid4()),
-            "pickup_location": "test",
-            "return_datetime": "2026-01-11T16:00:21.335Z",
-            "start_datetime": "2026-01-10T16:00:21.335Z"
-            }
+        payload = api_payload(next(self.trips), [
+            "capacity", "cost_per_passenger", "destination", "driver_car", "driver_id",
+            "pickup_location", "start_datetime", "return_datetime", "pickup_lat", "pickup_lon",
+        ])
         
         # Note: We assume your backend route is /trips/requests based on previous chats
         # Adjust the URL string if your route is different
-        self.client.post("/trips", json=payload)
+        self.client.post("/trips", json=payload, headers={"Idempotency-Key": str(uuid4())})
 
     @task(1)
     def create_trip_request(self):
         """Simulates a user creating a trip (POST request)"""
         # Sending random data to avoid "duplicate" errors if your backend checks
-        payload = {
-            "destination": "test",
-            "earliest_start_date": "2026-01-10T16:31:20.768Z",
-            "latest_start_date": "2026-01-11T16:31:20.768Z",
-            "passenger_id": str(uuid4())
-        }
+        payload = api_payload(next(self.trip_requests), [
+            "destination", "earliest_start_date", "latest_start_date", "passenger_id", "pickup_lat", "pickup_lon",
+        ])
         
         # Note: We assume your backend route is /trips/requests based on previous chats
         # Adjust the URL string if your route is different
-        self.client.post("/trips/requests", json=payload)
\ No newline at end of file
+        self.client.post("/trips/requests", json=payload, headers={"Idempotency-Key": str(uuid4())})
\ No newline at end of file
@@ -0,0 +1,74 @@
+"""Benchmark the per-request cost of turning a POST /trips payload into a storage dict.
+
+Compares the previous pipeline (validate the body, rebuild and validate a Trip,
+re-validate it in the manager, dump it) against the current one (validate the
+body once, then construct the Trip and storage dict directly). No database needed:
+
+    PYTHONPATH=. python benchmarks/bench_create_validation.py
+"""
+import argparse
+import timeit
+
+from src.api_models import TripBody, TripRequestBody
+from src.bll_models import Trip, TripRequest
+
+TRIP_PAYLOAD = {
+    "driver_id": "driver123",
+    "driver_car": "Tesla Model 3",
+    "capacity": 3,
+    "destination": "Lake Tahoe",
+    "pickup_location": "San Francisco",
+    "start_datetime": "2026-06-01T10:00:00Z",
+    "return_datetime": "2026-06-01T18:00:00Z",
+    "cost_per_passenger": 25.0,
+    "pickup_lat": 37.77,
+    "pickup_lon": -122.42,
+}
+
+REQUEST_PAYLOAD = {
+    "passenger_id": "pass123",
+    "destination": "Disneyland",
+    "earliest_start_date": "2026-06-01T10:00:00Z",
+    "latest_start_date": "2026-06-02T10:00:00Z",
+}
+
+
+def trip_before():
+    body = TripBody.model_validate(TRIP_PAYLOAD)
+    trip = Trip(**body.model_dump())
+    trip.validate()
+    return trip.model_dump()
+
+
+def trip_after():
+    body = TripBody.model_validate(TRIP_PAYLOAD)
+    return Trip.from_body(body).to_dict()
+
+
+def request_before():
+    body = TripRequestBody.model_validate(REQUEST_PAYLOAD)
+    return TripRequest(**body.model_dump()).model_dump()
+
+
+def request_after():
+    body = TripRequestBody.model_validate(REQUEST_PAYLOAD)
+    return TripRequest.from_body(body).to_dict()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    for name, before, after in [
+        ("POST /trips", trip_before, trip_after),
+        ("POST /trips/requests", request_before, request_after),
+    ]:
+        before_us = min(timeit.repeat(before, number=args.number, repeat=5)) / args.number * 1e6
+        after_us = min(timeit.repeat(after, number=args.number, repeat=5)) / args.number * 1e6
+        print(f"{name:22} before {before_us:6.1f} us  after {after_us:6.1f} us  "
+              f"saved {before_us - after_us:5.1f} us/request ({1 - after_us / before_us:.0%})")
+
+
+if __name__ == "__main__":
+    main()
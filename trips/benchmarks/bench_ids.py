@@ -0,0 +1,73 @@
+"""Benchmark insert throughput and id index size of uuid4 vs UUIDv7 ids.
+
+Inserts the same trips twice, once with random uuid4 ids and once with
+time-ordered ids from src.ids, each into a collection with the unique id
+index. Random ids touch random index pages, so once the index outgrows the
+cache inserts slow down; the effect shows at millions of documents. Requires
+MongoDB:
+
+    PYTHONPATH=. python benchmarks/bench_ids.py --documents 10000000
+"""
+import argparse
+import time
+import uuid
+from datetime import datetime, timedelta, UTC
+
+from src.db import get_database
+from src.ids import new_id
+
+
+def make_trip(trip_id: str, i: int) -> dict:
+    """Build a stored trip document."""
+    start = datetime(2026, 1, 1, tzinfo=UTC) + timedelta(minutes=i)
+    return {
+        "trip_id": trip_id,
+        "driver_id": f"bench-driver-{i % 1000}",
+        "driver_car": "Benchmark",
+        "capacity": 4,
+        "destination": f"Destination {i % 50}",
+        "pickup_location": "Benchmark",
+        "start_datetime": start,
+        "return_datetime": start + timedelta(hours=3),
+        "cost_per_passenger": 10.0,
+        "passengers": [],
+    }
+
+
+def run(db, name: str, mint, documents: int, batch_size: int) -> None:
+    """Insert `documents` trips with ids from `mint` and report throughput and index size."""
+    collection = db.get_collection(name)
+    collection.drop()
+    collection.create_index("trip_id", unique=True)
+
+    start = time.perf_counter()
+    slowest_batch = 0.0
+    for offset in range(0, documents, batch_size):
+        batch = [make_trip(mint(), i) for i in range(offset, min(offset + batch_size, documents))]
+        batch_start = time.perf_counter()
+        collection.insert_many(batch, ordered=False)
+        slowest_batch = max(slowest_batch, time.perf_counter() - batch_start)
+    elapsed = time.perf_counter() - start
+
+    stats = db.command("collStats", name)
+    index_mb = stats["indexSizes"]["trip_id_1"] / 1024 / 1024
+    print(
+        f"{name:16s} {documents / elapsed:9.0f} inserts/s  slowest batch {slowest_batch * 1000:7.1f} ms  "
+        f"trip_id index {index_mb:8.1f} MiB"
+    )
+    collection.drop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=1_000_000)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    db = get_database()
+    run(db, "bench_ids_uuid4", lambda: str(uuid.uuid4()), args.documents, args.batch_size)
+    run(db, "bench_ids_uuid7", new_id, args.documents, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
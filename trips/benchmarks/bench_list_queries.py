@@ -0,0 +1,73 @@
+"""Benchmark list query latency against a seeded dataset profile.
+
+Queries follow the profile's destination popularity, so popular destinations
+return large result sets as in production. The profile is loaded into
+`bench_`-prefixed collections unless it already is there. Requires MongoDB:
+
+    PYTHONPATH=. python benchmarks/bench_list_queries.py --profile small
+"""
+import argparse
+import random
+import statistics
+import time
+
+from src.datasets import DatasetGenerator, PROFILES, current_dataset, seed
+from src.db import get_database
+from src.trip_manager import TripManager
+from src.trip_request_manager import TripRequestManager
+
+
+PREFIX = "bench_"
+
+
+def timed(fn, runs: int) -> list:
+    """Run `fn` `runs` times; returns the latencies in milliseconds."""
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def report(name: str, latencies: list) -> None:
+    """Print p50/p95/p99 of a latency sample."""
+    q = statistics.quantiles(latencies, n=100)
+    print(f"{name:32s} p50 {q[49]:7.2f} ms  p95 {q[94]:7.2f} ms  p99 {q[98]:7.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="small")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--reseed", action="store_true", help="Reload the profile even if it is loaded.")
+    args = parser.parse_args()
+
+    db = get_database()
+    loaded = current_dataset(db, PREFIX)
+    if args.reseed or not loaded or loaded["profile"]["name"] != args.profile:
+        print(f"seeding profile {args.profile} ...")
+        loaded = seed(db, PROFILES[args.profile], prefix=PREFIX)
+    print(f"dataset {args.profile}: {loaded['counts']}")
+
+    generator = DatasetGenerator(PROFILES[args.profile], loaded["anchor"])
+    trips = TripManager(db_collection=db.get_collection(PREFIX + "trips"))
+    requests = TripRequestManager(db_collection=db.get_collection(PREFIX + "trip_requests"))
+    rng = random.Random(0)
+
+    report("GET /trips", timed(lambda: trips.get_all_trips(limit=args.page_size), args.queries))
+    report("GET /trips?destination", timed(
+        lambda: trips.get_all_trips(destination=generator.sample_destination(rng)[0], limit=args.page_size),
+        args.queries,
+    ))
+    report("GET /trips/requests?destination", timed(
+        lambda: requests.get_all_trip_requests(
+            destination_exact=generator.sample_destination(rng)[0], limit=args.page_size
+        ),
+        args.queries,
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Benchmark notification fan-out for new trips against a large set of pending requests.
+
+Loads `--requests` pending requests into the inverted index (1M by default),
+then creates trips and reports fan-out latency and matches per trip.
+Requires a running MongoDB, e.g. the one from docker-compose:
+
+    MONGO_URI=mongodb://localhost:27017/trips_db PYTHONPATH=. python benchmarks/bench_notifications.py
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, UTC
+
+from src.bll_models import TripRequest
+from src.db import get_database
+from src.notification_manager import NotificationManager
+
+
+def make_request(i: int, rng: random.Random, destinations: int, days: int) -> TripRequest:
+    """Build a pending request with a 1-3 day start window."""
+    start = datetime(2030, 1, 1, tzinfo=UTC) + timedelta(days=rng.randrange(days), hours=rng.randrange(24))
+    return TripRequest(
+        request_id=f"bench-request-{i}",
+        passenger_id=f"bench-passenger-{i}",
+        destination=f"Destination {rng.randrange(destinations)}",
+        earliest_start_date=start,
+        latest_start_date=start + timedelta(days=rng.randint(1, 3)),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=1_000_000)
+    parser.add_argument("--trips", type=int, default=200)
+    parser.add_argument("--destinations", type=int, default=500)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    db = get_database()
+    inbox = db.get_collection("bench_notifications")
+    index = db.get_collection("bench_trip_request_index")
+    inbox.drop()
+    index.drop()
+    manager = NotificationManager(db_collection=inbox, index_collection=index)
+    rng = random.Random(args.seed)
+
+    start = time.perf_counter()
+    postings, batch = 0, []
+    for i in range(args.requests):
+        batch.extend(manager.postings(make_request(i, rng, args.destinations, args.days)))
+        if len(batch) >= 10000 or i == args.requests - 1:
+            index.insert_many(batch, ordered=False)
+            postings += len(batch)
+            batch = []
+    print(f"indexed {args.requests} requests as {postings} postings in {time.perf_counter() - start:.1f}s")
+
+    latencies, matches = [], []
+    for i in range(args.trips):
+        trip = {
+            "trip_id": f"bench-trip-{i}",
+            "driver_id": f"bench-driver-{i}",
+            "destination": f"destination {rng.randrange(args.destinations)}",
+            "start_datetime": datetime(2030, 1, 1) + timedelta(days=rng.randrange(args.days), hours=12),
+        }
+        started = time.perf_counter()
+        matches.append(manager.fan_out(trip))
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    latencies.sort()
+    print(f"fan-out latency ms: p50 {statistics.median(latencies):.2f}  "
+          f"p99 {latencies[int(len(latencies) * 0.99) - 1]:.2f}  max {latencies[-1]:.2f}")
+    print(f"matches per trip:   mean {statistics.mean(matches):.1f}  max {max(matches)}")
+
+    inbox.drop()
+    index.drop()
+
+
+if __name__ == "__main__":
+    main()
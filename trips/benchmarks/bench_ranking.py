@@ -0,0 +1,65 @@
+"""Benchmark scoring candidate trips per object in Python vs in a batch with NumPy.
+
+Scores the same generated candidates (see src.datasets) against one trip
+request with both scorers of src.ranking, checks that they agree and reports
+the best time of several runs. The NumPy time is split into extracting the
+fields from the documents, which stays a Python loop, and the array scoring
+itself. Needs NumPy but no MongoDB:
+
+    PYTHONPATH=. python benchmarks/bench_ranking.py --candidates 100000
+"""
+import argparse
+import sys
+import time
+
+from src.bll_models import TripRequest
+from src.datasets import DatasetProfile, DatasetGenerator
+from src.ranking import np, candidate_columns, rank_trips, score_columns, score_numpy, score_python
+
+
+def best_time(fn, repeats: int) -> float:
+    """Fastest of `repeats` calls of `fn`, in seconds."""
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--candidates", type=int, default=100_000)
+    parser.add_argument("--destinations", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    if np is None:
+        sys.exit("NumPy is not installed; pip install numpy")
+
+    profile = DatasetProfile(name="bench-ranking", trips=args.candidates, requests=1,
+                             destinations=args.destinations)
+    generator = DatasetGenerator(profile)
+    candidates = list(generator.trips())
+    trip_request = TripRequest.from_db(next(generator.trip_requests()))
+
+    python_scores = score_python(trip_request, candidates)
+    numpy_scores = score_numpy(trip_request, candidates)
+    assert np.allclose(python_scores, numpy_scores), "scorers disagree"
+
+    python_time = best_time(lambda: score_python(trip_request, candidates), args.repeats)
+    numpy_time = best_time(lambda: score_numpy(trip_request, candidates), args.repeats)
+    extract_time = best_time(lambda: candidate_columns(candidates), args.repeats)
+    columns = candidate_columns(candidates)
+    columns_time = best_time(lambda: score_columns(trip_request, columns), args.repeats)
+    rank_time = best_time(lambda: rank_trips(trip_request, candidates, k=args.k), args.repeats)
+    print(f"{len(candidates)} candidates, {args.destinations} destinations")
+    print(f"python loop     {python_time * 1000:9.1f} ms")
+    print(f"numpy batch     {numpy_time * 1000:9.1f} ms  ({python_time / numpy_time:.1f}x)")
+    print(f"  extract       {extract_time * 1000:9.1f} ms")
+    print(f"  score arrays  {columns_time * 1000:9.1f} ms  ({python_time / columns_time:.1f}x)")
+    print(f"rank top-{args.k:<3d}    {rank_time * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Benchmark primary load of list queries with and without read routing to secondaries.
+
+Runs the same mix of GET /trips-style list queries, writes and causally
+consistent read-backs, first with all reads on the primary, then with
+`secondaryPreferred`, and compares the query/command counters of the primary. Requires the replica set
+from docker-compose.replica.yml:
+
+    docker compose -f docker-compose.replica.yml run --rm trips-microservice \\
+        python benchmarks/bench_read_routing.py
+"""
+import argparse
+import time
+from datetime import datetime, timedelta, UTC
+
+from src.bll_models import Trip
+from src.db import get_database
+from src.read_routing import encode_causal_token, decode_causal_token, read_preference
+from src.trip_manager import TripManager
+
+
+def primary_ops(client) -> int:
+    """Sum of query, getmore and command counters on the primary."""
+    counters = client.admin.command("serverStatus")["opcounters"]
+    return counters["query"] + counters["getmore"] + counters["command"]
+
+
+def make_trip(i: int) -> Trip:
+    """Build a valid upcoming trip."""
+    start = datetime.now(UTC) + timedelta(days=1 + i % 30)
+    return Trip(
+        driver_id=f"bench-driver-{i % 100}",
+        driver_car="Benchmark",
+        capacity=4,
+        destination=f"Destination {i % 20}",
+        pickup_location="Benchmark",
+        start_datetime=start,
+        return_datetime=start + timedelta(hours=3),
+        cost_per_passenger=10.0,
+    )
+
+
+def read_back(manager: TripManager, client, trip_id: str, token: str) -> None:
+    """Read a trip in a session advanced to `token`, as GET /trips/<id> does with X-Causal-Token."""
+    times = decode_causal_token(token)
+    with client.start_session(causal_consistency=True) as session:
+        session.advance_cluster_time(times["clusterTime"])
+        session.advance_operation_time(times["operationTime"])
+        # Must see its own write even if a secondary answers
+        assert manager.get_trip_by_id(trip_id, session=session) is not None
+
+
+def run(manager: TripManager, client, reads: int) -> tuple:
+    """Run `reads` list queries plus a write and read-back every 10 reads; returns (primary ops, seconds)."""
+    before = primary_ops(client)
+    start = time.perf_counter()
+    for i in range(reads):
+        manager.get_all_trips(destination=f"Destination {i % 20}")
+        if i % 10 == 0:
+            with client.start_session(causal_consistency=True) as session:
+                trip_id = manager.create_trip(make_trip(i), session=session)
+                token = encode_causal_token(session)
+            read_back(manager, client, trip_id, token)
+    return primary_ops(client) - before, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--trips", type=int, default=5000)
+    parser.add_argument("--reads", type=int, default=2000)
+    args = parser.parse_args()
+
+    db = get_database()
+    client = db.client
+    if not client.admin.command("hello").get("setName"):
+        raise SystemExit("Read routing needs a replica set, see docker-compose.replica.yml")
+    collection = db.get_collection("bench_trips")
+    collection.drop()
+    collection.insert_many(
+        [{**make_trip(i).to_dict(), "trip_id": f"seed-{i}"} for i in range(args.trips)]
+    )
+
+    primary = TripManager(db_collection=collection)
+    routed = TripManager(db_collection=collection, read_preference=read_preference("secondaryPreferred", 90))
+
+    ops_primary, secs_primary = run(primary, client, args.reads)
+    ops_routed, secs_routed = run(routed, client, args.reads)
+    print(f"primary only:        {ops_primary:8d} primary ops in {secs_primary:.1f}s")
+    print(f"secondaryPreferred:  {ops_routed:8d} primary ops in {secs_routed:.1f}s")
+    print(f"primary load reduced by {100 * (1 - ops_routed / max(ops_primary, 1)):.0f}%")
+    collection.drop()
+
+
+if __name__ == "__main__":
+    main()
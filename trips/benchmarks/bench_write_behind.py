@@ -0,0 +1,67 @@
+"""Benchmark trip request inserts: one insert_one per request vs. write-behind batching.
+
+Requires a running MongoDB, e.g. the one from docker-compose:
+
+    MONGO_URI=mongodb://localhost:27017/trips_db PYTHONPATH=. python benchmarks/bench_write_behind.py
+"""
+import argparse
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, UTC
+
+from src.bll_models import TripRequest
+from src.db import get_database
+from src.trip_request_manager import TripRequestManager
+from src.write_behind import WriteBehindBuffer
+
+
+def make_request(i: int) -> TripRequest:
+    """Build a valid trip request."""
+    start = datetime.now(UTC) + timedelta(days=1 + i % 30)
+    return TripRequest(
+        passenger_id=f"bench-passenger-{i}",
+        destination="Benchmark",
+        earliest_start_date=start,
+        latest_start_date=start + timedelta(days=1),
+    )
+
+
+def run(manager: TripRequestManager, count: int, threads: int) -> float:
+    """Create `count` requests from `threads` concurrent callers; returns requests per second."""
+    requests = [make_request(i) for i in range(count)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(manager.create_trip_request, requests))
+    return count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--count", type=int, default=20000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--max-batch", type=int, default=500)
+    args = parser.parse_args()
+
+    collection = get_database().get_collection("bench_trip_requests")
+    collection.drop()
+
+    direct = TripRequestManager(db_collection=collection)
+    print(f"insert_one:   {run(direct, args.count, args.threads):10.0f} requests/s")
+
+    with tempfile.TemporaryDirectory() as journal_dir:
+        buffer = WriteBehindBuffer(collection, journal_dir, "request_id", max_batch=args.max_batch,
+                                   max_buffer=args.count)
+        batched = TripRequestManager(db_collection=collection, write_behind=buffer)
+        acked = run(batched, args.count, args.threads)
+        start = time.perf_counter()
+        buffer.close()
+        drained = time.perf_counter() - start
+        print(f"write-behind: {acked:10.0f} requests/s acknowledged, final flush took {drained:.2f}s")
+
+    print(f"documents stored: {collection.count_documents({})} (expected {2 * args.count})")
+    collection.drop()
+
+
+if __name__ == "__main__":
+    main()
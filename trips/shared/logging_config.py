@@ -4,6 +4,8 @@ import os
 from flask import request
 from werkzeug.exceptions import HTTPException
 
+from shared.server_timing import phase
+
 
 class RequestContextFilter(logging.Filter):
     """A filter to add default request context attributes to the log record."""
@@ -72,24 +74,25 @@ def register_logging_handlers(app, logger):
     @app.after_request
     def log_request(response):
         """Log every request after it has been handled."""
-        log_message = "Request processed"  # Default message
-
-        if response.is_json:
-            try:
-                data = response.get_json()
-                if isinstance(data, dict):
-                    log_message = data.get('message', log_message)
-                elif isinstance(data, list):
-                    log_message = f"Response contains a list with {len(data)} items"
-            except Exception:
-                pass
-
-        logger.info(
-            log_message,
-            extra={
-                'method': request.method,
-                'path': request.path,
-                'status': response.status_code,
-            }
-        )
+        with phase("log"):
+            log_message = "Request processed"  # Default message
+
+            if response.is_json:
+                try:
+                    data = response.get_json()
+                    if isinstance(data, dict):
+                        log_message = data.get('message', log_message)
+                    elif isinstance(data, list):
+                        log_message = f"Response contains a list with {len(data)} items"
+                except Exception:
+                    pass
+
+            logger.info(
+                log_message,
+                extra={
+                    'method': request.method,
+                    'path': request.path,
+                    'status': response.status_code,
+                }
+            )
         return response
@@ -0,0 +1,123 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from flask.json.provider import DefaultJSONProvider
+from pymongo import monitoring
+
+
+# Recorder of the request being handled on this thread; None outside requests
+_recorder: ContextVar[Optional["ServerTiming"]] = ContextVar("server_timing", default=None)
+
+
+class ServerTiming:
+    """Per-request durations of the pipeline phases and MongoDB round trips."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.db_ms = 0.0
+        self.db_calls = 0
+
+    def add(self, name: str, ms: float) -> None:
+        """Add `ms` milliseconds to a phase; a phase may run several times per request."""
+        self.phases[name] = self.phases.get(name, 0.0) + ms
+
+    def header(self) -> str:
+        """Build the `Server-Timing` header value.
+
+        `app` is the time not attributed to a phase or to MongoDB: routing,
+        validation and the manager logic around the queries.
+        """
+        total = (time.perf_counter() - self.started) * 1000
+        other = max(total - self.db_ms - sum(self.phases.values()), 0.0)
+        metrics = [f'db;dur={self.db_ms:.2f};desc="{self.db_calls} round trips"']
+        metrics += [f"{name};dur={ms:.2f}" for name, ms in self.phases.items()]
+        metrics += [f"app;dur={other:.2f}", f"total;dur={total:.2f}"]
+        return ", ".join(metrics)
+
+
+@contextmanager
+def phase(name: str):
+    """Time a block as the phase `name` of the current request; a no-op outside requests.
+
+    Phases must not contain MongoDB calls, which are timed separately.
+    """
+    recorder = _recorder.get()
+    if recorder is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        recorder.add(name, (time.perf_counter() - started) * 1000)
+
+
+class DbTimingListener(monitoring.CommandListener):
+    """Counts the MongoDB commands of the current request and their duration.
+
+    Pass it to `MongoClient(event_listeners=[...])`. Listeners run on the
+    thread issuing the command, so commands of background threads (event
+    tailing, notification fan-out) are not attributed to any request.
+    """
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event.duration_micros)
+
+    def failed(self, event):
+        self._record(event.duration_micros)
+
+    @staticmethod
+    def _record(duration_micros: int) -> None:
+        recorder = _recorder.get()
+        if recorder is not None:
+            recorder.db_calls += 1
+            recorder.db_ms += duration_micros / 1000
+
+
+class TimingJSONProvider(DefaultJSONProvider):
+    """Flask's JSON provider, timing response encoding as the `serialize` phase."""
+
+    def dumps(self, obj, **kwargs) -> str:
+        with phase("serialize"):
+            return super().dumps(obj, **kwargs)
+
+
+def register_server_timing(app, allow_origin: Optional[str] = None):
+    """Registers the `Server-Timing` response header for the Flask app.
+
+    Register it before all other after-request hooks: Flask runs them in
+    reverse order, so the header then includes their phases (logging,
+    compression). Streamed bodies are sent after the header and are not
+    included.
+
+    Args:
+        allow_origin: Value of `Timing-Allow-Origin`, letting cross-origin
+            frontends read the timings; None to only expose them same-origin.
+    """
+    app.json = TimingJSONProvider(app)
+
+    @app.before_request
+    def start_server_timing():
+        """Start recording the request's phases."""
+        _recorder.set(ServerTiming())
+
+    @app.after_request
+    def add_server_timing(response):
+        """Add the recorded durations to the response."""
+        recorder = _recorder.get()
+        if recorder is not None:
+            response.headers["Server-Timing"] = recorder.header()
+            if allow_origin:
+                response.headers["Timing-Allow-Origin"] = allow_origin
+        return response
+
+    @app.teardown_request
+    def stop_server_timing(exc):
+        """Stop recording, so the worker thread's next request starts clean."""
+        _recorder.set(None)
@@ -0,0 +1,95 @@
+import hmac
+import os
+
+from flask_openapi3 import APIBlueprint, Tag
+from flask import Response, current_app, request, stream_with_context
+
+from src.api_models import ExportPath, ExportQuery, ProfileIdPath
+from src.exporter import MIMETYPES, build_exporters
+from src.metrics import metrics
+from src.trip_manager import TripManager
+from src.trip_request_manager import TripRequestManager
+
+admin_tag = Tag(name='Admin', description='Operational endpoints, require the X-Admin-Token header')
+
+# Define an API blueprint for admin routes
+admin_api = APIBlueprint(
+    'admin',
+    __name__,
+    url_prefix='/admin'
+)
+
+
+def is_admin_request() -> bool:
+    """Check the request's `X-Admin-Token` header against the `ADMIN_TOKEN` environment variable."""
+    expected = os.getenv("ADMIN_TOKEN")
+    provided = request.headers.get("X-Admin-Token", "")
+    return bool(expected) and hmac.compare_digest(provided, expected)
+
+
+@admin_api.before_request
+def require_admin_token():
+    """Reject admin requests without a valid token; admin routes are disabled if no token is configured."""
+    if not is_admin_request():
+        return {"message": "Admin token missing or invalid"}, 403
+
+
+@admin_api.get('/metrics', summary="Service metrics", tags=[admin_tag])
+def get_metrics() -> dict:
+    """
+    Returns the in-process metrics of this worker together with the current
+    hot-set sizes of the trips and trip requests collections.
+    """
+    trip_manager: TripManager = current_app.config["trip_manager"]
+    trip_request_manager: TripRequestManager = current_app.config["trip_request_manager"]
+    return {
+        "hot_set": {
+            "trips": trip_manager.hot_set_stats(),
+            "trip_requests": trip_request_manager.hot_set_stats(),
+        },
+        **metrics.snapshot(),
+    }
+
+
+@admin_api.get('/export/<collection>', summary="Stream an export of trips or trip requests", tags=[admin_tag])
+def export_collection(path: ExportPath, query: ExportQuery):
+    """
+    Streams all trips or trip requests as NDJSON or CSV without loading them
+    into memory. Pass `since` for an incremental export; documents at exactly
+    `since` are included again, so consumers should upsert by id.
+    """
+    trip_manager: TripManager = current_app.config["trip_manager"]
+    exporter = build_exporters(
+        trip_manager.db_collection.database, include_archive=query.include_archive
+    )[path.collection]
+    return Response(
+        stream_with_context(exporter.export(query.format, query.since)),
+        mimetype=MIMETYPES[query.format],
+        headers={"Content-Disposition": f"attachment; filename={path.collection}.{query.format}"},
+    )
+
+
+@admin_api.get('/profiles', summary="List stored request profiles", tags=[admin_tag])
+def list_profiles():
+    """
+    Lists the stored request profiles, newest first. Requests are profiled when
+    sent with `X-Profile: 1` and a valid admin token, or by sampling
+    (`PROFILE_SAMPLE_RATE`); profiling is off unless `PROFILE_DIR` is set.
+    """
+    store = current_app.config.get("profile_store")
+    if store is None:
+        return {"message": "Profiling is disabled"}, 404
+    return {"profiles": store.list()}
+
+
+@admin_api.get('/profiles/<profile_id>', summary="Fetch a request profile", tags=[admin_tag])
+def get_profile(path: ProfileIdPath):
+    """
+    Returns a profile as collapsed stacks, which flamegraph.pl and
+    speedscope render as a flame graph.
+    """
+    store = current_app.config.get("profile_store")
+    collapsed = store.get(path.profile_id) if store is not None else None
+    if collapsed is None:
+        return {"message": "Profile not found"}, 404
+    return Response(collapsed, mimetype="text/plain")
@@ -0,0 +1,187 @@
+import heapq
+import itertools
+import threading
+import time
+from enum import IntEnum
+from typing import Dict, Optional
+
+from flask import g, request
+
+from src.metrics import metrics
+
+
+class Priority(IntEnum):
+    """Admission priority of a route; lower values are admitted first."""
+
+    HIGH = 0
+    NORMAL = 1
+    LOW = 2
+
+
+# Writes on the booking path outrank detail reads, which outrank list polling
+ROUTE_PRIORITIES: Dict[str, Priority] = {
+    "trips.create_trip": Priority.HIGH,
+    "trips.join_trip": Priority.HIGH,
+    "trips.delete_trip": Priority.HIGH,
+    "trips.create_trip_request": Priority.HIGH,
+    "trips.update_trip_request": Priority.HIGH,
+    "trips.accept_trip_request": Priority.HIGH,
+    "trips.get_trip_by_id": Priority.NORMAL,
+    "trips.get_trip_request_by_id": Priority.NORMAL,
+    "trips.get_trips_by_ids": Priority.NORMAL,
+    "trips.get_trip_requests_by_ids": Priority.NORMAL,
+    "trips.get_notifications": Priority.NORMAL,
+    "trips.get_all_trips": Priority.LOW,
+    "trips.search_trips": Priority.LOW,
+    "trips.get_all_trip_requests": Priority.LOW,
+    "trips.get_recommended_trips": Priority.LOW,
+}
+
+# Long-lived streams would hold a slot for their whole lifetime; the event bus bounds them instead
+EXEMPT_ENDPOINTS = {"trips.stream_trips"}
+
+# Maximum time a request may wait for a slot before it is shed
+DEFAULT_QUEUE_TIMEOUTS = {Priority.HIGH: 2.0, Priority.NORMAL: 1.0, Priority.LOW: 0.25}
+
+# Share of the queue each priority may fill, so polling cannot crowd out writes
+QUEUE_SHARES = {Priority.HIGH: 1.0, Priority.NORMAL: 0.75, Priority.LOW: 0.5}
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is shed instead of admitted."""
+
+    def __init__(self, reason: str):
+        super().__init__(f"Request rejected: {reason}")
+        self.reason = reason
+
+
+class _Ticket:
+    """A queued request waiting for a slot."""
+
+    __slots__ = ("granted",)
+
+    def __init__(self):
+        self.granted = False
+
+
+class AdmissionController:
+    """Bounds the number of requests processed concurrently by this worker.
+
+    Requests beyond `max_concurrent` wait in a priority queue of at most
+    `max_queue` entries. A request that finds the queue full, or waits longer
+    than its priority's queue timeout, is rejected right away so the client can
+    back off, instead of piling up latency for everyone.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 8,
+        max_queue: int = 16,
+        queue_timeouts: Optional[Dict[Priority, float]] = None,
+    ):
+        """Initialize AdmissionController.
+
+        Args:
+            max_concurrent: Number of requests processed at the same time.
+            max_queue: Number of requests allowed to wait for a slot.
+            queue_timeouts: Seconds a request of each priority may wait for a slot.
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeouts = {**DEFAULT_QUEUE_TIMEOUTS, **(queue_timeouts or {})}
+        self._cond = threading.Condition()
+        self._active = 0
+        self._waiting: list = []
+        self._seq = itertools.count()
+
+    def acquire(self, priority: Priority = Priority.NORMAL) -> float:
+        """Wait for a processing slot.
+
+        Returns:
+            The time in seconds spent waiting in the queue.
+
+        Raises:
+            AdmissionRejected: If the queue is full or the queue timeout expired.
+        """
+        with self._cond:
+            if self._active < self.max_concurrent and not self._waiting:
+                self._active += 1
+                return 0.0
+
+            if len(self._waiting) >= self.max_queue * QUEUE_SHARES[priority]:
+                raise AdmissionRejected("queue full")
+
+            ticket = _Ticket()
+            entry = (priority, next(self._seq), ticket)
+            heapq.heappush(self._waiting, entry)
+            start = time.monotonic()
+            deadline = start + self.queue_timeouts[priority]
+
+            while not ticket.granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._waiting.remove(entry)
+                    heapq.heapify(self._waiting)
+                    raise AdmissionRejected("queue timeout")
+                self._cond.wait(remaining)
+
+            return time.monotonic() - start
+
+    def release(self) -> None:
+        """Free a slot, handing it to the highest-priority waiting request if any."""
+        with self._cond:
+            if self._waiting:
+                # The slot passes directly to the waiter, so `_active` stays the same
+                _, _, ticket = heapq.heappop(self._waiting)
+                ticket.granted = True
+                self._cond.notify_all()
+            else:
+                self._active -= 1
+
+    @property
+    def in_flight(self) -> int:
+        """Number of requests currently holding a slot."""
+        return self._active
+
+    @property
+    def queued(self) -> int:
+        """Number of requests currently waiting for a slot."""
+        return len(self._waiting)
+
+
+def register_admission_control(app, controller: AdmissionController, blueprint: str = "trips",
+                               retry_after: int = 1):
+    """Registers admission control for all routes of `blueprint`.
+
+    Health checks, admin and documentation routes and `EXEMPT_ENDPOINTS` are never shed.
+    """
+
+    @app.before_request
+    def admit_request():
+        """Acquire a slot for the request or reject it with 503 and Retry-After."""
+        if request.blueprint != blueprint or request.endpoint in EXEMPT_ENDPOINTS:
+            return None
+
+        priority = ROUTE_PRIORITIES.get(request.endpoint, Priority.NORMAL)
+        try:
+            waited = controller.acquire(priority)
+        except AdmissionRejected as e:
+            metrics.incr(f"admission.rejected.{priority.name.lower()}")
+            metrics.incr(f"admission.rejected.{e.reason.replace(' ', '_')}")
+            return (
+                {"message": "Service is overloaded, please retry later"},
+                503,
+                {"Retry-After": str(retry_after)},
+            )
+
+        g.admitted = True
+        metrics.incr(f"admission.admitted.{priority.name.lower()}")
+        metrics.observe("admission.queue_ms", waited * 1000)
+        metrics.gauge("admission.in_flight", controller.in_flight)
+        return None
+
+    @app.teardown_request
+    def release_request(exc=None):
+        """Release the request's slot once the response has been produced."""
+        if g.pop("admitted", False):
+            controller.release()
@@ -1,7 +1,8 @@
+import re
 from datetime import datetime
-from typing import List, Optional
-from pydantic import BaseModel, Field
-from .bll_models import TripRequestStatus
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field, field_validator, model_validator
+from .bll_models import TripRequestStatus, check_coordinates, check_request_dates, check_trip_dates
 
 
 # --- Trip Models ---
@@ -18,6 +19,15 @@ class TripBody(BaseModel):
     start_datetime: datetime
     return_datetime: datetime
     cost_per_passenger: float = Field(..., ge=0, description="Cost per passenger, cannot be negative.")
+    pickup_lat: Optional[float] = Field(None, ge=-90, le=90, description="Latitude of the pickup location.")
+    pickup_lon: Optional[float] = Field(None, ge=-180, le=180, description="Longitude of the pickup location.")
+
+    @model_validator(mode="after")
+    def check_trip(self):
+        # Same rules as the Trip model, so routes can build a Trip without validating again
+        check_trip_dates(self.start_datetime, self.return_datetime)
+        check_coordinates(self.pickup_lat, self.pickup_lon)
+        return self
 
 class TripResponse(TripBody):
     """Response model for a single trip, including TripBody + server-set fields."""
@@ -33,6 +43,72 @@ class TripSearchQuery(BaseModel):
     pickup: Optional[str] = Field(None, description="Filter by pickup location.")
     destination: Optional[str] = Field(None, description="Filter by destination.")
     date: Optional[datetime] = Field(None, description="Filter by trip date.")
+    min_seats: Optional[int] = Field(None, ge=1, description="Only trips with at least this many free seats.")
+    near_lat: Optional[float] = Field(None, ge=-90, le=90, description="Latitude to search pickups around.")
+    near_lon: Optional[float] = Field(None, ge=-180, le=180, description="Longitude to search pickups around.")
+    radius_km: Optional[float] = Field(None, gt=0, description="Search radius around near_lat/near_lon in km.")
+    driver_id: Optional[str] = Field(None, description="Only trips offered by this driver.")
+    passenger_id: Optional[str] = Field(None, description="Only trips this passenger has joined.")
+
+    @model_validator(mode="after")
+    def check_near_params(self):
+        near = (self.near_lat, self.near_lon, self.radius_km)
+        if any(v is not None for v in near) and any(v is None for v in near):
+            raise ValueError("near_lat, near_lon and radius_km must be given together")
+        return self
+
+
+class TripListQuery(TripSearchQuery):
+    """Query parameters for listing trips."""
+    include_past: bool = Field(False, description="Also return past and archived trips (history views).")
+    limit: Optional[int] = Field(None, ge=1, le=100, description="Page size; pages are ordered by start time.")
+    offset: int = Field(0, ge=0, description="Number of matching trips to skip (with limit).")
+
+
+class TripPageQuery(TripSearchQuery):
+    """Query parameters for paginated trip search, optionally with facet counts."""
+    limit: int = Field(20, ge=1, le=100, description="Maximum number of trips to return.")
+    offset: int = Field(0, ge=0, description="Number of matching trips to skip.")
+    facets: bool = Field(False, description="Also return per-destination, per-day and price counts.")
+
+
+class TripStreamQuery(BaseModel):
+    """Query parameters selecting which trip events a live stream receives."""
+    pickup: Optional[str] = Field(None, description="Filter by pickup location.")
+    destination: Optional[str] = Field(None, description="Filter by destination.")
+    date: Optional[datetime] = Field(None, description="Filter by trip date.")
+    min_seats: Optional[int] = Field(None, ge=1, description="Only trips with at least this many free seats.")
+
+    @field_validator("pickup", "destination")
+    @classmethod
+    def check_pattern(cls, value: Optional[str]) -> Optional[str]:
+        # The filters are regular expressions, matched against every published trip
+        if value is not None:
+            try:
+                re.compile(value)
+            except re.error as e:
+                raise ValueError(f"Invalid pattern: {e}")
+        return value
+
+
+class FacetCount(BaseModel):
+    """Number of matching trips sharing one facet value."""
+    value: str
+    count: int
+
+
+class TripFacets(BaseModel):
+    """Facet counts over all trips matching a search, ignoring pagination."""
+    destination: List[FacetCount]
+    day: List[FacetCount]
+    price: List[FacetCount]
+
+
+class TripSearchResponse(BaseModel):
+    """Response model for a paginated trip search."""
+    results: List[TripResponse]
+    total: int
+    facets: Optional[TripFacets] = None
 
 # --- Trip Request Models ---
 
@@ -42,6 +118,15 @@ class TripRequestBody(BaseModel):
     destination: str
     earliest_start_date: datetime
     latest_start_date: datetime
+    pickup_lat: Optional[float] = Field(None, ge=-90, le=90, description="Latitude of the desired pickup.")
+    pickup_lon: Optional[float] = Field(None, ge=-180, le=180, description="Longitude of the desired pickup.")
+
+    @model_validator(mode="after")
+    def check_trip_request(self):
+        # Same rules as the TripRequest model, so routes can build one without validating again
+        check_request_dates(self.earliest_start_date, self.latest_start_date)
+        check_coordinates(self.pickup_lat, self.pickup_lon)
+        return self
 
 class TripRequestResponse(BaseModel):
     """Response model for a single trip request."""
@@ -52,6 +137,8 @@ class TripRequestResponse(BaseModel):
     latest_start_date: datetime
     status: TripRequestStatus
     trip_id: Optional[str] = None
+    pickup_lat: Optional[float] = None
+    pickup_lon: Optional[float] = None
     created_at: datetime
     updated_at: datetime
 
@@ -60,17 +147,137 @@ class TripRequestUpdateBody(BaseModel):
     trip_id: str
     status: TripRequestStatus
 
+
+class AcceptTripRequestBody(BaseModel):
+    """Request body for accepting a trip request onto a trip."""
+    trip_id: str = Field(..., description="The trip the requesting passenger is seated on.")
+
+
+class AcceptTripRequestResponse(BaseModel):
+    """Response model for an accepted trip request."""
+    message: str
+    trip_id: str
+    passenger_count: int
+    seats_left: int
+
 class RequestIdPath(BaseModel):
     """Path parameter model for identifying a trip request."""
     request_id: str = Field(..., description="The unique identifier of the trip request.")
 
+
+class RecommendationQuery(BaseModel):
+    """Query parameters for ranking trips against a trip request; weights default to `src.ranking.DEFAULT_WEIGHTS`."""
+    k: int = Field(10, ge=1, le=50, description="Number of trips to return.")
+    time_weight: Optional[float] = Field(None, ge=0, description="Weight of the fit with the start window.")
+    cost_weight: Optional[float] = Field(None, ge=0, description="Weight of a low cost per passenger.")
+    seats_weight: Optional[float] = Field(None, ge=0, description="Weight of free seats.")
+    destination_weight: Optional[float] = Field(None, ge=0, description="Weight of destination similarity.")
+
+    def weights(self) -> dict:
+        """The weights given, keyed by feature name."""
+        given = {
+            "time": self.time_weight, "cost": self.cost_weight,
+            "seats": self.seats_weight, "destination": self.destination_weight,
+        }
+        return {feature: weight for feature, weight in given.items() if weight is not None}
+
+
+class RecommendedTrip(BaseModel):
+    """A ranked trip with its score."""
+    trip: TripResponse
+    score: float = Field(..., description="Weighted sum of the feature scores, each in [0, 1].")
+
+
+class RecommendationResponse(BaseModel):
+    """Response model for the recommended trips of a trip request."""
+    results: List[RecommendedTrip] = Field(..., description="The best matching trips, best first.")
+
 class TripRequestSearchQuery(BaseModel):
     """Query parameters for searching trip requests."""
     destination: Optional[str] = Field(None, description="Filter by destination.")
+    include_past: bool = Field(False, description="Also return expired and archived requests.")
+    passenger_id: Optional[str] = Field(None, description="Only requests filed by this passenger.")
+    status: Optional[TripRequestStatus] = Field(None, description="Filter by request status.")
+    destination_exact: Optional[str] = Field(None, description="Exact destination, ignoring case and spacing.")
+    window_start: Optional[datetime] = Field(
+        None, description="Only requests whose start window overlaps [window_start, window_end]."
+    )
+    window_end: Optional[datetime] = Field(None, description="End of the period, see window_start.")
+    limit: Optional[int] = Field(None, ge=1, le=100, description="Page size; pages are ordered by earliest start date.")
+    offset: int = Field(0, ge=0, description="Number of matching requests to skip (with limit).")
+
+    @model_validator(mode="after")
+    def check_window(self):
+        if self.window_start and self.window_end and self.window_end < self.window_start:
+            raise ValueError("window_end must not be before window_start")
+        return self
+
+
+# --- Notification Models ---
+
+class PassengerIdPath(BaseModel):
+    """Path parameter model for identifying a passenger."""
+    passenger_id: str = Field(..., description="The unique identifier of the passenger.")
+
+
+class NotificationQuery(BaseModel):
+    """Query parameters for reading a passenger's notifications."""
+    unread_only: bool = Field(False, description="Only return unread notifications.")
+    limit: int = Field(50, ge=1, le=200, description="Maximum number of notifications to return.")
+
+
+class MarkNotificationsReadBody(BaseModel):
+    """Request body for marking a passenger's notifications as read."""
+    trip_ids: Optional[List[str]] = Field(
+        None, max_length=100, description="Only mark the notifications about these trips; all if omitted."
+    )
+
+
+class MarkNotificationsReadResponse(BaseModel):
+    """Response model for marking notifications as read."""
+    marked: int = Field(..., description="Number of notifications that were unread.")
+
+
+# --- Admin Models ---
+
+class ExportPath(BaseModel):
+    """Path parameter model selecting the collection to export."""
+    collection: Literal["trips", "trip_requests"] = Field(..., description="The collection to export.")
+
+
+class ExportQuery(BaseModel):
+    """Query parameters for a streamed export."""
+    format: Literal["ndjson", "csv"] = Field("ndjson", description="Output format.")
+    since: Optional[datetime] = Field(
+        None, description="Only documents created (trips) or updated (requests) at or after this time."
+    )
+    include_archive: bool = Field(False, description="Also export archived documents.")
+
+
+class ProfileIdPath(BaseModel):
+    """Path parameter model for identifying a stored request profile."""
+    profile_id: str = Field(..., pattern=r"^[0-9a-f]{32}$", description="The id from the X-Profile-Id header.")
 
 
 # --- Generic Models ---
 
+class BatchGetBody(BaseModel):
+    """Request body for fetching several trips or trip requests by id."""
+    ids: List[str] = Field(..., min_length=1, max_length=100, description="The ids to fetch (at most 100).")
+
+
+class TripBatchResponse(BaseModel):
+    """Response model for fetching several trips by id."""
+    results: List[TripResponse] = Field(..., description="Found trips, in the order of the requested ids.")
+    missing: List[str] = Field(..., description="Requested ids for which no trip exists.")
+
+
+class TripRequestBatchResponse(BaseModel):
+    """Response model for fetching several trip requests by id."""
+    results: List[TripRequestResponse] = Field(..., description="Found requests, in the order of the requested ids.")
+    missing: List[str] = Field(..., description="Requested ids for which no trip request exists.")
+
+
 class JoinTripBody(BaseModel):
     """Request body for joining a trip as a passenger."""
     passenger_id: str = Field(..., description="The ID of the passenger joining the trip.")
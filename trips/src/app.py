@@ -1,14 +1,27 @@
 from flask_openapi3 import OpenAPI
 from flask_cors import CORS
 from src.routes import api as trip_api
+from src.admin_routes import admin_api
+from src.admission import AdmissionController, register_admission_control
+from src.compression import register_compression
+from src.coalescing import SingleFlight
+from src.profiling import ProfileStore, register_profiling
 from flask import request
 
 import os
+from datetime import timedelta
 import sentry_sdk
-from pymongo import MongoClient
-from src.trip_manager import TripManager
+from src.db import get_database
+from src.trip_manager import TripManager, create_trip_partitions
 from src.trip_request_manager import TripRequestManager
+from src.booking_manager import BookingManager
+from src.idempotency import IdempotencyStore
+from src.write_behind import WriteBehindBuffer
+from src.events import MongoEventBus, get_capped_collection
+from src.notification_manager import NotificationManager
+from src.read_routing import CAUSAL_TOKEN_HEADER, ReadRouter, read_preference, register_read_routing
 from shared.logging_config import setup_logger, register_logging_handlers
+from shared.server_timing import DbTimingListener, register_server_timing
 
 # Initialize Sentry for error tracking and performance monitoring
 sentry_sdk.init(
@@ -30,27 +43,157 @@ app_logger = setup_logger('trips-ms')
 
 # Initialize Flask app with OpenAPI
 app = OpenAPI(__name__)
-CORS(app)
+# Browsers only let the frontend read the causal token if it is exposed
+CORS(app, expose_headers=[CAUSAL_TOKEN_HEADER])
+
+# Server-Timing header with per-phase durations; registered first so it also times
+# the other after-request hooks. CORS is open, so by default any origin may read it.
+register_server_timing(app, allow_origin=os.getenv("SERVER_TIMING_ALLOW_ORIGIN", "*") or None)
+
+# Compress large responses; registered before logging so it runs after the logging hook
+register_compression(
+    app,
+    min_size=int(os.getenv("COMPRESSION_MIN_SIZE", 1024)),
+    levels={
+        encoding: int(os.environ[f"COMPRESSION_LEVEL_{encoding.upper()}"])
+        for encoding in ("br", "zstd", "gzip")
+        if f"COMPRESSION_LEVEL_{encoding.upper()}" in os.environ
+    },
+)
 
 # Register shared logging and error handlers
 register_logging_handlers(app, app_logger)
 
-# Register the blueprint from routes.py
+# Opt-in request profiling; no hook is registered unless PROFILE_DIR is set
+if os.getenv("PROFILE_DIR"):
+    register_profiling(
+        app,
+        ProfileStore(
+            os.environ["PROFILE_DIR"],
+            max_profiles=int(os.getenv("PROFILE_MAX_PROFILES", 100)),
+            max_bytes=int(os.getenv("PROFILE_MAX_BYTES", 50 * 1024 * 1024)),
+        ),
+        sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", 0)),
+        interval=float(os.getenv("PROFILE_INTERVAL_SECONDS", 0.005)),
+    )
+
+# Threads per gunicorn worker; keep in sync with `--threads` in the Dockerfile
+worker_threads = int(os.getenv("WORKER_THREADS", 32))
+
+# Bound concurrent requests per worker and shed load beyond the queue budget
+admission_controller = AdmissionController(
+    max_concurrent=int(os.getenv("ADMISSION_MAX_CONCURRENT", 8)),
+    max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", 16)),
+)
+register_admission_control(app, admission_controller)
+
+# Register the blueprints from routes.py and admin_routes.py
 app.register_api(trip_api)
+app.register_api(admin_api)
 
 # Initialize MongoDB client and inject into TripManager
-mongo_uri = os.getenv("MONGO_URI", "mongodb://trips-db:27017/trips_db")
-mongo_client = MongoClient(mongo_uri)
-db = mongo_client.get_database("trips_db")
+db = get_database(event_listeners=[DbTimingListener()])
+
+# Opt-in: list/search reads from secondaries, e.g. LIST_READ_PREFERENCE=secondaryPreferred
+list_read_preference = None
+if os.getenv("LIST_READ_PREFERENCE"):
+    list_read_preference = read_preference(
+        os.environ["LIST_READ_PREFERENCE"],
+        max_staleness_seconds=int(os.getenv("LIST_READ_MAX_STALENESS_SECONDS", 90)),
+    )
+register_read_routing(app, ReadRouter(db.client, list_read_preference))
 
 trips_collection = db.get_collection("trips")
 trip_requests_collection = db.get_collection("trip_requests")
 
-trip_manager = TripManager(db_collection=trips_collection)
-trip_request_manager = TripRequestManager(db_collection=trip_requests_collection)
+# Past trips and expired requests are moved here by the archiver (src/archiver.py)
+trips_archive_collection = db.get_collection("trips_archive")
+trip_requests_archive_collection = db.get_collection("trip_requests_archive")
+
+# Trip change events for GET /trips/stream, shared by all workers via a capped collection
+event_bus = MongoEventBus(
+    db_collection=get_capped_collection(
+        db, "trip_events", size_bytes=int(os.getenv("EVENT_LOG_SIZE_BYTES", 16 * 1024 * 1024))
+    ),
+    history=int(os.getenv("EVENT_STREAM_HISTORY", 1000)),
+    # Every open stream holds a gthread worker thread; by default streams only get the
+    # threads not needed by admitted and queued requests (8 of 32 with the defaults)
+    max_subscribers=int(os.getenv(
+        "EVENT_STREAM_MAX_CLIENTS",
+        max(1, worker_threads - admission_controller.max_concurrent - admission_controller.max_queue),
+    )),
+    client_queue_size=int(os.getenv("EVENT_STREAM_CLIENT_QUEUE", 256)),
+)
+
+# Inverted index of pending requests, so new trips notify matching passengers without a scan
+notification_manager = NotificationManager(
+    db_collection=db.get_collection("notifications"),
+    index_collection=db.get_collection("trip_request_index"),
+    async_fan_out=os.getenv("NOTIFICATION_ASYNC_FAN_OUT", "1").lower() in ("1", "true"),
+    ttl_seconds=int(os.getenv("NOTIFICATION_TTL_DAYS", 90)) * 24 * 60 * 60,
+)
+
+# Opt-in: store trips in monthly collections; move existing trips with
+# `python -m src.partitioning migrate` after enabling
+trip_partitions = None
+if os.getenv("TRIP_PARTITIONING", "").lower() in ("1", "true", "monthly"):
+    trip_partitions = create_trip_partitions(
+        db,
+        read_preference=list_read_preference,
+        lookback=timedelta(days=int(os.getenv("TRIP_PARTITION_LOOKBACK_DAYS", 31))),
+        cache_size=int(os.getenv("TRIP_PARTITION_CACHE_SIZE", 100_000)),
+    )
+
+trip_manager = TripManager(
+    db_collection=trips_collection,
+    archive_collection=trips_archive_collection,
+    event_bus=event_bus,
+    notification_manager=notification_manager,
+    read_preference=list_read_preference,
+    partitions=trip_partitions,
+)
+# Opt-in: acknowledge trip requests once journaled locally and insert them in batches
+trip_request_write_behind = None
+if os.getenv("TRIP_REQUEST_WRITE_BEHIND", "").lower() in ("1", "true"):
+    trip_request_write_behind = WriteBehindBuffer(
+        db_collection=trip_requests_collection,
+        journal_dir=os.getenv("WRITE_BEHIND_JOURNAL_DIR", "journal/trip_requests"),
+        key_field="request_id",
+        max_batch=int(os.getenv("WRITE_BEHIND_MAX_BATCH", 500)),
+        flush_interval=float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", 0.2)),
+        max_buffer=int(os.getenv("WRITE_BEHIND_MAX_BUFFER", 10000)),
+        # Index requests for notifications only once they are stored
+        on_flush=notification_manager.index_stored_requests,
+    )
+
+trip_request_manager = TripRequestManager(
+    db_collection=trip_requests_collection,
+    archive_collection=trip_requests_archive_collection,
+    write_behind=trip_request_write_behind,
+    notification_manager=notification_manager,
+    read_preference=list_read_preference,
+)
+
+booking_manager = BookingManager(trip_manager, trip_request_manager)
+idempotency_store = IdempotencyStore(
+    db_collection=db.get_collection("idempotency_keys"),
+    ttl_seconds=int(os.getenv("IDEMPOTENCY_TTL_SECONDS", 24 * 60 * 60)),
+    lease_seconds=float(os.getenv("IDEMPOTENCY_LEASE_SECONDS", 60)),
+)
 
 app.config["trip_manager"] = trip_manager
 app.config["trip_request_manager"] = trip_request_manager
+app.config["booking_manager"] = booking_manager
+app.config["idempotency_store"] = idempotency_store
+app.config["event_bus"] = event_bus
+app.config["notification_manager"] = notification_manager
+# Identical concurrent GET /trips queries share one execution; a window > 0 also
+# reuses a finished result for that long, so lists may be up to that much stale
+if os.getenv("TRIPS_LIST_COALESCING", "1").lower() in ("1", "true"):
+    app.config["trips_list_coalescer"] = SingleFlight(
+        "trips_list", window=float(os.getenv("TRIPS_LIST_COALESCE_WINDOW_MS", 0)) / 1000
+    )
+app.config["event_stream_heartbeat"] = float(os.getenv("EVENT_STREAM_HEARTBEAT_SECONDS", 15))
 
 # Define a basic health check route
 @app.get("/health", summary="Health Check")
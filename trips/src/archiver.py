@@ -0,0 +1,149 @@
+import argparse
+import logging
+import time
+from datetime import datetime, UTC
+from typing import Optional
+
+from pymongo import ReplaceOne
+from pymongo.collection import Collection
+
+from src.metrics import metrics
+from src.partitioning import PartitionSet
+from src.trip_manager import create_trip_partitions, trip_collection_names
+
+
+logger = logging.getLogger("trips-archiver")
+
+
+class Archiver:
+    """Moves expired documents from a hot collection into its archive collection.
+
+    Documents are moved in batches with a pause in between, so the job can run
+    next to live traffic without saturating the database.
+    """
+
+    def __init__(
+        self,
+        source: Collection,
+        archive: Collection,
+        expiry_field: str,
+        batch_size: int = 500,
+        pause_seconds: float = 0.2,
+        partitions: Optional[PartitionSet] = None,
+    ):
+        """Initialize Archiver.
+
+        Args:
+            source: Hot collection to move expired documents out of.
+            archive: Collection receiving the expired documents.
+            expiry_field: Datetime field; documents where it lies in the past are expired.
+            batch_size: Maximum number of documents moved per batch.
+            pause_seconds: Pause between two batches (throttling).
+            partitions: Set if `source` is one of its partitions; archived documents
+                are then removed from its directory.
+        """
+        self.source = source
+        self.archive = archive
+        self.expiry_field = expiry_field
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+        self.partitions = partitions
+        self.name = source.name
+
+    def archive_expired(self, now: Optional[datetime] = None, max_batches: Optional[int] = None) -> int:
+        """Move all documents expired at `now` to the archive.
+
+        Each batch is upserted into the archive before it is deleted from the
+        source, so an interrupted run can simply be repeated.
+
+        Returns:
+            The number of documents moved.
+        """
+        now = now or datetime.now(UTC)
+        expired = {self.expiry_field: {"$lt": now}}
+        moved = 0
+        batches = 0
+
+        while max_batches is None or batches < max_batches:
+            docs = list(self.source.find(expired).limit(self.batch_size))
+            if not docs:
+                break
+
+            self.archive.bulk_write(
+                [ReplaceOne({"_id": d["_id"]}, d, upsert=True) for d in docs],
+                ordered=False,
+            )
+            ids = [d["_id"] for d in docs]
+            result = self.source.delete_many({"_id": {"$in": ids}, **expired})
+            if self.partitions:
+                self._forget(docs, result.deleted_count)
+
+            moved += result.deleted_count
+            batches += 1
+            metrics.incr(f"archiver.{self.name}.archived", result.deleted_count)
+
+            if len(docs) < self.batch_size:
+                break
+            time.sleep(self.pause_seconds)
+
+        metrics.gauge(f"archiver.{self.name}.hot_set_size", self.hot_set_size())
+        logger.info(f"Archived {moved} documents from {self.name} in {batches} batches")
+        return moved
+
+    def _forget(self, docs: list, deleted: int) -> None:
+        """Remove the deleted documents of a batch from the partition directory."""
+        if deleted < len(docs):
+            # Some were updated to expire later after being read; they stay
+            kept = set(self.source.distinct("_id", {"_id": {"$in": [d["_id"] for d in docs]}}))
+            docs = [d for d in docs if d["_id"] not in kept]
+        self.partitions.forget_many([d[self.partitions.id_field] for d in docs])
+
+    def hot_set_size(self) -> int:
+        """Number of documents currently in the hot collection (from collection metadata)."""
+        return self.source.estimated_document_count()
+
+
+def build_archivers(db, batch_size: int = 500, pause_seconds: float = 0.2) -> list:
+    """Create the archivers for trips and trip requests of the trips database.
+
+    Trips are archived from the `trips` collection and each existing monthly
+    partition; call again to pick up partitions created since.
+    """
+    partitions = create_trip_partitions(db)
+    trip_archivers = [
+        Archiver(db.get_collection(name), db.get_collection("trips_archive"),
+                 "return_datetime", batch_size, pause_seconds,
+                 partitions=partitions if name != "trips" else None)
+        for name in trip_collection_names(db)
+    ]
+    return trip_archivers + [
+        Archiver(db.get_collection("trip_requests"), db.get_collection("trip_requests_archive"),
+                 "latest_start_date", batch_size, pause_seconds),
+    ]
+
+
+def main(argv=None):
+    """Run the archival job once or periodically."""
+    from src.db import get_database
+
+    parser = argparse.ArgumentParser(description="Archive past trips and expired trip requests.")
+    parser.add_argument("--interval", type=float, default=0,
+                        help="Seconds between runs; 0 runs once and exits.")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause", type=float, default=0.2, help="Seconds to pause between batches.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    db = get_database()
+
+    while True:
+        # Rebuilt every run, so partitions created in the meantime are archived too
+        for archiver in build_archivers(db, args.batch_size, args.pause):
+            archiver.archive_expired()
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,94 @@
-from datetime import datetime, UTC
+import os
+from datetime import datetime, timedelta, UTC
 from enum import Enum
 from typing import List, Optional
 
 from pydantic import BaseModel, Field, field_validator, model_validator
+from pydantic_core import PydanticUndefined
+
+
+# Documents read from MongoDB were validated before they were written, so reads build
+# models without validation. Set TRUSTED_HYDRATION=0 to validate them again (debugging).
+VALIDATE_ON_READ = os.getenv("TRUSTED_HYDRATION", "1").lower() in ("0", "false")
+
+# Longest start window of a trip request; bounds its notification index postings (one per day)
+MAX_REQUEST_WINDOW = timedelta(days=90)
+
+
+# Per model class: (field name, default, default factory) for every field
+_FIELD_DEFAULTS: dict = {}
+
+
+def construct_trusted(cls, data: dict):
+    """Create a model instance from already validated data without validating it again.
+
+    Cheaper than `model_construct`, which resolves every field default on each
+    call: here the defaults are looked up once per class. Keys of `data` that
+    are not model fields are ignored; missing fields get their defaults.
+    """
+    fields = _FIELD_DEFAULTS.get(cls)
+    if fields is None:
+        fields = _FIELD_DEFAULTS[cls] = [
+            (name, field.default, field.default_factory)
+            for name, field in cls.model_fields.items()
+        ]
+
+    values = {}
+    for name, default, factory in fields:
+        if name in data:
+            values[name] = data[name]
+        elif factory is not None:
+            values[name] = factory()
+        elif default is not PydanticUndefined:
+            values[name] = default
+
+    instance = cls.__new__(cls)
+    # The same attributes `model_construct` sets on the instances it creates
+    object.__setattr__(instance, "__dict__", values)
+    object.__setattr__(instance, "__pydantic_fields_set__", set(values))
+    object.__setattr__(instance, "__pydantic_extra__", None)
+    object.__setattr__(instance, "__pydantic_private__", None)
+    return instance
+
+
+def check_coordinates(lat: Optional[float], lon: Optional[float]) -> None:
+    """Validate an optional latitude/longitude pair.
+
+    Both values must be given together and lie within their valid ranges.
+    """
+    if (lat is None) != (lon is None):
+        raise ValueError("pickup_lat and pickup_lon must be given together")
+    if lat is not None and not -90 <= lat <= 90:
+        raise ValueError("pickup_lat must be between -90 and 90")
+    if lon is not None and not -180 <= lon <= 180:
+        raise ValueError("pickup_lon must be between -180 and 180")
+
+
+def check_trip_dates(start_datetime: datetime, return_datetime: datetime) -> None:
+    """Validate that a trip returns after it starts."""
+    if return_datetime <= start_datetime:
+        raise ValueError("return_datetime must be after start_datetime")
+
+
+def check_request_dates(earliest_start_date: datetime, latest_start_date: datetime) -> None:
+    """Validate that a trip request's start window is not empty and at most MAX_REQUEST_WINDOW long."""
+    if latest_start_date <= earliest_start_date:
+        raise ValueError("latest_start_date must be after earliest_start_date")
+    if latest_start_date - earliest_start_date > MAX_REQUEST_WINDOW:
+        raise ValueError(f"The start window must not be longer than {MAX_REQUEST_WINDOW.days} days")
+
+
+def normalize_destination(destination: str) -> str:
+    """Normalize a destination for exact, indexable matching (case and spacing insensitive)."""
+    return " ".join(destination.split()).casefold()
+
+
+def geo_point(lat: Optional[float], lon: Optional[float]) -> Optional[dict]:
+    """Build a GeoJSON point (as stored for `2dsphere` indexes) from a lat/lon pair."""
+    if lat is None or lon is None:
+        return None
+    # GeoJSON orders coordinates as [longitude, latitude]
+    return {"type": "Point", "coordinates": [lon, lat]}
 
 
 class Trip(BaseModel):
@@ -23,6 +109,8 @@ class Trip(BaseModel):
     return_datetime: datetime
     cost_per_passenger: float
     passengers: List[str] = Field(default_factory=list)
+    pickup_lat: Optional[float] = Field(default=None)
+    pickup_lon: Optional[float] = Field(default=None)
 
     @field_validator("capacity")
     def capacity_must_be_positive(cls, v):
@@ -39,16 +127,39 @@ class Trip(BaseModel):
 
     @model_validator(mode="after")
     def check_dates_and_passengers(self):
-        if self.return_datetime <= self.start_datetime:
-            raise ValueError("return_datetime must be after start_datetime")
+        check_trip_dates(self.start_datetime, self.return_datetime)
 
         if len(self.passengers) > self.capacity:
             raise ValueError(
                 f"Number of passengers ({len(self.passengers)}) exceeds capacity ({self.capacity})"
             )
 
+        check_coordinates(self.pickup_lat, self.pickup_lon)
         return self
 
+    def pickup_point(self) -> Optional[dict]:
+        """Return the pickup location as a GeoJSON point, or None if no coordinates are set."""
+        return geo_point(self.pickup_lat, self.pickup_lon)
+
+    @classmethod
+    def from_body(cls, body: BaseModel) -> "Trip":
+        """Build a Trip from an already validated `TripBody` without validating again.
+
+        `TripBody` enforces the same rules as this model, so the fields are
+        taken over as they are, without an intermediate dump.
+        """
+        return construct_trusted(cls, body.__dict__)
+
+    @classmethod
+    def from_db(cls, data: dict) -> "Trip":
+        """Build a Trip from a stored document, skipping validation unless VALIDATE_ON_READ is set.
+
+        Keys that are not model fields (`_id`, `pickup_point`, ...) are ignored.
+        """
+        if VALIDATE_ON_READ:
+            return cls(**data)
+        return construct_trusted(cls, data)
+
     def add_passenger(self, passenger_id: str) -> bool:
         """Add a passenger to the trip.
 
@@ -79,6 +190,8 @@ class Trip(BaseModel):
             "return_datetime": self.return_datetime,
             "cost_per_passenger": self.cost_per_passenger,
             "passengers": list(self.passengers),
+            "pickup_lat": self.pickup_lat,
+            "pickup_lon": self.pickup_lon,
         }
 
     def validate(self) -> None:
@@ -104,18 +217,45 @@ class TripRequest(BaseModel):
     latest_start_date: datetime
     status: TripRequestStatus = Field(default=TripRequestStatus.PENDING)
     trip_id: Optional[str] = Field(default=None)
+    pickup_lat: Optional[float] = Field(default=None)
+    pickup_lon: Optional[float] = Field(default=None)
     created_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(UTC))
 
     @model_validator(mode="after")
     def check_dates(self):
-        if self.latest_start_date <= self.earliest_start_date:
-            raise ValueError("latest_start_date must be after earliest_start_date")
+        check_request_dates(self.earliest_start_date, self.latest_start_date)
+        check_coordinates(self.pickup_lat, self.pickup_lon)
         return self
 
+    @classmethod
+    def from_body(cls, body: BaseModel) -> "TripRequest":
+        """Build a pending TripRequest from an already validated `TripRequestBody` without validating again."""
+        return construct_trusted(cls, body.__dict__)
+
+    @classmethod
+    def from_db(cls, data: dict) -> "TripRequest":
+        """Build a TripRequest from a stored document, skipping validation unless VALIDATE_ON_READ is set."""
+        if VALIDATE_ON_READ:
+            return cls(**data)
+        request = construct_trusted(cls, data)
+        # Stored as a plain string; keep the enum type callers rely on
+        request.status = TripRequestStatus(request.status)
+        return request
+
     def to_dict(self) -> dict:
         """Return a dictionary representation suitable for storage."""
-        data = self.model_dump()
-        # Convert enum to string for storage
-        data["status"] = self.status.value
-        return data
+        return {
+            "request_id": self.request_id,
+            "passenger_id": self.passenger_id,
+            "destination": self.destination,
+            "earliest_start_date": self.earliest_start_date,
+            "latest_start_date": self.latest_start_date,
+            # Convert enum to string for storage
+            "status": self.status.value,
+            "trip_id": self.trip_id,
+            "pickup_lat": self.pickup_lat,
+            "pickup_lon": self.pickup_lon,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+        }
@@ -0,0 +1,104 @@
+import logging
+from typing import Optional
+
+from pymongo.client_session import ClientSession
+from pymongo.errors import OperationFailure
+
+from src.bll_models import Trip
+from src.trip_manager import TripManager
+from src.trip_request_manager import TripRequestManager
+
+
+logger = logging.getLogger("trips-ms")
+
+# MongoDB's IllegalOperation error, raised when a standalone server is asked for a transaction
+ILLEGAL_OPERATION = 20
+
+
+class BookingError(Exception):
+    """Raised when a booking cannot be completed; nothing has been changed."""
+
+
+class BookingManager:
+    """Manages booking operations spanning trips and trip requests."""
+
+    def __init__(self, trip_manager: TripManager, trip_request_manager: TripRequestManager):
+        """Initialize BookingManager.
+
+        Both managers must use collections of the same MongoDB deployment so
+        their writes can share a transaction.
+        """
+        self.trip_manager = trip_manager
+        self.trip_request_manager = trip_request_manager
+        self.client = trip_manager.db_collection.database.client
+        # Unknown until the first booking; a standalone server rejects transactions
+        self.transactions_supported: Optional[bool] = None
+
+    def accept_trip_request(self, request_id: str, trip_id: str, session: Optional[ClientSession] = None) -> Trip:
+        """Accept a pending trip request and seat its passenger on `trip_id`.
+
+        On a replica set or sharded cluster both writes run in one multi-document
+        transaction, so either both happen or neither does.
+
+        A standalone server does not support transactions. There the request is
+        flipped to accepted first and the passenger seated second; if seating
+        fails, the request is set back to pending. Between these steps other
+        readers can briefly see the request as accepted.
+
+        Args:
+            session: Optional session to run the booking in, e.g. a causally consistent
+                one whose cluster time is handed to the client; a new one is started otherwise.
+
+        Returns:
+            The updated Trip, including the final passenger list.
+
+        Raises:
+            BookingError: If the request is not pending, or the trip is missing, full
+                or already carries the passenger.
+        """
+        if self.transactions_supported is not False:
+            try:
+                if session is not None:
+                    trip = session.with_transaction(lambda s: self._accept(request_id, trip_id, s))
+                else:
+                    with self.client.start_session() as new_session:
+                        trip = new_session.with_transaction(lambda s: self._accept(request_id, trip_id, s))
+                self.transactions_supported = True
+                self.trip_manager.publish_event("updated", trip.to_dict())
+                return trip
+            except OperationFailure as e:
+                if e.code != ILLEGAL_OPERATION:
+                    raise
+                logger.warning("MongoDB does not support transactions, using compensating writes")
+                self.transactions_supported = False
+
+        # Standalone servers report no cluster time, so `session` has nothing to carry here
+        return self._accept_with_compensation(request_id, trip_id)
+
+    def _accept(self, request_id: str, trip_id: str, session: ClientSession) -> Trip:
+        """Transaction body: raising aborts the transaction."""
+        trip_request = self.trip_request_manager.accept_trip_request(request_id, trip_id, session=session)
+        if not trip_request:
+            raise BookingError("Trip request not found or not pending")
+
+        trip = self.trip_manager.seat_passenger(trip_id, trip_request.passenger_id, session=session)
+        if not trip:
+            raise BookingError("Trip not found, full, or passenger already on this trip")
+        return trip
+
+    def _accept_with_compensation(self, request_id: str, trip_id: str) -> Trip:
+        """Fallback for standalone servers: undo the request update if seating fails."""
+        trip_request = self.trip_request_manager.accept_trip_request(request_id, trip_id)
+        if not trip_request:
+            raise BookingError("Trip request not found or not pending")
+
+        try:
+            trip = self.trip_manager.seat_passenger(trip_id, trip_request.passenger_id)
+        except Exception:
+            self.trip_request_manager.revert_acceptance(request_id, trip_id)
+            raise
+        if not trip:
+            self.trip_request_manager.revert_acceptance(request_id, trip_id)
+            raise BookingError("Trip not found, full, or passenger already on this trip")
+        self.trip_manager.publish_event("updated", trip.to_dict())
+        return trip
@@ -0,0 +1,90 @@
+import threading
+import time
+from typing import Callable, Dict, Hashable, TypeVar
+
+from src.metrics import metrics
+
+
+T = TypeVar("T")
+
+
+class _Call:
+    """One execution shared by all requests with the same key."""
+
+    __slots__ = ("done", "result", "error", "expires")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.expires = 0.0
+
+
+class SingleFlight:
+    """Coalesces identical concurrent reads into a single execution.
+
+    The first caller for a key runs the function; callers arriving while it
+    runs wait for it and get the same result (or exception) instead of running
+    their own query. With a `window`, a finished result is also handed to
+    callers arriving within that many seconds afterwards, which flattens bursts
+    further at the price of results up to `window` seconds old. Failures are
+    never reused.
+    """
+
+    def __init__(self, name: str, window: float = 0.0, wait_timeout: float = 10.0, max_keys: int = 10_000):
+        """Initialize SingleFlight.
+
+        Args:
+            name: Metrics prefix, e.g. "trips_list".
+            window: Seconds a finished result is reused for; 0 only merges concurrent calls.
+            wait_timeout: Maximum seconds a caller waits for another's execution before running its own.
+            max_keys: Finished results kept for the window are pruned beyond this many keys.
+        """
+        self.name = name
+        self.window = window
+        self.wait_timeout = wait_timeout
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        """Return `fn()`, sharing one execution among concurrent callers with the same `key`."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None and call.done.is_set() and time.monotonic() >= call.expires:
+                call = None
+            leader = call is None
+            if leader:
+                if len(self._calls) >= self.max_keys:
+                    self._prune()
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            if call.done.wait(self.wait_timeout):
+                metrics.incr(f"coalescing.{self.name}.merged")
+                if call.error is not None:
+                    raise call.error
+                return call.result
+            metrics.incr(f"coalescing.{self.name}.wait_timeout")
+            return fn()
+
+        metrics.incr(f"coalescing.{self.name}.executed")
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            call.expires = time.monotonic() + self.window
+            call.done.set()
+            if self.window <= 0 or call.error is not None:
+                with self._lock:
+                    if self._calls.get(key) is call:
+                        del self._calls[key]
+        return call.result
+
+    def _prune(self) -> None:
+        """Drop finished results whose window has passed; the caller holds the lock."""
+        now = time.monotonic()
+        for key in [k for k, c in self._calls.items() if c.done.is_set() and now >= c.expires]:
+            del self._calls[key]
@@ -0,0 +1,177 @@
+import time
+import zlib
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from flask import request
+
+from src.metrics import metrics
+from shared.server_timing import phase
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional dependency
+    zstandard = None
+
+
+# Server preference when the client accepts several encodings with equal weight
+PREFERRED_ENCODINGS = ["br", "zstd", "gzip"]
+
+DEFAULT_LEVELS = {"br": 4, "zstd": 3, "gzip": 6}
+
+# Event streams must reach the client event by event, never buffered by a compressor
+EXCLUDED_MIMETYPES = {"text/event-stream"}
+
+
+def available_encodings() -> list:
+    """Return the supported encodings whose libraries are installed, in preference order."""
+    installed = {"br": brotli is not None, "zstd": zstandard is not None, "gzip": True}
+    return [e for e in PREFERRED_ENCODINGS if installed[e]]
+
+
+def choose_encoding(accept_encoding: str, encodings: Iterable[str]) -> Optional[str]:
+    """Pick the best encoding from an `Accept-Encoding` header.
+
+    The client's quality values decide; ties go to the server's preference order.
+    Returns None if the client accepts none of `encodings`.
+    """
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+
+    best, best_q = None, 0.0
+    for encoding in encodings:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(data: bytes, encoding: str, level: int) -> bytes:
+    """Compress a complete response body."""
+    if encoding == "br":
+        return brotli.compress(data, quality=level)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    return zlib.compress(data, level, wbits=31)  # wbits=31 writes a gzip container
+
+
+def _stream_compressor(encoding: str, level: int) -> Tuple[Callable[[bytes], bytes], Callable[[], bytes]]:
+    """Return functions compressing one chunk (flushed, so it can be sent right away) and ending the stream."""
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=level)
+        return (lambda chunk: compressor.process(chunk) + compressor.flush()), compressor.finish
+    if encoding == "zstd":
+        compressor = zstandard.ZstdCompressor(level=level).compressobj()
+        return (
+            lambda chunk: compressor.compress(chunk) + compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        ), compressor.flush
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return (lambda chunk: compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)), compressor.flush
+
+
+def compress_stream(chunks: Iterable[bytes], encoding: str, level: int) -> Iterable[bytes]:
+    """Compress a streamed response chunk by chunk, flushing after each chunk.
+
+    Ratio and CPU time are recorded like for buffered responses once the stream
+    ends or is closed early, e.g. by a disconnecting client. Only the compressor
+    calls are timed, not producing the chunks.
+    """
+    process, finish = _stream_compressor(encoding, level)
+    size_in = size_out = 0
+    cpu_seconds = 0.0
+    try:
+        for chunk in chunks:
+            cpu_start = time.thread_time()
+            compressed = process(chunk)
+            cpu_seconds += time.thread_time() - cpu_start
+            size_in += len(chunk)
+            size_out += len(compressed)
+            yield compressed
+        cpu_start = time.thread_time()
+        compressed = finish()
+        cpu_seconds += time.thread_time() - cpu_start
+        size_out += len(compressed)
+        yield compressed
+    finally:
+        _record_metrics(encoding, size_in, size_out, cpu_seconds * 1000)
+
+
+def _record_metrics(encoding: str, size_in: int, size_out: int, cpu_ms: float) -> None:
+    """Record the compression ratio, CPU cost and byte counts of one response."""
+    if size_in:
+        metrics.observe(f"compression.{encoding}.ratio", size_in / max(size_out, 1))
+    metrics.observe(f"compression.{encoding}.cpu_ms", cpu_ms)
+    metrics.incr("compression.bytes_in", size_in)
+    metrics.incr("compression.bytes_out", size_out)
+
+
+def _encode_chunks(chunks: Iterable) -> Iterable[bytes]:
+    """Streamed bodies may yield str chunks; compressors need bytes."""
+    for chunk in chunks:
+        yield chunk.encode() if isinstance(chunk, str) else chunk
+
+
+def register_compression(app, min_size: int = 1024, levels: Optional[Dict[str, int]] = None):
+    """Registers negotiated response compression for the Flask app.
+
+    Register it before the logging handlers: Flask runs `after_request` hooks in
+    reverse order, so the body is compressed after it has been logged.
+
+    Args:
+        min_size: Buffered responses smaller than this many bytes are sent as is.
+        levels: Compression level per encoding, overriding `DEFAULT_LEVELS`.
+    """
+    levels = {**DEFAULT_LEVELS, **(levels or {})}
+    encodings = available_encodings()
+
+    @app.after_request
+    def compress_response(response):
+        """Compress the response body if the client accepts a supported encoding."""
+        if (
+            response.status_code < 200
+            or response.status_code in (204, 304)
+            or "Content-Encoding" in response.headers
+            or response.mimetype in EXCLUDED_MIMETYPES
+        ):
+            return response
+
+        response.vary.add("Accept-Encoding")
+        encoding = choose_encoding(request.headers.get("Accept-Encoding", ""), encodings)
+        if not encoding:
+            return response
+
+        if response.is_streamed:
+            # The size is unknown up front, so streams are always compressed
+            response.response = compress_stream(_encode_chunks(response.response), encoding, levels[encoding])
+            response.headers.pop("Content-Length", None)
+            response.headers["Content-Encoding"] = encoding
+            metrics.incr(f"compression.{encoding}.streams")
+            return response
+
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+
+        # CPU time of this thread only: other requests run on the worker's other threads
+        cpu_start = time.thread_time()
+        with phase("compress"):
+            compressed = compress(data, encoding, levels[encoding])
+        cpu_ms = (time.thread_time() - cpu_start) * 1000
+
+        response.set_data(compressed)
+        response.headers["Content-Encoding"] = encoding
+        _record_metrics(encoding, len(data), len(compressed), cpu_ms)
+        return response
@@ -0,0 +1,309 @@
+import argparse
+import itertools
+import logging
+import math
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, UTC
+from typing import Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from src.bll_models import TripRequestStatus, geo_point, normalize_destination
+
+
+logger = logging.getLogger("trips-seeder")
+
+# Namespace of the deterministic uuid5 ids of generated documents
+DATASET_NAMESPACE = uuid.UUID("6f1c2e0a-5d0b-4a53-9f4e-7b1f0c3d2a10")
+
+# Real places first, so the most popular (Zipf rank 1, 2, ...) destinations read naturally
+CITIES: List[Tuple[str, float, float]] = [
+    ("San Francisco", 37.7749, -122.4194), ("Lake Tahoe", 39.0968, -120.0324),
+    ("Los Angeles", 34.0522, -118.2437), ("Yosemite", 37.8651, -119.5383),
+    ("Sacramento", 38.5816, -121.4944), ("San Diego", 32.7157, -117.1611),
+    ("Santa Cruz", 36.9741, -122.0308), ("Monterey", 36.6002, -121.8947),
+    ("Napa", 38.2975, -122.2869), ("Fresno", 36.7378, -119.7871),
+    ("Reno", 39.5296, -119.8138), ("San Jose", 37.3382, -121.8863),
+    ("Oakland", 37.8044, -122.2712), ("Big Sur", 36.2704, -121.8081),
+    ("Mammoth Lakes", 37.6485, -118.9721), ("Santa Barbara", 34.4208, -119.6982),
+    ("Palm Springs", 33.8303, -116.5453), ("Las Vegas", 36.1699, -115.1398),
+    ("Portland", 45.5152, -122.6784), ("Seattle", 47.6062, -122.3321),
+]
+
+
+class DatasetProfile(BaseModel):
+    """Shape and scale of a generated dataset; the same profile and anchor always give the same data."""
+    name: str
+    trips: int
+    requests: int
+    destinations: int = 200
+    drivers: int = 5000
+    passengers: int = 50000
+    days: int = 90
+    past_share: float = 0.2
+    destination_skew: float = 1.1
+    coordinates_share: float = 0.7
+    accepted_share: float = 0.15
+    seed: int = 42
+
+
+PROFILES = {
+    "tiny": DatasetProfile(name="tiny", trips=1_000, requests=2_000, destinations=30, drivers=200, passengers=1_500),
+    "small": DatasetProfile(name="small", trips=50_000, requests=100_000),
+    "medium": DatasetProfile(name="medium", trips=500_000, requests=1_000_000, destinations=1000,
+                             drivers=50_000, passengers=500_000),
+    "large": DatasetProfile(name="large", trips=2_000_000, requests=5_000_000, destinations=2000,
+                            drivers=200_000, passengers=2_000_000, days=180),
+}
+
+
+def dataset_id(profile: DatasetProfile, kind: str, i: int) -> str:
+    """Deterministic id of the i-th generated document of `kind` ("trip" or "request")."""
+    return str(uuid.uuid5(DATASET_NAMESPACE, f"{profile.name}:{profile.seed}:{kind}:{i}"))
+
+
+def default_anchor() -> datetime:
+    """Today at midnight UTC; generated start times are spread around it."""
+    now = datetime.now(UTC)
+    return datetime(now.year, now.month, now.day, tzinfo=UTC)
+
+
+class DatasetGenerator:
+    """Generates realistic trip and trip request storage documents.
+
+    - Destination popularity follows a Zipf distribution, so a few places get
+      most trips and requests, as in real searches.
+    - Start times cluster on Fridays and weekends and around the morning and
+      afternoon rush hours; `past_share` of them lie before the anchor.
+    - Trips are partially full and drivers offer a skewed number of trips.
+    - Requests target the same destinations with 1-3 day start windows; some
+      are already accepted onto a trip to their destination.
+
+    Documents are built as dicts in the exact shape the managers store, without
+    model validation, so millions can be produced quickly.
+    """
+
+    def __init__(self, profile: DatasetProfile, anchor: Optional[datetime] = None):
+        """Initialize DatasetGenerator.
+
+        Args:
+            profile: The dataset profile.
+            anchor: Reference time of the start time distribution; defaults to today.
+                Pin it to reproduce a dataset exactly on another day.
+        """
+        self.profile = profile
+        self.anchor = anchor or default_anchor()
+        self.destinations = [self._place(i) for i in range(profile.destinations)]
+        self._destination_weights = self._zipf_cumulative(profile.destinations, profile.destination_skew)
+        self._driver_weights = self._zipf_cumulative(min(profile.drivers, 10_000), 0.8)
+        # Friday and weekend departures are the most common
+        self._weekday_weights = list(itertools.accumulate([1.0, 0.8, 0.8, 0.9, 1.6, 1.5, 1.2]))
+
+    def trips(self) -> Iterator[dict]:
+        """Yield `profile.trips` trip documents."""
+        rng = random.Random(f"{self.profile.seed}:trips")
+        for i in range(self.profile.trips):
+            destination = self.sample_destination(rng)
+            pickup = self.sample_destination(rng)
+            while pickup[0] == destination[0] and len(self.destinations) > 1:
+                pickup = self.sample_destination(rng)
+
+            start = self._start_time(rng)
+            if rng.random() < 0.1:
+                duration = timedelta(days=rng.randint(1, 4))
+            else:
+                duration = timedelta(minutes=rng.randint(90, 600))
+            capacity = rng.choices([1, 2, 3, 4, 5, 6], weights=[5, 15, 30, 30, 12, 8])[0]
+            # Mostly partially full; about one trip in eight is full
+            taken = min(capacity, int(round(capacity * rng.betavariate(1.5, 2.0) * 1.2)))
+            lat, lon = (None, None)
+            if rng.random() < self.profile.coordinates_share:
+                lat = round(pickup[1] + rng.uniform(-0.05, 0.05), 6)
+                lon = round(pickup[2] + rng.uniform(-0.05, 0.05), 6)
+
+            trip = {
+                "trip_id": dataset_id(self.profile, "trip", i),
+                "driver_id": f"driver-{self._pick_index(rng, self._driver_weights, self.profile.drivers)}",
+                "driver_car": rng.choice(["Toyota Prius", "VW Golf", "Tesla Model 3", "Honda Civic", "Ford Transit"]),
+                "capacity": capacity,
+                "destination": destination[0],
+                "pickup_location": pickup[0],
+                "start_datetime": start,
+                "return_datetime": start + duration,
+                "cost_per_passenger": round(rng.uniform(4, 45) * (1 + duration.days), 2),
+                "passengers": [f"passenger-{rng.randrange(self.profile.passengers)}" for _ in range(taken)],
+                "pickup_lat": lat,
+                "pickup_lon": lon,
+            }
+            point = geo_point(lat, lon)
+            if point:
+                trip["pickup_point"] = point
+            yield trip
+
+    def trip_requests(self) -> Iterator[dict]:
+        """Yield `profile.requests` trip request documents."""
+        rng = random.Random(f"{self.profile.seed}:requests")
+        for i in range(self.profile.requests):
+            destination = self.sample_destination(rng)
+            earliest = self._start_time(rng) - timedelta(hours=rng.randint(0, 12))
+            latest = earliest + timedelta(hours=rng.randint(12, 72))
+            created = earliest - timedelta(days=rng.uniform(0.5, 14))
+
+            status, trip_id, updated = TripRequestStatus.PENDING.value, None, created
+            if rng.random() < self.profile.accepted_share:
+                status = TripRequestStatus.ACCEPTED.value
+                trip_id = dataset_id(self.profile, "trip", rng.randrange(max(self.profile.trips, 1)))
+                updated = created + timedelta(hours=rng.uniform(1, 48))
+
+            lat, lon = (None, None)
+            if rng.random() < self.profile.coordinates_share:
+                origin = self.sample_destination(rng)
+                lat = round(origin[1] + rng.uniform(-0.05, 0.05), 6)
+                lon = round(origin[2] + rng.uniform(-0.05, 0.05), 6)
+
+            yield {
+                "request_id": dataset_id(self.profile, "request", i),
+                "passenger_id": f"passenger-{rng.randrange(self.profile.passengers)}",
+                "destination": destination[0],
+                "earliest_start_date": earliest,
+                "latest_start_date": latest,
+                "status": status,
+                "trip_id": trip_id,
+                "pickup_lat": lat,
+                "pickup_lon": lon,
+                "created_at": created,
+                "updated_at": updated,
+                "destination_key": normalize_destination(destination[0]),
+            }
+
+    def _place(self, i: int) -> Tuple[str, float, float]:
+        """The i-th destination: a real city, or a synthetic town near one."""
+        if i < len(CITIES):
+            return CITIES[i]
+        name, lat, lon = CITIES[i % len(CITIES)]
+        offset = (i // len(CITIES)) * 0.03
+        return (f"{name} Area {i // len(CITIES)}", round(lat + offset, 4), round(lon - offset, 4))
+
+    def sample_destination(self, rng: random.Random) -> Tuple[str, float, float]:
+        """Pick a destination by Zipf popularity, e.g. to query a seeded dataset realistically."""
+        return self.destinations[self._pick_index(rng, self._destination_weights, len(self.destinations))]
+
+    @staticmethod
+    def _pick_index(rng: random.Random, cumulative: List[float], size: int) -> int:
+        """Pick a rank from cumulative weights; ranks beyond the table are spread uniformly."""
+        index = rng.choices(range(len(cumulative)), cum_weights=cumulative)[0]
+        if size > len(cumulative) and index == len(cumulative) - 1:
+            return rng.randrange(len(cumulative) - 1, size)
+        return index
+
+    @staticmethod
+    def _zipf_cumulative(size: int, skew: float) -> List[float]:
+        """Cumulative Zipf weights 1/k^skew for ranks 1..size."""
+        return list(itertools.accumulate(1 / math.pow(k, skew) for k in range(1, size + 1)))
+
+    def _start_time(self, rng: random.Random) -> datetime:
+        """A start time around the anchor, weighted by weekday and rush hours."""
+        if rng.random() < self.profile.past_share:
+            week = -rng.randint(1, max(self.profile.days // 7, 1))
+        else:
+            week = rng.randint(0, max(self.profile.days // 7 - 1, 0))
+        weekday = rng.choices(range(7), cum_weights=self._weekday_weights)[0]
+        day = self.anchor + timedelta(days=week * 7 + (weekday - self.anchor.weekday()) % 7)
+        peak = rng.choice([7.5, 8.5, 16.5, 17.5, 12.0])
+        hour = min(max(rng.gauss(peak, 1.5), 0.0), 23.75)
+        return day + timedelta(minutes=int(hour * 60) // 15 * 15)
+
+
+def seed(
+    db,
+    profile: DatasetProfile,
+    anchor: Optional[datetime] = None,
+    batch_size: int = 10_000,
+    prefix: str = "",
+) -> dict:
+    """Replace the trips and trip requests collections with a generated dataset.
+
+    Collections are dropped and loaded with unordered `insert_many` batches;
+    indexes are built afterwards, which is much faster than maintaining them
+    during the load. The profile is recorded in the `datasets` collection so
+    benchmarks can check which dataset they run against.
+
+    Args:
+        db: The trips database.
+        profile: The dataset profile.
+        anchor: See `DatasetGenerator`.
+        batch_size: Documents per `insert_many` call.
+        prefix: Prefix of the collection names, e.g. "bench_" to keep benchmarks off the service's data.
+
+    Returns:
+        The recorded dataset description.
+    """
+    from src.trip_manager import TripManager
+    from src.trip_request_manager import TripRequestManager
+
+    generator = DatasetGenerator(profile, anchor)
+    counts = {}
+    started = time.perf_counter()
+    for name, documents in (("trips", generator.trips()), ("trip_requests", generator.trip_requests())):
+        collection = db.get_collection(prefix + name)
+        collection.drop()
+        counts[name] = 0
+        batch = []
+        for doc in documents:
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                collection.insert_many(batch, ordered=False)
+                counts[name] += len(batch)
+                batch = []
+        if batch:
+            collection.insert_many(batch, ordered=False)
+            counts[name] += len(batch)
+        logger.info(f"Loaded {counts[name]} {name} after {time.perf_counter() - started:.1f}s")
+
+    # The managers create their indexes on construction
+    TripManager(db_collection=db.get_collection(prefix + "trips"))
+    TripRequestManager(db_collection=db.get_collection(prefix + "trip_requests"))
+    logger.info(f"Built indexes after {time.perf_counter() - started:.1f}s")
+
+    description = {
+        "profile": profile.model_dump(),
+        "anchor": generator.anchor,
+        "counts": counts,
+        "loaded_at": datetime.now(UTC),
+    }
+    db.get_collection("datasets").replace_one({"_id": prefix or "current"}, description, upsert=True)
+    return description
+
+
+def current_dataset(db, prefix: str = "") -> Optional[dict]:
+    """Return the description of the dataset loaded with `prefix`, or None if none was seeded."""
+    return db.get_collection("datasets").find_one({"_id": prefix or "current"}, {"_id": 0})
+
+
+def main(argv=None):
+    """Seed the trips database with a named dataset profile."""
+    from src.db import get_database
+
+    parser = argparse.ArgumentParser(description="Load a generated trips dataset into MongoDB.")
+    parser.add_argument("--profile", choices=sorted(PROFILES), default="small")
+    parser.add_argument("--anchor", type=datetime.fromisoformat,
+                        help="ISO date the start times are spread around (default: today).")
+    parser.add_argument("--seed", type=int, help="Override the profile's random seed.")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--prefix", default="", help="Prefix of the collection names to load into.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    profile = PROFILES[args.profile]
+    if args.seed is not None:
+        profile = profile.model_copy(update={"seed": args.seed})
+    anchor = args.anchor
+    if anchor and anchor.tzinfo is None:
+        anchor = anchor.replace(tzinfo=UTC)
+    seed(get_database(), profile, anchor, args.batch_size, args.prefix)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+import os
+from typing import List, Optional
+
+from pymongo import MongoClient, monitoring
+from pymongo.database import Database
+
+
+DEFAULT_MONGO_URI = "mongodb://trips-db:27017/trips_db"
+
+
+def get_database(
+    mongo_uri: str = None, event_listeners: Optional[List[monitoring.CommandListener]] = None
+) -> Database:
+    """Connect to MongoDB and return the trips database.
+
+    Args:
+        mongo_uri: Connection string; defaults to the `MONGO_URI` environment variable.
+        event_listeners: Optional command monitoring listeners, e.g. for Server-Timing.
+    """
+    mongo_uri = mongo_uri or os.getenv("MONGO_URI", DEFAULT_MONGO_URI)
+    mongo_client = MongoClient(mongo_uri, event_listeners=event_listeners)
+    return mongo_client.get_database("trips_db")
@@ -0,0 +1,328 @@
+import itertools
+import json
+import logging
+import queue
+import re
+import threading
+import time
+from collections import deque
+from datetime import date, datetime, UTC
+from typing import Callable, List, Optional
+
+from bson import ObjectId
+from pymongo import CursorType
+from pymongo.collection import Collection
+from pymongo.database import Database
+from pymongo.errors import CollectionInvalid, PyMongoError
+
+from src.metrics import metrics
+
+
+logger = logging.getLogger("trips-ms")
+
+
+class TooManySubscribersError(Exception):
+    """Raised when a worker already serves the maximum number of event streams."""
+
+
+class Subscription:
+    """One client's bounded queue of pending events.
+
+    Events the client's filter rejects are dropped at dispatch time, so they
+    never take up room. If the client falls behind by more than `max_queue`
+    events its queue is cleared and `overflowed` is set; the stream then tells
+    the client to reload instead of silently skipping events.
+    """
+
+    def __init__(self, matches: Optional[Callable[[dict], bool]] = None, max_queue: int = 256):
+        self.matches = matches
+        self.overflowed = False
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+
+    def offer(self, event: dict) -> None:
+        """Queue `event` if it matches the filter; never blocks the publisher."""
+        if self.matches and not self.matches(event):
+            return
+        try:
+            self._queue.put_nowait(event)
+        except queue.Full:
+            self.overflowed = True
+            metrics.incr("events.overflowed")
+            with self._queue.mutex:
+                self._queue.queue.clear()
+
+    def get(self, timeout: float) -> Optional[dict]:
+        """Return the next event, or None if none arrived within `timeout` seconds."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBus:
+    """In-process publish/subscribe for trip change events.
+
+    Every event gets an id, and the most recent `history` events are kept so a
+    reconnecting client can resume after its `Last-Event-ID`.
+    """
+
+    def __init__(self, history: int = 1000, max_subscribers: int = 1000, client_queue_size: int = 256):
+        """Initialize EventBus.
+
+        Args:
+            history: Number of recent events kept for resuming streams.
+            max_subscribers: Maximum number of concurrent subscriptions.
+            client_queue_size: Maximum number of undelivered events per subscription.
+        """
+        self.max_subscribers = max_subscribers
+        self.client_queue_size = client_queue_size
+        self._lock = threading.Lock()
+        self._history: deque = deque(maxlen=history)
+        self._subscribers: List[Subscription] = []
+        self._seq = itertools.count(1)
+
+    def publish(self, event_type: str, data: dict) -> None:
+        """Publish a trip event to all subscribers.
+
+        Args:
+            event_type: One of "created", "updated" or "deleted".
+            data: The trip as stored, or at least its `trip_id`.
+        """
+        self._dispatch({"id": str(next(self._seq)), "type": event_type, "data": data})
+
+    def subscribe(
+        self,
+        matches: Optional[Callable[[dict], bool]] = None,
+        last_event_id: Optional[str] = None,
+    ) -> Subscription:
+        """Register a subscription, optionally resuming after `last_event_id`.
+
+        Events published after `last_event_id` and still in the history are queued
+        right away. If the id is no longer known, the subscription starts
+        `overflowed`, so the client reloads its data.
+
+        Raises:
+            TooManySubscribersError: If `max_subscribers` subscriptions are active.
+        """
+        subscription = Subscription(matches, self.client_queue_size)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                raise TooManySubscribersError("Too many event stream clients")
+            if last_event_id:
+                missed = self._events_after(last_event_id)
+                if missed is None:
+                    subscription.overflowed = True
+                else:
+                    for event in missed:
+                        subscription.offer(event)
+            self._subscribers.append(subscription)
+            metrics.gauge("events.subscribers", len(self._subscribers))
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """Remove a subscription, e.g. when its client disconnects."""
+        with self._lock:
+            if subscription in self._subscribers:
+                self._subscribers.remove(subscription)
+            metrics.gauge("events.subscribers", len(self._subscribers))
+
+    def close(self) -> None:
+        """Stop background work; nothing to do for the in-process bus."""
+
+    def _dispatch(self, event: dict) -> None:
+        """Record `event` in the history and hand it to every subscription."""
+        with self._lock:
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            try:
+                subscription.offer(event)
+            except Exception:
+                # A broken filter must not fail the publishing write or starve other clients
+                logger.exception("Event subscription failed to handle an event")
+                metrics.incr("events.subscriber_errors")
+        metrics.incr(f"events.{event['type']}")
+
+    def _events_after(self, last_event_id: str) -> Optional[List[dict]]:
+        """Return the events after `last_event_id`, or None if it fell out of the history."""
+        events = list(self._history)
+        for i, event in enumerate(events):
+            if event["id"] == last_event_id:
+                return events[i + 1:]
+        return None
+
+
+def get_capped_collection(db: Database, name: str, size_bytes: int) -> Collection:
+    """Return the capped collection `name`, creating it if it does not exist yet."""
+    try:
+        return db.create_collection(name, capped=True, size=size_bytes)
+    except CollectionInvalid:
+        # Already created, e.g. by another worker
+        return db.get_collection(name)
+
+
+class MongoEventBus(EventBus):
+    """Event bus shared by all workers through a MongoDB capped collection.
+
+    `publish` only inserts the event; a background thread tails the capped
+    collection with a tailable cursor and dispatches every event, including
+    this worker's own, to the local subscribers. Event ids are the documents'
+    ObjectIds, so they are the same in every worker and a client can resume
+    on any of them.
+    """
+
+    def __init__(self, db_collection: Collection, await_seconds: float = 1.0, **kwargs):
+        """Initialize MongoEventBus and start tailing.
+
+        Args:
+            db_collection: Capped collection, see `get_capped_collection`.
+            await_seconds: How long the tailing cursor waits for new events per round trip.
+            **kwargs: Passed to `EventBus`.
+        """
+        super().__init__(**kwargs)
+        self.db_collection = db_collection
+        self.await_seconds = await_seconds
+        self._stopped = threading.Event()
+        self._last_id: Optional[ObjectId] = None
+        self._thread = threading.Thread(target=self._tail, name="event-tailer", daemon=True)
+        self._thread.start()
+
+    def publish(self, event_type: str, data: dict) -> None:
+        """Insert a trip event; the tailer dispatches it to subscribers of all workers."""
+        self.db_collection.insert_one({"type": event_type, "data": data, "created_at": datetime.now(UTC)})
+
+    def close(self) -> None:
+        """Stop the tailing thread."""
+        self._stopped.set()
+        self._thread.join()
+
+    def _tail(self) -> None:
+        """Follow the capped collection in insertion order, reopening the cursor when it dies."""
+        self._last_id = self._newest_id()
+        while not self._stopped.is_set():
+            try:
+                self._follow()
+            except PyMongoError:
+                logger.warning("Event tailing cursor failed, reopening", exc_info=True)
+            except Exception:
+                # Keep tailing: a dead thread would silence every stream of this worker
+                logger.exception("Event tailing failed, reopening")
+            # An empty capped collection returns a dead cursor; avoid a busy loop
+            self._stopped.wait(self.await_seconds)
+
+    def _follow(self) -> None:
+        """Dispatch the events inserted after `_last_id` until the cursor dies.
+
+        ObjectIds of different workers are only ordered to the second, so the
+        cursor does not resume with `_id > _last_id`: it reads the capped
+        collection in insertion order from its start and skips up to `_last_id`.
+        """
+        last_id = self._last_id
+        # Once overwritten, every event still in the collection came after it
+        skipping = last_id is not None and self.db_collection.find_one({"_id": last_id}, {"_id": 1}) is not None
+        cursor = self.db_collection.find(
+            {}, cursor_type=CursorType.TAILABLE_AWAIT
+        ).max_await_time_ms(int(self.await_seconds * 1000))
+        while cursor.alive and not self._stopped.is_set():
+            for doc in cursor:
+                if skipping:
+                    skipping = doc["_id"] != last_id
+                    continue
+                self._last_id = doc["_id"]
+                self._dispatch({"id": str(doc["_id"]), "type": doc["type"], "data": doc["data"]})
+            if skipping:
+                # `last_id` was overwritten while the cursor scanned for it
+                logger.warning("Last event fell out of the event log on reopen, some events were missed")
+                metrics.incr("events.resume_lost")
+                skipping = False
+
+    def _newest_id(self) -> Optional[ObjectId]:
+        """Id of the newest event at start-up; only events after it are dispatched."""
+        try:
+            newest = self.db_collection.find_one({}, {"_id": 1}, sort=[("$natural", -1)])
+        except PyMongoError:
+            return None
+        return newest["_id"] if newest else None
+
+
+def trip_filter(
+    pickup: Optional[str] = None,
+    destination: Optional[str] = None,
+    trip_date: Optional[date] = None,
+    min_seats: Optional[int] = None,
+) -> Optional[Callable[[dict], bool]]:
+    """Build an event predicate with the semantics of the `GET /trips` filters.
+
+    Events that only carry a `trip_id` (deletions, partial updates) always
+    match; the client drops ids it does not show.
+
+    Raises:
+        re.error: If `pickup` or `destination` is not a valid regular expression.
+    """
+    if not (pickup or destination or trip_date or min_seats):
+        return None
+    pickup_pattern = re.compile(pickup, re.IGNORECASE) if pickup else None
+    destination_pattern = re.compile(destination, re.IGNORECASE) if destination else None
+
+    def matches(event: dict) -> bool:
+        trip = event["data"]
+        if "start_datetime" not in trip:
+            return True
+        if pickup_pattern and not pickup_pattern.search(trip["pickup_location"]):
+            return False
+        if destination_pattern and not destination_pattern.search(trip["destination"]):
+            return False
+        if trip_date and _as_date(trip["start_datetime"]) != _as_date(trip_date):
+            return False
+        if min_seats and trip["capacity"] - len(trip.get("passengers", [])) < min_seats:
+            return False
+        return True
+
+    return matches
+
+
+def _as_date(value) -> date:
+    """Calendar day of a datetime, date or ISO string."""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _json_default(value):
+    """JSON encoder for the datetimes in trip documents."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def format_sse(event: dict) -> str:
+    """Serialize an event in the Server-Sent Events wire format."""
+    data = json.dumps(event["data"], default=_json_default)
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n"
+
+
+def stream_events(
+    bus: EventBus,
+    subscription: Subscription,
+    heartbeat_seconds: float = 15.0,
+    retry_ms: int = 3000,
+):
+    """Yield a subscription's events as SSE messages until the client disconnects.
+
+    A comment line is sent every `heartbeat_seconds` without events, so proxies
+    keep the connection open and dead clients are detected. After an overflow
+    a `reset` event tells the client to reload its data.
+    """
+    try:
+        yield f"retry: {retry_ms}\n\n"
+        while True:
+            if subscription.overflowed:
+                subscription.overflowed = False
+                yield "event: reset\ndata: {}\n\n"
+            event = subscription.get(timeout=heartbeat_seconds)
+            if event is None:
+                yield f": heartbeat {int(time.time())}\n\n"
+            else:
+                yield format_sse(event)
+    finally:
+        bus.unsubscribe(subscription)
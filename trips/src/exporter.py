@@ -0,0 +1,185 @@
+import argparse
+import csv
+import io
+import json
+import logging
+import sys
+from datetime import date, datetime, UTC
+from typing import Iterator, List, Optional
+
+from bson import ObjectId
+from pymongo.collection import Collection
+
+from src.bll_models import Trip, TripRequest
+from src.metrics import metrics
+from src.trip_manager import trip_collection_names
+
+
+logger = logging.getLogger("trips-exporter")
+
+FORMATS = ("ndjson", "csv")
+
+MIMETYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _json_default(value):
+    """JSON encoder for the datetimes in stored documents."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _csv_value(value) -> str:
+    """Flatten a stored value into a CSV cell; lists are joined with ';'."""
+    if value is None:
+        return ""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, list):
+        return ";".join(str(v) for v in value)
+    return str(value)
+
+
+class Exporter:
+    """Streams a collection as NDJSON or CSV in constant memory.
+
+    Documents are read with a batched cursor in watermark order and emitted one
+    chunk per batch, so neither the collection nor the response is ever held in
+    memory. An incremental export passes the previous run's `last_watermark` as
+    `since`; documents exactly at the watermark are exported again, so consumers
+    should upsert by id.
+    """
+
+    def __init__(
+        self,
+        collections: List[Collection],
+        fields: List[str],
+        watermark_field: str,
+        batch_size: int = 1000,
+    ):
+        """Initialize Exporter.
+
+        Args:
+            collections: Collections exported one after another, e.g. the hot one and its archive.
+            fields: Fields to export, in CSV column order.
+            watermark_field: `updated_at`, or `_id` to use the ObjectId's creation time.
+            batch_size: Documents fetched per cursor round trip and emitted per chunk.
+        """
+        self.collections = collections
+        self.fields = fields
+        self.watermark_field = watermark_field
+        self.batch_size = batch_size
+        self.last_watermark: Optional[datetime] = None
+
+    def export(self, fmt: str = "ndjson", since: Optional[datetime] = None) -> Iterator[str]:
+        """Yield the export in chunks of up to `batch_size` documents.
+
+        Args:
+            fmt: "ndjson" or "csv".
+            since: Only export documents created (trips) or updated (requests) at or after this time.
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown export format {fmt!r}, expected one of {', '.join(FORMATS)}")
+        if fmt == "csv":
+            yield self._csv_rows([self.fields])
+
+        batch: List[dict] = []
+        for doc in self._documents(since):
+            batch.append(doc)
+            if len(batch) >= self.batch_size:
+                yield self._encode(batch, fmt)
+                batch = []
+        if batch:
+            yield self._encode(batch, fmt)
+
+    def _documents(self, since: Optional[datetime]) -> Iterator[dict]:
+        """Iterate the documents of all collections in watermark order, tracking the watermark."""
+        query: dict = {}
+        if since and self.watermark_field == "_id":
+            query["_id"] = {"$gte": ObjectId.from_datetime(since)}
+        elif since:
+            query[self.watermark_field] = {"$gte": since}
+
+        projection = {field: 1 for field in self.fields}
+        projection["_id"] = self.watermark_field == "_id"
+        sort = [(self.watermark_field, 1)] if self.watermark_field == "_id" else [(self.watermark_field, 1), ("_id", 1)]
+
+        for collection in self.collections:
+            cursor = collection.find(query, projection, batch_size=self.batch_size).sort(sort)
+            for doc in cursor:
+                if self.watermark_field == "_id":
+                    watermark = doc.pop("_id").generation_time
+                else:
+                    watermark = doc.get(self.watermark_field)
+                if watermark and (self.last_watermark is None or watermark > self.last_watermark):
+                    self.last_watermark = watermark
+                metrics.incr("export.documents")
+                yield doc
+
+    def _encode(self, docs: List[dict], fmt: str) -> str:
+        """Serialize one batch of documents."""
+        if fmt == "csv":
+            return self._csv_rows([[_csv_value(doc.get(field)) for field in self.fields] for doc in docs])
+        return "".join(json.dumps(doc, default=_json_default) + "\n" for doc in docs)
+
+    @staticmethod
+    def _csv_rows(rows: List[list]) -> str:
+        """Serialize rows as CSV text."""
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue()
+
+
+def build_exporters(db, batch_size: int = 1000, include_archive: bool = False) -> dict:
+    """Create the exporters for trips and trip requests of the trips database.
+
+    Trips carry no update time, so their watermark is the creation time; an
+    incremental trips export does not pick up later joins. Trips are read from
+    the `trips` collection and its monthly partitions, if any.
+    """
+    def collections(name: str) -> List[Collection]:
+        names = trip_collection_names(db) if name == "trips" else [name]
+        if include_archive:
+            names.append(f"{name}_archive")
+        return [db.get_collection(n) for n in names]
+
+    return {
+        "trips": Exporter(collections("trips"), list(Trip.model_fields), "_id", batch_size),
+        "trip_requests": Exporter(collections("trip_requests"), list(TripRequest.model_fields), "updated_at", batch_size),
+    }
+
+
+def main(argv=None):
+    """Export trips or trip requests to a file or stdout."""
+    from src.db import get_database
+
+    parser = argparse.ArgumentParser(description="Export trips or trip requests as NDJSON or CSV.")
+    parser.add_argument("collection", choices=["trips", "trip_requests"])
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--since", type=datetime.fromisoformat,
+                        help="ISO timestamp; only export documents created/updated since then.")
+    parser.add_argument("--include-archive", action="store_true", help="Also export archived documents.")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--output", help="Output file; defaults to stdout.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    since = args.since
+    if since and since.tzinfo is None:
+        since = since.replace(tzinfo=UTC)
+    exporter = build_exporters(get_database(), args.batch_size, args.include_archive)[args.collection]
+
+    out = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+    try:
+        for chunk in exporter.export(args.format, since):
+            out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+    if exporter.last_watermark:
+        # Pass as --since to the next incremental run
+        logger.info(f"Export complete, watermark {exporter.last_watermark.isoformat()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import uuid
+from datetime import datetime, timedelta, UTC
+from typing import Callable, Optional, Tuple
+
+from pymongo.collection import Collection
+from pymongo.errors import DuplicateKeyError
+
+
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyError(Exception):
+    """Raised when an Idempotency-Key cannot be honored for a request."""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class IdempotencyStore:
+    """Stores the responses of write requests by their `Idempotency-Key`.
+
+    A retried request carrying the same key gets the original response back
+    instead of executing the write again. Keys expire through a TTL index.
+
+    A key being processed is held under a lease. If its worker dies before
+    storing the response, a retry after `lease_seconds` takes the key over and
+    executes the write, instead of being refused until the key expires.
+    """
+
+    def __init__(self, db_collection: Collection, ttl_seconds: int = 24 * 60 * 60, lease_seconds: float = 60.0):
+        """Initialize IdempotencyStore.
+
+        Args:
+            db_collection: MongoDB collection for storing keys and responses.
+            ttl_seconds: How long a key is remembered after its first use.
+            lease_seconds: How long a request may process a key before a retry can
+                take it over; must exceed the longest write request.
+        """
+        self.db_collection = db_collection
+        self.lease = timedelta(seconds=lease_seconds)
+        self.db_collection.create_index("key", unique=True)
+        self.db_collection.create_index("created_at", expireAfterSeconds=ttl_seconds)
+
+    def execute(self, key: str, scope: str, payload: dict, func: Callable) -> Tuple[dict, int, bool]:
+        """Run `func` once per (`scope`, `key`) and replay its response afterwards.
+
+        The key is reserved before `func` runs, so concurrent retries cannot both
+        execute the write. If `func` raises or returns a 5xx response, the key is
+        released and the client may retry; if the reservation's lease runs out
+        without a response, e.g. because the worker crashed, the next retry
+        takes it over.
+
+        Args:
+            key: The client-supplied Idempotency-Key.
+            scope: The operation the key belongs to, e.g. "create_trip".
+            payload: The request data; reusing a key with different data is rejected.
+            func: Executes the write and returns a response body, optionally with a status code.
+
+        Returns:
+            A (body, status code, replayed) tuple.
+
+        Raises:
+            IdempotencyError: If the key is invalid, reused with different data, or
+                its first request is still being processed.
+        """
+        if len(key) > MAX_KEY_LENGTH:
+            raise IdempotencyError(f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters", 400)
+
+        doc_key = f"{scope}:{key}"
+        fingerprint = self._fingerprint(payload)
+        owner = uuid.uuid4().hex
+        now = datetime.now(UTC)
+        try:
+            self.db_collection.insert_one({
+                "key": doc_key,
+                "fingerprint": fingerprint,
+                "completed": False,
+                "owner": owner,
+                "locked_until": now + self.lease,
+                "created_at": now,
+            })
+        except DuplicateKeyError:
+            existing = self._replay(doc_key, fingerprint)
+            if existing is not None:
+                return existing
+            owner = self._take_over(doc_key)
+        return self._run(doc_key, owner, func)
+
+    def _run(self, doc_key: str, owner: str, func: Callable) -> Tuple[dict, int, bool]:
+        """Execute the write for a key this request holds and store or release it.
+
+        Writes are conditioned on `owner`, so a request whose lease was taken over
+        cannot overwrite or release the key of the one that took it.
+        """
+        held = {"key": doc_key, "owner": owner}
+        try:
+            body, status = self._split_response(func())
+        except Exception:
+            self.db_collection.delete_one(held)
+            raise
+
+        if status >= 500:
+            self.db_collection.delete_one(held)
+        else:
+            self.db_collection.update_one(
+                held,
+                {"$set": {"completed": True, "body": body, "status_code": status}},
+            )
+        return body, status, False
+
+    def _replay(self, doc_key: str, fingerprint: str) -> Optional[Tuple[dict, int, bool]]:
+        """Return the stored response for a key that has been used before.
+
+        Returns None if the key's lease has run out without a response, in which
+        case the caller may take it over.
+        """
+        existing = self.db_collection.find_one({"key": doc_key})
+        if not existing:
+            # Expired between our insert attempt and the lookup
+            raise IdempotencyError("Idempotency-Key expired, please retry", 409)
+        if existing["fingerprint"] != fingerprint:
+            raise IdempotencyError("Idempotency-Key was already used with a different request", 422)
+        if not existing["completed"]:
+            if self._lease_end(existing) > datetime.now(UTC):
+                raise IdempotencyError("A request with this Idempotency-Key is still being processed", 409)
+            return None
+        return existing["body"], existing["status_code"], True
+
+    def _take_over(self, doc_key: str) -> str:
+        """Atomically claim a key whose lease ran out; returns the new owner token.
+
+        Raises:
+            IdempotencyError: If another retry claimed it first or it completed meanwhile.
+        """
+        now = datetime.now(UTC)
+        owner = uuid.uuid4().hex
+        claimed = self.db_collection.find_one_and_update(
+            {"key": doc_key, "completed": False, "locked_until": {"$lte": now}},
+            {"$set": {"owner": owner, "locked_until": now + self.lease}},
+        )
+        if claimed is None:
+            raise IdempotencyError("A request with this Idempotency-Key is still being processed", 409)
+        return owner
+
+    @staticmethod
+    def _lease_end(doc: dict) -> datetime:
+        """End of a reservation's lease; naive datetimes (as read from MongoDB) are UTC."""
+        lease_end = doc["locked_until"]
+        return lease_end if lease_end.tzinfo else lease_end.replace(tzinfo=UTC)
+
+    @staticmethod
+    def _fingerprint(payload: dict) -> str:
+        """Hash the request payload so key reuse with different data can be detected."""
+        encoded = json.dumps(payload, sort_keys=True, default=str).encode()
+        return hashlib.sha256(encoded).hexdigest()
+
+    @staticmethod
+    def _split_response(result) -> Tuple[dict, int]:
+        """Normalize a route result (`body` or `(body, status)`) into a (body, status) pair."""
+        if isinstance(result, tuple):
+            return result[0], result[1]
+        return result, 200
@@ -0,0 +1,67 @@
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, UTC
+from typing import Optional
+
+
+_lock = threading.Lock()
+_last_ms = 0
+_counter = 0
+
+# rand_a is 12 bits; its upper half starts at a random value and the lower half leaves
+# room to count, so ids minted within one millisecond stay ordered
+_COUNTER_BITS = 12
+_COUNTER_START_MAX = 1 << (_COUNTER_BITS - 1)
+
+
+def new_id() -> str:
+    """Mint a UUIDv7 string (RFC 9562) for a new trip or trip request.
+
+    The first 48 bits are the Unix time in milliseconds, so ids sort by creation
+    time both as UUIDs and as strings. New documents are appended at the right
+    edge of the unique id index instead of at random positions, and ids can be
+    used as a pagination or range key. Within one millisecond a counter keeps
+    the ids of a process strictly increasing; ids of different processes in the
+    same millisecond are unordered. The string format is the one of the uuid4
+    ids already stored, which stay valid.
+    """
+    global _last_ms, _counter
+    with _lock:
+        ms = time.time_ns() // 1_000_000
+        if ms > _last_ms:
+            _last_ms = ms
+            _counter = int.from_bytes(os.urandom(2), "big") % _COUNTER_START_MAX
+        else:
+            # Same millisecond, or the clock went backwards: keep counting from the last id
+            _counter += 1
+            if _counter >= 1 << _COUNTER_BITS:
+                _last_ms += 1
+                _counter = 0
+        ms, counter = _last_ms, _counter
+
+    rand_b = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+    value = (ms << 80) | (0x7 << 76) | (counter << 64) | (0b10 << 62) | rand_b
+    return str(uuid.UUID(int=value))
+
+
+def id_timestamp(id_: str) -> Optional[datetime]:
+    """Creation time of a UUIDv7 id, or None for older (uuid4) or malformed ids."""
+    try:
+        parsed = uuid.UUID(id_)
+    except ValueError:
+        return None
+    if parsed.version != 7:
+        return None
+    return datetime.fromtimestamp((parsed.int >> 80) / 1000, UTC)
+
+
+def min_id_at(when: datetime) -> str:
+    """Smallest UUIDv7 string minted at or after `when`, e.g. for `{"trip_id": {"$gte": ...}}`.
+
+    Only UUIDv7 ids are ordered by time; range queries on a collection that
+    still holds uuid4 ids also match those at random positions.
+    """
+    ms = int(when.timestamp() * 1000)
+    return str(uuid.UUID(int=(ms << 80) | (0x7 << 76) | (0b10 << 62)))
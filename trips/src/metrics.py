@@ -0,0 +1,55 @@
+import threading
+from collections import defaultdict
+
+
+class MetricsRegistry:
+    """Thread-safe in-process registry of counters, gauges and timings.
+
+    Values are per process, so with several gunicorn workers each worker
+    reports its own numbers.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict = defaultdict(float)
+        self._gauges: dict = {}
+        self._timings: dict = {}
+
+    def incr(self, name: str, value: float = 1) -> None:
+        """Increase the counter `name` by `value`."""
+        with self._lock:
+            self._counters[name] += value
+
+    def gauge(self, name: str, value: float) -> None:
+        """Set the gauge `name` to its current `value`."""
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        """Record one observation (e.g. a duration in ms) for the timing `name`."""
+        with self._lock:
+            count, total, maximum = self._timings.get(name, (0, 0.0, 0.0))
+            self._timings[name] = (count + 1, total + value, max(maximum, value))
+
+    def snapshot(self) -> dict:
+        """Return a JSON-serializable copy of all metrics."""
+        with self._lock:
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "timings": {
+                    name: {"count": count, "avg": total / count, "max": maximum}
+                    for name, (count, total, maximum) in self._timings.items()
+                },
+            }
+
+    def reset(self) -> None:
+        """Drop all recorded values."""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._timings.clear()
+
+
+# Process-wide registry used by the service
+metrics = MetricsRegistry()
@@ -0,0 +1,401 @@
+import argparse
+import logging
+import sys
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, UTC
+from typing import Any, Callable, List, Optional
+
+from pymongo import UpdateOne
+from pymongo.collection import Collection
+from pymongo.database import Database
+from pymongo.errors import DuplicateKeyError
+
+from src.bll_models import TripRequestStatus, normalize_destination
+from src.metrics import metrics
+from src.notification_manager import index_unindexed_requests
+from src.trip_manager import TRIP_INDEXES
+from src.trip_request_manager import REQUEST_INDEXES
+
+
+logger = logging.getLogger("trips-migrations")
+
+# Collection recording applied migrations and the progress of running ones
+MIGRATIONS_COLLECTION = "schema_migrations"
+
+# `_id` of the lease document in MIGRATIONS_COLLECTION held by the running runner
+LOCK_ID = "lock"
+
+
+class MigrationLockedError(Exception):
+    """Raised when another runner holds (or took over) the migration lease."""
+
+
+class Step(ABC):
+    """One idempotent unit of a migration; progress is recorded per step."""
+
+    name: str
+
+    @abstractmethod
+    def run(self, db: Database, runner: "MigrationRunner", checkpoint: Any, save: Callable[[Any, int], None]) -> None:
+        """Apply the step, resuming after `checkpoint` and reporting progress through `save`."""
+
+
+class CreateIndex(Step):
+    """Build an index, e.g. for a field filled by a preceding backfill.
+
+    Building a large index in a migration keeps it out of app startup; creating
+    an index that already exists with the same keys and options does nothing.
+    """
+
+    def __init__(self, collection: str, keys: list, **options):
+        """Initialize CreateIndex.
+
+        Args:
+            collection: Name of the collection to index.
+            keys: Index keys as passed to `create_index`, e.g. `[("destination_key", 1)]`.
+            **options: `create_index` options, e.g. `unique=True`.
+        """
+        self.collection = collection
+        self.keys = keys
+        self.options = options
+        self.name = f"index:{collection}:" + "_".join(
+            f"{field.replace('.', '-')}_{direction}" for field, direction in keys  # no dots in state paths
+        )
+
+    def run(self, db, runner, checkpoint, save):
+        db.get_collection(self.collection).create_index(self.keys, **self.options)
+
+
+class Backfill(Step):
+    """Update existing documents in `_id` order, in throttled batches.
+
+    Only documents matching `filter` are touched and the filter is checked again
+    by every update, so a backfill is safe to rerun and never overwrites
+    documents that the application already wrote in the new shape. The last
+    `_id` of every batch is checkpointed, so an interrupted backfill resumes
+    where it stopped instead of rescanning.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        collection: str,
+        filter: dict,
+        update: Callable[[dict], Optional[dict]],
+        projection: Optional[dict] = None,
+    ):
+        """Initialize Backfill.
+
+        Args:
+            name: Step name, unique within its migration.
+            collection: Name of the collection to update.
+            filter: Matches the documents still to update, e.g. `{"field": {"$exists": False}}`.
+            update: Builds the update document (e.g. `{"$set": ...}`) for one
+                document, or returns None to leave it as it is.
+            projection: Fields `update` needs; all fields by default.
+        """
+        self.name = name
+        self.collection = collection
+        self.filter = filter
+        self.update = update
+        self.projection = projection
+
+    def run(self, db, runner, checkpoint, save):
+        collection = db.get_collection(self.collection)
+        batch_size = runner.batch_size
+        processed = 0
+        while True:
+            query = dict(self.filter)
+            if checkpoint is not None:
+                query["_id"] = {"$gt": checkpoint}
+            started = time.monotonic()
+            batch = list(collection.find(query, self.projection).sort("_id", 1).limit(batch_size))
+            if not batch:
+                return
+            written = self.process(db, collection, batch)
+            elapsed = time.monotonic() - started
+
+            checkpoint = batch[-1]["_id"]
+            processed += len(batch)
+            save(checkpoint, processed)
+            metrics.incr(f"migrations.{self.collection}.backfilled", written)
+            batch_size = runner.throttle(len(batch), elapsed, batch_size)
+
+    def process(self, db: Database, collection: Collection, batch: List[dict]) -> int:
+        """Apply `update` to one batch; returns the number of documents written."""
+        updates = []
+        for doc in batch:
+            update = self.update(doc)
+            if update:
+                updates.append(UpdateOne({**self.filter, "_id": doc["_id"]}, update))
+        if updates:
+            collection.bulk_write(updates, ordered=False)
+        return len(updates)
+
+
+class EachBatch(Backfill):
+    """Hand existing documents to a function in throttled, checkpointed batches.
+
+    For backfills that write elsewhere than the scanned documents, e.g. a derived
+    collection; the function must skip documents it already handled.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        collection: str,
+        filter: dict,
+        handle: Callable[[Database, List[dict]], int],
+        projection: Optional[dict] = None,
+    ):
+        """Initialize EachBatch.
+
+        Args:
+            name: Step name, unique within its migration.
+            collection: Name of the collection to scan.
+            filter: Matches the documents to hand over.
+            handle: Called with the database and each batch; returns the number of documents written.
+            projection: Fields `handle` needs; all fields by default.
+        """
+        super().__init__(name, collection, filter, update=lambda doc: None, projection=projection)
+        self.handle = handle
+
+    def process(self, db, collection, batch):
+        return self.handle(db, batch)
+
+
+class Migration:
+    """A versioned schema change: steps applied in order, each exactly once."""
+
+    def __init__(self, version: int, description: str, steps: List[Step]):
+        """Initialize Migration.
+
+        Args:
+            version: Position in the migration history; never reuse or reorder versions.
+            description: What the migration changes, shown by `status`.
+            steps: Steps applied in order; their names must be unique.
+        """
+        if len({step.name for step in steps}) != len(steps):
+            raise ValueError(f"Migration {version} has duplicate step names")
+        self.version = version
+        self.description = description
+        self.steps = steps
+
+
+def _destination_key(doc: dict) -> Optional[dict]:
+    """Update setting `destination_key` on a trip request stored before it existed."""
+    if "destination" not in doc:
+        return None
+    return {"$set": {"destination_key": normalize_destination(doc["destination"])}}
+
+
+def _index_pending_requests(db: Database, batch: List[dict]) -> int:
+    """Add notification index postings for pending requests created before the index existed."""
+    return index_unindexed_requests(db.get_collection("trip_request_index"), batch)
+
+
+# The migration history; append new migrations with the next version
+MIGRATIONS = [
+    Migration(1, "Backfill trip request destination keys and build the trip request indexes", [
+        Backfill("destination_key", "trip_requests", {"destination_key": {"$exists": False}},
+                 _destination_key, {"destination": 1}),
+        Backfill("archive_destination_key", "trip_requests_archive", {"destination_key": {"$exists": False}},
+                 _destination_key, {"destination": 1}),
+        # After the backfill, so driver search never sees requests without a key
+        *(CreateIndex("trip_requests", keys) for keys in REQUEST_INDEXES),
+    ]),
+    Migration(2, "Build the trip indexes", [
+        # Partitions get these indexes when they are first used (TripManager.create_partition_indexes)
+        *(CreateIndex("trips", keys) for keys in TRIP_INDEXES),
+    ]),
+    Migration(3, "Index pending trip requests for new-trip notifications", [
+        EachBatch("notification_postings", "trip_requests", {"status": TripRequestStatus.PENDING.value},
+                  _index_pending_requests),
+    ]),
+]
+
+
+class MigrationRunner:
+    """Applies pending migrations and records them in `schema_migrations`.
+
+    One document per migration holds its state and the checkpoint of every
+    step, so a run can be interrupted at any point and resumed by running again.
+    Backfills are throttled to protect live traffic: they write at most `rate`
+    documents per second and halve their batch size whenever a batch takes
+    longer than `max_batch_seconds`, i.e. when the database is busy.
+
+    Only one runner applies migrations at a time: it holds a lease in
+    `schema_migrations`, renewed after every batch, which another runner can
+    only take once it ran out, e.g. after a crash.
+    """
+
+    def __init__(
+        self,
+        db: Database,
+        migrations: Optional[List[Migration]] = None,
+        batch_size: int = 500,
+        rate: float = 1000.0,
+        max_batch_seconds: float = 0.5,
+        min_batch_size: int = 10,
+        lease_seconds: float = 300.0,
+    ):
+        """Initialize MigrationRunner.
+
+        Args:
+            db: The trips database.
+            migrations: Migration history; defaults to `MIGRATIONS`.
+            batch_size: Documents read and updated per backfill batch.
+            rate: Maximum backfilled documents per second; 0 disables the limit.
+            max_batch_seconds: Batches slower than this halve the batch size, down to
+                `min_batch_size`; fast batches grow it back to `batch_size`.
+            min_batch_size: Smallest batch size the backpressure shrinks to.
+            lease_seconds: How long the lock outlives a runner that stopped renewing it.
+        """
+        self.migrations = sorted(MIGRATIONS if migrations is None else migrations, key=lambda m: m.version)
+        versions = [m.version for m in self.migrations]
+        if len(set(versions)) != len(versions):
+            raise ValueError("Migration versions must be unique")
+        self.db = db
+        self.collection = db.get_collection(MIGRATIONS_COLLECTION)
+        self.batch_size = batch_size
+        self.rate = rate
+        self.max_batch_seconds = max_batch_seconds
+        self.min_batch_size = min_batch_size
+        self.lease = timedelta(seconds=lease_seconds)
+        self.owner = uuid.uuid4().hex
+
+    def status(self) -> List[dict]:
+        """State of every migration: "applied", "partial" (started, not finished) or "pending"."""
+        records = {r["_id"]: r for r in self.collection.find({})}
+        result = []
+        for migration in self.migrations:
+            record = records.get(migration.version, {})
+            state = "applied" if record.get("applied_at") else "partial" if record else "pending"
+            result.append({
+                "version": migration.version,
+                "description": migration.description,
+                "state": state,
+                "applied_at": record.get("applied_at"),
+            })
+        return result
+
+    def run(self, target: Optional[int] = None) -> List[int]:
+        """Apply pending migrations in version order, up to and including `target`.
+
+        Returns:
+            The versions applied by this run.
+
+        Raises:
+            MigrationLockedError: If another runner is applying migrations.
+        """
+        self._acquire()
+        try:
+            applied = []
+            for migration in self.migrations:
+                if target is not None and migration.version > target:
+                    break
+                if self._apply(migration):
+                    applied.append(migration.version)
+            return applied
+        finally:
+            self.collection.delete_one({"_id": LOCK_ID, "owner": self.owner})
+
+    def _acquire(self) -> None:
+        """Take the lease, unless another runner holds an unexpired one."""
+        now = datetime.now(UTC)
+        try:
+            self.collection.find_one_and_update(
+                {"_id": LOCK_ID, "$or": [{"locked_until": {"$lte": now}}, {"owner": self.owner}]},
+                {"$set": {"owner": self.owner, "locked_until": now + self.lease}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            # The lease exists and is held by another runner, so the upsert collided
+            raise MigrationLockedError("Another runner is applying migrations")
+
+    def _renew(self) -> None:
+        """Extend the lease; stops the run if another runner took it over meanwhile."""
+        result = self.collection.update_one(
+            {"_id": LOCK_ID, "owner": self.owner},
+            {"$set": {"locked_until": datetime.now(UTC) + self.lease}},
+        )
+        if result.matched_count == 0:
+            raise MigrationLockedError("The migration lease was lost to another runner")
+
+    def _apply(self, migration: Migration) -> bool:
+        """Apply the unfinished steps of a migration; returns False if it was already applied."""
+        record = self.collection.find_one({"_id": migration.version}) or {}
+        if record.get("applied_at"):
+            return False
+        self.collection.update_one(
+            {"_id": migration.version},
+            {"$set": {"description": migration.description},
+             "$setOnInsert": {"started_at": datetime.now(UTC)}},
+            upsert=True,
+        )
+        steps = record.get("steps", {})
+        for step in migration.steps:
+            progress = steps.get(step.name, {})
+            if progress.get("done"):
+                continue
+            logger.info(f"Migration {migration.version}: running {step.name}")
+
+            def save(checkpoint, processed, step=step):
+                self._renew()
+                self.collection.update_one({"_id": migration.version}, {"$set": {
+                    f"steps.{step.name}.checkpoint": checkpoint,
+                    f"steps.{step.name}.processed": processed,
+                }})
+
+            step.run(self.db, self, progress.get("checkpoint"), save)
+            self._renew()
+            self.collection.update_one({"_id": migration.version}, {"$set": {f"steps.{step.name}.done": True}})
+        self.collection.update_one({"_id": migration.version}, {"$set": {"applied_at": datetime.now(UTC)}})
+        logger.info(f"Migration {migration.version} applied: {migration.description}")
+        return True
+
+    def throttle(self, documents: int, elapsed: float, batch_size: int) -> int:
+        """Pause after a backfill batch to honor `rate`; returns the size of the next batch."""
+        if elapsed > self.max_batch_seconds:
+            batch_size = max(self.min_batch_size, batch_size // 2)
+        elif elapsed < self.max_batch_seconds / 2:
+            batch_size = min(self.batch_size, batch_size * 2)
+        if self.rate:
+            time.sleep(max(0.0, documents / self.rate - elapsed))
+        return batch_size
+
+
+def main(argv=None):
+    """Show or apply schema migrations."""
+    from src.db import get_database
+
+    parser = argparse.ArgumentParser(description="Apply versioned schema migrations and backfills.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="List migrations and whether they are applied.")
+    up = sub.add_parser("up", help="Apply pending migrations.")
+    up.add_argument("--to", type=int, default=None, help="Last version to apply; all by default.")
+    up.add_argument("--batch-size", type=int, default=500)
+    up.add_argument("--rate", type=float, default=1000.0, help="Maximum backfilled documents per second; 0 for none.")
+    up.add_argument("--max-batch-seconds", type=float, default=0.5,
+                    help="Batches slower than this halve the batch size.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    db = get_database()
+    if args.command == "status":
+        for entry in MigrationRunner(db).status():
+            logger.info(f"{entry['version']:4d} {entry['state']:8s} {entry['description']}")
+        return
+    runner = MigrationRunner(db, batch_size=args.batch_size, rate=args.rate, max_batch_seconds=args.max_batch_seconds)
+    try:
+        applied = runner.run(args.to)
+    except MigrationLockedError as e:
+        logger.error(str(e))
+        sys.exit(1)
+    logger.info(f"Applied migrations: {applied or 'none'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, UTC
+from typing import List, Optional
+
+from pymongo import DESCENDING
+from pymongo.client_session import ClientSession
+from pymongo.collection import Collection
+
+from src.bll_models import MAX_REQUEST_WINDOW, TripRequest, TripRequestStatus, normalize_destination
+from src.metrics import metrics
+
+
+logger = logging.getLogger("trips-ms")
+
+# Projection leaving out Mongo's `_id`, which the API does not use
+NO_ID = {"_id": 0}
+
+# Notifications are inserted in chunks of this size
+INSERT_CHUNK = 1000
+
+
+def _utc_day(value: datetime) -> date:
+    """Calendar day of a datetime in UTC; naive datetimes (as read from MongoDB) are UTC already."""
+    if value.tzinfo is not None:
+        value = value.astimezone(UTC)
+    return value.date()
+
+
+def index_key(destination: str, day: date) -> str:
+    """Inverted index key of a destination and a start day, e.g. "lake tahoe|2025-06-01"."""
+    return f"{normalize_destination(destination)}|{day.isoformat()}"
+
+
+class NotificationManager:
+    """Notifies passengers when a trip matching one of their pending requests is created.
+
+    Pending requests are registered in an inverted index with one posting per
+    day of their start window, keyed by normalized destination and day. A new
+    trip looks up the single key of its destination and start day instead of
+    scanning all requests, and every match gets a notification in the
+    passenger's inbox.
+    """
+
+    def __init__(
+        self,
+        db_collection: Collection,
+        index_collection: Collection,
+        async_fan_out: bool = False,
+        ttl_seconds: int = 90 * 24 * 60 * 60,
+    ):
+        """Initialize NotificationManager.
+
+        Args:
+            db_collection: MongoDB collection holding the notifications (the inboxes).
+            index_collection: MongoDB collection holding the inverted index postings.
+            async_fan_out: If set, `fan_out` runs on a background thread so creating
+                a trip does not wait for it. Notifications of a crashing worker's
+                queued fan-outs are lost.
+            ttl_seconds: How long notifications are kept in the inboxes, read or not.
+        """
+        self.inbox_collection = db_collection
+        self.index_collection = index_collection
+        self.inbox_collection.create_index([("passenger_id", 1), ("created_at", DESCENDING)])
+        self.inbox_collection.create_index("created_at", expireAfterSeconds=ttl_seconds)
+        self.index_collection.create_index([("key", 1), ("earliest_start_date", 1)])
+        self.index_collection.create_index("request_id")
+        # Postings expire with their request's start window
+        self.index_collection.create_index("latest_start_date", expireAfterSeconds=0)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fan-out") if async_fan_out else None
+
+    def index_request(self, trip_request: TripRequest, session: Optional[ClientSession] = None) -> int:
+        """Add postings for a pending request, one per day of its start window.
+
+        Returns:
+            The number of postings written.
+        """
+        postings = self.postings(trip_request)
+        self.index_collection.insert_many(postings, ordered=False, session=session)
+        return len(postings)
+
+    @staticmethod
+    def postings(trip_request: TripRequest) -> List[dict]:
+        """Build the index postings of a request, e.g. for bulk loading.
+
+        Windows are validated to be at most MAX_REQUEST_WINDOW long; longer ones
+        stored before that check are only indexed for their first days.
+        """
+        first = _utc_day(trip_request.earliest_start_date)
+        last = min(_utc_day(trip_request.latest_start_date), first + MAX_REQUEST_WINDOW)
+        return [
+            {
+                "key": index_key(trip_request.destination, first + timedelta(days=i)),
+                "request_id": trip_request.request_id,
+                "passenger_id": trip_request.passenger_id,
+                "earliest_start_date": trip_request.earliest_start_date,
+                "latest_start_date": trip_request.latest_start_date,
+            }
+            for i in range((last - first).days + 1)
+        ]
+
+    def index_stored_requests(self, requests: List[dict]) -> int:
+        """Add postings for pending requests just written to the database, e.g. by a
+        write-behind flush. Requests that already have postings are skipped, so a
+        retried flush does not index them twice.
+
+        Returns:
+            The number of requests indexed.
+        """
+        pending = [r for r in requests if r.get("status") == TripRequestStatus.PENDING]
+        return index_unindexed_requests(self.index_collection, pending)
+
+    def unindex_request(self, request_id: str, session: Optional[ClientSession] = None) -> None:
+        """Remove the postings of a request that is no longer pending."""
+        self.index_collection.delete_many({"request_id": request_id}, session=session)
+
+    def notify_trip_created(self, trip: dict) -> None:
+        """Fan out a newly stored trip, in the background if `async_fan_out` is set."""
+        if self._executor:
+            self._executor.submit(self._fan_out_logged, trip)
+        else:
+            self.fan_out(trip)
+
+    def fan_out(self, trip: dict) -> int:
+        """Notify the passengers of all pending requests matching `trip`.
+
+        A request matches if its destination equals the trip's (ignoring case and
+        spacing) and the trip starts within its start window.
+
+        Returns:
+            The number of notifications created.
+        """
+        started = time.perf_counter()
+        start = trip["start_datetime"]
+        postings = self.index_collection.find(
+            {
+                "key": index_key(trip["destination"], _utc_day(start)),
+                "earliest_start_date": {"$lte": start},
+                "latest_start_date": {"$gte": start},
+            },
+            {"_id": 0, "request_id": 1, "passenger_id": 1},
+        )
+
+        now = datetime.now(UTC)
+        notifications = [
+            {
+                "passenger_id": p["passenger_id"],
+                "request_id": p["request_id"],
+                "trip_id": trip["trip_id"],
+                "destination": trip["destination"],
+                "start_datetime": start,
+                "read": False,
+                "created_at": now,
+            }
+            for p in postings
+            if p["passenger_id"] != trip.get("driver_id")
+        ]
+        for i in range(0, len(notifications), INSERT_CHUNK):
+            self.inbox_collection.insert_many(notifications[i:i + INSERT_CHUNK], ordered=False)
+
+        metrics.observe("notifications.fan_out_ms", (time.perf_counter() - started) * 1000)
+        metrics.observe("notifications.matches_per_trip", len(notifications))
+        return len(notifications)
+
+    def get_notifications(self, passenger_id: str, unread_only: bool = False, limit: int = 50) -> List[dict]:
+        """Return a passenger's newest notifications first."""
+        query: dict = {"passenger_id": passenger_id}
+        if unread_only:
+            query["read"] = False
+        return list(self.inbox_collection.find(query, NO_ID).sort("created_at", DESCENDING).limit(limit))
+
+    def mark_read(self, passenger_id: str, trip_ids: Optional[List[str]] = None) -> int:
+        """Mark a passenger's notifications about `trip_ids` as read, or all of them if None.
+
+        Returns:
+            The number of notifications that were unread.
+        """
+        query: dict = {"passenger_id": passenger_id, "read": False}
+        if trip_ids is not None:
+            query["trip_id"] = {"$in": trip_ids}
+        return self.inbox_collection.update_many(query, {"$set": {"read": True}}).modified_count
+
+    def _fan_out_logged(self, trip: dict) -> None:
+        """Background fan-out; failures are logged since no caller is waiting for them."""
+        try:
+            self.fan_out(trip)
+        except Exception:
+            logger.error(f"Notification fan-out failed for trip {trip.get('trip_id')}", exc_info=True)
+
+
+def index_unindexed_requests(index_collection: Collection, requests: List[dict]) -> int:
+    """Add postings for stored pending requests that have none, e.g. ones created before the index existed.
+
+    Requests whose start window has passed or that already have postings are skipped.
+
+    Returns:
+        The number of requests indexed.
+    """
+    now = datetime.now(UTC)
+    current = [
+        r for r in requests
+        if (r["latest_start_date"] if r["latest_start_date"].tzinfo else r["latest_start_date"].replace(tzinfo=UTC)) >= now
+    ]
+    if not current:
+        return 0
+    indexed = set(index_collection.distinct("request_id", {"request_id": {"$in": [r["request_id"] for r in current]}}))
+    postings = [
+        posting
+        for r in current if r["request_id"] not in indexed
+        for posting in NotificationManager.postings(TripRequest.from_db(r))
+    ]
+    if postings:
+        index_collection.insert_many(postings, ordered=False)
+    return len({p["request_id"] for p in postings})
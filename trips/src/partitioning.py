@@ -0,0 +1,301 @@
+import argparse
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, UTC
+from typing import Callable, Dict, Iterable, List, Optional
+
+from pymongo import DeleteOne, InsertOne
+from pymongo.client_session import ClientSession
+from pymongo.collection import Collection
+from pymongo.database import Database
+from pymongo.errors import BulkWriteError
+from pymongo.read_preferences import _ServerMode
+
+from src.metrics import metrics
+from src.read_routing import for_reads
+
+
+logger = logging.getLogger("trips-partitioning")
+
+
+def _month(when: datetime) -> str:
+    """Partition suffix of a datetime, e.g. "2026_01"; naive datetimes (as read from MongoDB) are UTC."""
+    if when.tzinfo is not None:
+        when = when.astimezone(UTC)
+    return f"{when.year:04d}_{when.month:02d}"
+
+
+def list_partitions(db: Database, base_name: str) -> List[str]:
+    """Names of the existing monthly partitions of `base_name`, in month order."""
+    pattern = rf"^{re.escape(base_name)}_\d{{4}}_\d{{2}}$"
+    return sorted(db.list_collection_names(filter={"name": {"$regex": pattern}}))
+
+
+def _unchanged(doc: dict) -> dict:
+    """Filter matching `doc` only while it is stored exactly as given."""
+    return {"_id": doc["_id"], "$expr": {"$eq": ["$$ROOT", {"$literal": doc}]}}
+
+
+class PartitionSet:
+    """Per-month partitions of a collection, e.g. `trips_2026_01`, `trips_2026_02`.
+
+    Documents are routed by `key_field` (a datetime that never changes), so
+    queries bounded in time only read the months they overlap. Since each
+    document's month is unknown from its id alone, a directory collection maps
+    ids to partitions; an in-process LRU cache in front of it keeps most id
+    lookups at a single round trip to the partition itself. The cache is also
+    filled from list results, so opening a listed document costs no directory read.
+    """
+
+    def __init__(
+        self,
+        db: Database,
+        base_name: str,
+        id_field: str,
+        key_field: str,
+        directory_collection: Collection,
+        create_indexes: Optional[Callable[[Collection], None]] = None,
+        read_preference: Optional[_ServerMode] = None,
+        lookback: timedelta = timedelta(days=31),
+        cache_size: int = 100_000,
+        refresh_seconds: float = 30.0,
+    ):
+        """Initialize PartitionSet.
+
+        Args:
+            db: Database holding the partitions.
+            base_name: Name prefix of the partitions, e.g. "trips".
+            id_field: Unique application-level id of the documents, e.g. "trip_id".
+            key_field: Datetime field choosing the partition, e.g. "start_datetime".
+            directory_collection: Collection mapping ids to partition names.
+            create_indexes: Called with a partition the first time this process writes to it.
+            read_preference: Read preference for list reads, see `src.read_routing`.
+            lookback: How far before now documents can still be current, e.g. the
+                longest trip; queries for current documents also read the partitions
+                of this period.
+            cache_size: Number of id -> partition entries kept in memory.
+            refresh_seconds: How long the list of existing partitions is cached; partitions
+                created by other workers are read after at most this delay.
+        """
+        self.db = db
+        self.base_name = base_name
+        self.id_field = id_field
+        self.key_field = key_field
+        self.directory_collection = directory_collection
+        self.create_indexes = create_indexes
+        self.read_preference = read_preference
+        self.lookback = lookback
+        self.cache_size = cache_size
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._cache: OrderedDict = OrderedDict()
+        self._known: List[str] = []
+        self._known_at = 0.0
+        self._initialized: set = set()
+
+    def name_for(self, when: datetime) -> str:
+        """Name of the partition holding documents with key `when`."""
+        return f"{self.base_name}_{_month(when)}"
+
+    def collection(self, name: str, for_read: bool = False) -> Collection:
+        """A partition; `for_read` applies the list read preference."""
+        collection = self.db.get_collection(name)
+        return for_reads(collection, self.read_preference) if for_read else collection
+
+    def collection_for(self, when: datetime) -> Collection:
+        """The partition to insert a document with key `when` into, creating its indexes on first use."""
+        name = self.name_for(when)
+        collection = self.db.get_collection(name)
+        with self._lock:
+            first_use = name not in self._initialized
+            self._initialized.add(name)
+            if name not in self._known:
+                self._known = sorted([*self._known, name])
+        if first_use and self.create_indexes:
+            self.create_indexes(collection)
+        return collection
+
+    def names(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> List[str]:
+        """Existing partitions overlapping [start, end] in month order; open bounds are unbounded."""
+        if time.monotonic() - self._known_at > self.refresh_seconds:
+            existing = list_partitions(self.db, self.base_name)
+            with self._lock:
+                self._known = sorted(set(existing) | set(self._known))
+                self._known_at = time.monotonic()
+        low = self.name_for(start) if start else None
+        high = self.name_for(end) if end else None
+        return [n for n in self._known if (low is None or n >= low) and (high is None or n <= high)]
+
+    def register(self, doc_id: str, name: str, session: Optional[ClientSession] = None) -> None:
+        """Record the partition of a new document in the directory."""
+        self.directory_collection.insert_one({"_id": doc_id, "p": name}, session=session)
+        self._cache_put(doc_id, name)
+
+    def remember(self, docs: Iterable[dict]) -> None:
+        """Cache the partitions of documents read from a partition, e.g. a page of results."""
+        for doc in docs:
+            if self.id_field in doc and self.key_field in doc:
+                self._cache_put(doc[self.id_field], self.name_for(doc[self.key_field]))
+
+    def locate(self, doc_id: str) -> Optional[str]:
+        """Name of the partition holding `doc_id`, or None if the directory does not know it."""
+        with self._lock:
+            name = self._cache.get(doc_id)
+            if name:
+                self._cache.move_to_end(doc_id)
+        if name:
+            metrics.incr("partitions.directory.hit")
+            return name
+        metrics.incr("partitions.directory.miss")
+        entry = self.directory_collection.find_one({"_id": doc_id})
+        if not entry:
+            return None
+        self._cache_put(doc_id, entry["p"])
+        return entry["p"]
+
+    def locate_many(self, doc_ids: List[str]) -> Dict[str, str]:
+        """Partitions of several ids, with a single directory query for the uncached ones."""
+        found = {}
+        with self._lock:
+            for doc_id in doc_ids:
+                if doc_id in self._cache:
+                    found[doc_id] = self._cache[doc_id]
+        misses = [doc_id for doc_id in doc_ids if doc_id not in found]
+        if misses:
+            for entry in self.directory_collection.find({"_id": {"$in": misses}}):
+                found[entry["_id"]] = entry["p"]
+                self._cache_put(entry["_id"], entry["p"])
+        return found
+
+    def forget(self, doc_id: str, session: Optional[ClientSession] = None) -> None:
+        """Remove a deleted document from the directory."""
+        self.directory_collection.delete_one({"_id": doc_id}, session=session)
+        with self._lock:
+            self._cache.pop(doc_id, None)
+
+    def forget_many(self, doc_ids: List[str]) -> None:
+        """Remove several deleted documents from the directory, e.g. an archived batch."""
+        if not doc_ids:
+            return
+        self.directory_collection.delete_many({"_id": {"$in": doc_ids}})
+        with self._lock:
+            for doc_id in doc_ids:
+                self._cache.pop(doc_id, None)
+
+    def drop_before(self, when: datetime) -> List[str]:
+        """Drop whole partitions of months before `when`, e.g. for retention; returns their names.
+
+        Their directory entries are removed too. This replaces archiving documents one by one.
+        """
+        cutoff = self.name_for(when)
+        dropped = [n for n in self.names() if n < cutoff]
+        for name in dropped:
+            self.directory_collection.delete_many({"p": name})
+            self.db.drop_collection(name)
+        with self._lock:
+            self._known = [n for n in self._known if n not in dropped]
+            self._cache = OrderedDict((k, v) for k, v in self._cache.items() if v not in dropped)
+        return dropped
+
+    def migrate(self, source: Collection, batch_size: int = 1000) -> int:
+        """Move the documents of an unpartitioned collection into the partitions.
+
+        Safe to rerun after an interruption: documents already copied are skipped
+        and each batch is only deleted from `source` once it is in its partitions.
+        A document is only deleted while it still equals its copy; one updated in
+        `source` meanwhile (e.g. a passenger joining) gets its copy replaced and
+        moves with a later batch. If its copy was updated as well, both versions
+        are kept and the document stays in `source`, logged for manual repair.
+
+        Returns:
+            The number of documents moved.
+        """
+        moved = 0
+        conflicts: list = []
+        while True:
+            # `_id` is kept: its ObjectId is the creation time exports use as watermark
+            query = {"_id": {"$nin": conflicts}} if conflicts else {}
+            batch = list(source.find(query).limit(batch_size))
+            if not batch:
+                break
+            by_partition: Dict[str, List[dict]] = {}
+            for doc in batch:
+                by_partition.setdefault(self.name_for(doc[self.key_field]), []).append(doc)
+            for name, docs in by_partition.items():
+                when = docs[0][self.key_field]
+                self._insert_ignoring_duplicates(self.collection_for(when), docs)
+                self._insert_ignoring_duplicates(
+                    self.directory_collection, [{"_id": d[self.id_field], "p": name} for d in docs]
+                )
+            deleted = source.bulk_write([DeleteOne(_unchanged(d)) for d in batch], ordered=False).deleted_count
+            if deleted < len(batch):
+                conflicts += self._recopy_changed(source, batch)
+            moved += deleted
+            logger.info(f"Moved {moved} documents into partitions")
+        if conflicts:
+            logger.error(f"{len(conflicts)} documents changed in both {source.name} and their partition, "
+                         f"left in {source.name}: {conflicts}")
+        return moved
+
+    def _recopy_changed(self, source: Collection, batch: List[dict]) -> list:
+        """Replace the copies of documents updated in `source` since they were copied.
+
+        Returns:
+            The `_id`s of documents whose copy was updated too, so neither version may replace the other.
+        """
+        copied = {d["_id"]: d for d in batch}
+        conflicts = []
+        for current in source.find({"_id": {"$in": list(copied)}}):
+            copy = copied[current["_id"]]
+            partition = self.db.get_collection(self.name_for(copy[self.key_field]))
+            if partition.replace_one(_unchanged(copy), current).matched_count == 0:
+                conflicts.append(current["_id"])
+        return conflicts
+
+    @staticmethod
+    def _insert_ignoring_duplicates(collection: Collection, docs: List[dict]) -> None:
+        """Insert documents, skipping those already present (duplicate key errors)."""
+        try:
+            collection.bulk_write([InsertOne(d) for d in docs], ordered=False)
+        except BulkWriteError as e:
+            if any(error["code"] != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+
+    def _cache_put(self, doc_id: str, name: str) -> None:
+        """Add an id to the LRU cache, evicting the least recently used entry if full."""
+        with self._lock:
+            self._cache[doc_id] = name
+            self._cache.move_to_end(doc_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+
+def main(argv=None):
+    """Move existing trips into monthly partitions, or drop old partitions."""
+    from src.db import get_database
+    from src.trip_manager import create_trip_partitions
+
+    parser = argparse.ArgumentParser(description="Manage the monthly trip partitions.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    migrate = sub.add_parser("migrate", help="Move trips from the trips collection into partitions.")
+    migrate.add_argument("--batch-size", type=int, default=1000)
+    drop = sub.add_parser("drop-before", help="Drop the partitions of months before a date.")
+    drop.add_argument("date", type=datetime.fromisoformat)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    db = get_database()
+    partitions = create_trip_partitions(db)
+    if args.command == "migrate":
+        moved = partitions.migrate(db.get_collection("trips"), args.batch_size)
+        logger.info(f"Migration complete, {moved} trips moved")
+    else:
+        when = args.date if args.date.tzinfo else args.date.replace(tzinfo=UTC)
+        logger.info(f"Dropped partitions: {partitions.drop_before(when)}")
+
+
+if __name__ == "__main__":
+    main()
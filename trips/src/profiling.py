@@ -0,0 +1,234 @@
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, UTC
+from typing import List, Optional
+
+from flask import g, request
+
+from src.metrics import metrics
+
+
+# Sent together with a valid X-Admin-Token to profile a single request
+PROFILE_HEADER = "X-Profile"
+
+# Returned on profiled responses; fetch the profile at /admin/profiles/<id>
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+PROFILE_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+def _frame_label(code) -> str:
+    """Flame graph label of a code object, e.g. "TripManager.get_all_trips (src/trip_manager.py:95)"."""
+    path = "/".join(code.co_filename.replace("\\", "/").split("/")[-2:])
+    return f"{code.co_qualname} ({path}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples the call stack of one thread into collapsed stacks.
+
+    A background thread reads the target thread's current frame every
+    `interval` seconds and counts each distinct stack, root first, in the
+    collapsed format of flamegraph.pl and speedscope ("a;b;c 12"). The sampler
+    needs the GIL to read the stack, so a CPU-bound request is sampled at most
+    once per interpreter switch interval (5 ms by default).
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+
+    def start(self) -> "StackSampler":
+        """Start sampling."""
+        self._thread.start()
+        return self
+
+    def stop(self) -> Counter:
+        """Stop sampling and return the sample count per collapsed stack."""
+        self._stopped.set()
+        self._thread.join()
+        return self.stacks
+
+    def collapsed(self) -> str:
+        """The samples in collapsed stack format, most frequent stacks first."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def _run(self) -> None:
+        """Sample until stopped."""
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            self.stacks[";".join(reversed(labels))] += 1
+
+
+class ProfileStore:
+    """Bounded directory of request profiles.
+
+    Each profile is a collapsed stacks file `<id>.folded` plus its metadata in
+    `<id>.json`. The oldest profiles are deleted once more than `max_profiles`
+    are kept or they take up more than `max_bytes`. Workers may share the
+    directory.
+    """
+
+    def __init__(self, directory: str, max_profiles: int = 100, max_bytes: int = 50 * 1024 * 1024):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def save(self, meta: dict, collapsed: str) -> None:
+        """Store a profile; `meta` must contain its `profile_id`."""
+        profile_id = meta["profile_id"]
+        self._write(f"{profile_id}.folded", collapsed)
+        # Metadata last: a profile is only listed once its stacks are complete
+        self._write(f"{profile_id}.json", json.dumps(meta))
+        self._evict()
+
+    def list(self) -> List[dict]:
+        """Return the metadata of all stored profiles, newest first."""
+        profiles = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                # Evicted or being written by another worker
+                continue
+        return sorted(profiles, key=lambda p: p["created_at"], reverse=True)
+
+    def get(self, profile_id: str) -> Optional[str]:
+        """Return a profile's collapsed stacks, or None if it does not exist."""
+        if not PROFILE_ID_PATTERN.match(profile_id):
+            return None
+        try:
+            with open(os.path.join(self.directory, f"{profile_id}.folded"), encoding="utf-8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, name: str, content: str) -> None:
+        """Write a file atomically, so readers never see a partial profile."""
+        path = os.path.join(self.directory, name)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp, path)
+
+    def _evict(self) -> None:
+        """Delete the oldest profiles beyond the count and size bounds."""
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith(".folded"):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name[:-len(".folded")]))
+        entries.sort(reverse=True)
+
+        kept, total = 0, 0
+        for _, size, profile_id in entries:
+            kept += 1
+            total += size
+            if kept > self.max_profiles or total > self.max_bytes:
+                for suffix in (".json", ".folded"):
+                    try:
+                        os.remove(os.path.join(self.directory, profile_id + suffix))
+                    except FileNotFoundError:
+                        pass
+                metrics.incr("profiling.evicted")
+
+
+def register_profiling(app, store: ProfileStore, sample_rate: float = 0.0, interval: float = 0.005,
+                       max_concurrent: int = 2):
+    """Registers opt-in per-request profiling.
+
+    A request is profiled if it carries `X-Profile: 1` with a valid admin token,
+    or with probability `sample_rate`. Its profile id is returned in
+    `X-Profile-Id`. Profiles end when the response is fully sent, so streamed
+    responses are profiled completely. Only call this when profiling is
+    configured: without it no hook runs at all.
+
+    Args:
+        store: Where profiles are stored.
+        sample_rate: Share of requests profiled without the header.
+        interval: Seconds between stack samples.
+        max_concurrent: Profiles running at once per worker; further requests are not profiled.
+    """
+    from src.admin_routes import is_admin_request
+
+    app.config["profile_store"] = store
+    slots = threading.BoundedSemaphore(max_concurrent)
+
+    @app.before_request
+    def start_profile():
+        """Start sampling the request thread if the request is selected."""
+        if request.headers.get(PROFILE_HEADER) == "1" and is_admin_request():
+            trigger = "header"
+        elif sample_rate and random.random() < sample_rate:
+            trigger = "sample"
+        else:
+            return None
+        if not slots.acquire(blocking=False):
+            metrics.incr("profiling.skipped")
+            return None
+        g.profile = {
+            "profile_id": uuid.uuid4().hex,
+            "trigger": trigger,
+            "started": time.perf_counter(),
+            "cpu_started": time.thread_time(),
+            "sampler": StackSampler(threading.get_ident(), interval).start(),
+        }
+        return None
+
+    @app.after_request
+    def add_profile_id(response):
+        """Return the profile id and remember the status for the metadata."""
+        profile = g.get("profile")
+        if profile:
+            profile["status"] = response.status_code
+            response.headers[PROFILE_ID_HEADER] = profile["profile_id"]
+        return response
+
+    @app.teardown_request
+    def save_profile(exc):
+        """Stop sampling and store the profile once the response is complete."""
+        profile = g.pop("profile", None)
+        if not profile:
+            return
+        try:
+            sampler: StackSampler = profile["sampler"]
+            stacks = sampler.stop()
+            meta = {
+                "profile_id": profile["profile_id"],
+                "created_at": datetime.now(UTC).isoformat(),
+                "method": request.method,
+                "path": request.full_path.rstrip("?"),
+                "endpoint": request.endpoint,
+                "status": profile.get("status", 500),
+                "trigger": profile["trigger"],
+                "wall_ms": round((time.perf_counter() - profile["started"]) * 1000, 3),
+                "cpu_ms": round((time.thread_time() - profile["cpu_started"]) * 1000, 3),
+                "samples": sum(stacks.values()),
+                "interval_ms": interval * 1000,
+            }
+            store.save(meta, sampler.collapsed())
+            metrics.incr(f"profiling.profiles.{profile['trigger']}")
+        finally:
+            slots.release()
@@ -0,0 +1,157 @@
+import math
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from src.bll_models import TripRequest, normalize_destination
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency
+    np = None
+
+
+# Relative importance of the ranking features; weights need not sum to 1
+DEFAULT_WEIGHTS = {"time": 0.4, "cost": 0.2, "seats": 0.1, "destination": 0.3}
+
+# A trip starting this many hours outside the request's window scores 1/e on time fit
+TIME_SCALE_HOURS = 24.0
+
+# Free seats beyond this do not make a trip any better
+SEATS_SATURATION = 4
+
+_NAIVE_EPOCH = datetime(1970, 1, 1)
+
+
+def _epoch(value: datetime) -> float:
+    """Seconds since the epoch; naive datetimes (as read from MongoDB) are UTC."""
+    if value.tzinfo is None:
+        # Several times faster than value.replace(tzinfo=UTC).timestamp()
+        return (value - _NAIVE_EPOCH).total_seconds()
+    return value.timestamp()
+
+
+def _trigrams(text: str) -> set:
+    """Character trigrams of a normalized destination, padded so short names still have some."""
+    padded = f"  {normalize_destination(text)} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def destination_similarity(wanted: str, offered: str) -> float:
+    """Similarity of two destinations in [0, 1]: 1 for the same place (ignoring case and
+    spacing), otherwise the Jaccard similarity of their character trigrams, so
+    "Lake Tahoe" and "South Lake Tahoe" still score high."""
+    if normalize_destination(wanted) == normalize_destination(offered):
+        return 1.0
+    a, b = _trigrams(wanted), _trigrams(offered)
+    return len(a & b) / len(a | b) if a | b else 0.0
+
+
+def _weights(weights: Optional[Dict[str, float]]) -> Dict[str, float]:
+    """Fill in default weights for the features not given."""
+    return {**DEFAULT_WEIGHTS, **(weights or {})}
+
+
+def score_python(trip_request: TripRequest, candidates: List[dict],
+                 weights: Optional[Dict[str, float]] = None) -> List[float]:
+    """Score candidate trips one by one; the reference for `score_numpy`.
+
+    Features, each in [0, 1]:
+        time: exp(-hours the trip starts outside the request's window / TIME_SCALE_HOURS)
+        cost: 1 for the cheapest candidate, 0 for the most expensive
+        seats: free seats, saturating at SEATS_SATURATION
+        destination: see `destination_similarity`
+    """
+    w = _weights(weights)
+    if not candidates:
+        return []
+    window_start = _epoch(trip_request.earliest_start_date)
+    window_end = _epoch(trip_request.latest_start_date)
+    costs = [c["cost_per_passenger"] for c in candidates]
+    cheapest, cost_range = min(costs), max(costs) - min(costs)
+    similarity: Dict[str, float] = {}
+
+    scores = []
+    for trip in candidates:
+        start = _epoch(trip["start_datetime"])
+        outside_hours = max(window_start - start, start - window_end, 0.0) / 3600
+        time_fit = math.exp(-outside_hours / TIME_SCALE_HOURS)
+        cost = 1.0 - (trip["cost_per_passenger"] - cheapest) / cost_range if cost_range else 1.0
+        seats = min(trip["capacity"] - len(trip.get("passengers", [])), SEATS_SATURATION) / SEATS_SATURATION
+        destination = trip["destination"]
+        if destination not in similarity:
+            similarity[destination] = destination_similarity(trip_request.destination, destination)
+        scores.append(
+            w["time"] * time_fit + w["cost"] * cost + w["seats"] * seats
+            + w["destination"] * similarity[destination]
+        )
+    return scores
+
+
+def candidate_columns(candidates: List[dict]) -> dict:
+    """Extract the fields `score_columns` needs from candidate trips into arrays.
+
+    This is the only per-trip Python loop of the NumPy scorer. Destinations are
+    encoded as indexes into the list of distinct destinations, so their
+    similarity is computed once per place.
+    """
+    n = len(candidates)
+    codes: Dict[str, int] = {}
+    return {
+        "start": np.fromiter((_epoch(c["start_datetime"]) for c in candidates), dtype=np.float64, count=n),
+        "cost": np.fromiter((c["cost_per_passenger"] for c in candidates), dtype=np.float64, count=n),
+        "free": np.fromiter(
+            (c["capacity"] - len(c.get("passengers", [])) for c in candidates), dtype=np.float64, count=n
+        ),
+        "destination": np.fromiter(
+            (codes.setdefault(c["destination"], len(codes)) for c in candidates), dtype=np.intp, count=n
+        ),
+        "destinations": list(codes),
+    }
+
+
+def score_columns(trip_request: TripRequest, columns: dict,
+                  weights: Optional[Dict[str, float]] = None) -> "np.ndarray":
+    """Score candidates extracted by `candidate_columns` on whole arrays; see `score_python`."""
+    w = _weights(weights)
+    starts, costs = columns["start"], columns["cost"]
+    if len(starts) == 0:
+        return np.empty(0)
+    window_start = _epoch(trip_request.earliest_start_date)
+    window_end = _epoch(trip_request.latest_start_date)
+    outside_hours = np.maximum(np.maximum(window_start - starts, starts - window_end), 0.0) / 3600
+    time_fit = np.exp(-outside_hours / TIME_SCALE_HOURS)
+    cost_range = costs.max() - costs.min()
+    cost = 1.0 - (costs - costs.min()) / cost_range if cost_range else np.ones(len(costs))
+    seats = np.minimum(columns["free"], SEATS_SATURATION) / SEATS_SATURATION
+    similarity = np.array(
+        [destination_similarity(trip_request.destination, d) for d in columns["destinations"]]
+    )
+    return (
+        w["time"] * time_fit + w["cost"] * cost + w["seats"] * seats
+        + w["destination"] * similarity[columns["destination"]]
+    )
+
+
+def score_numpy(trip_request: TripRequest, candidates: List[dict],
+                weights: Optional[Dict[str, float]] = None) -> "np.ndarray":
+    """Score candidate trips in a batch with NumPy; same features and results as `score_python`."""
+    return score_columns(trip_request, candidate_columns(candidates), weights)
+
+
+def rank_trips(trip_request: TripRequest, candidates: List[dict], k: int = 10,
+               weights: Optional[Dict[str, float]] = None) -> List[Tuple[dict, float]]:
+    """Return the `k` best candidates with their scores, best first.
+
+    Uses NumPy when installed, otherwise the per-trip Python scorer. Equal
+    scores are ordered by start time.
+    """
+    if not candidates:
+        return []
+    if np is not None:
+        scores = score_numpy(trip_request, candidates, weights)
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(candidates) else np.arange(len(candidates))
+        best = sorted(top.tolist(), key=lambda i: (-scores[i], candidates[i]["start_datetime"]))
+        return [(candidates[i], float(scores[i])) for i in best]
+    scores = score_python(trip_request, candidates, weights)
+    best = sorted(range(len(candidates)), key=lambda i: (-scores[i], candidates[i]["start_datetime"]))[:k]
+    return [(candidates[i], scores[i]) for i in best]
@@ -0,0 +1,141 @@
+import base64
+import binascii
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import bson
+from bson.errors import BSONError
+from flask import g, request
+from pymongo import MongoClient
+from pymongo.client_session import ClientSession
+from pymongo.collection import Collection
+from pymongo.read_preferences import (
+    Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred, _ServerMode,
+)
+
+
+# Returned after writes and sent back by clients on reads that must observe them
+CAUSAL_TOKEN_HEADER = "X-Causal-Token"
+
+# MongoDB rejects smaller max staleness values
+MIN_MAX_STALENESS_SECONDS = 90
+
+READ_PREFERENCE_MODES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def read_preference(mode: str, max_staleness_seconds: int = -1) -> _ServerMode:
+    """Build a read preference from its mode name, e.g. "secondaryPreferred".
+
+    Args:
+        mode: One of `READ_PREFERENCE_MODES`.
+        max_staleness_seconds: Skip secondaries lagging more than this; -1 for no bound.
+    """
+    if mode not in READ_PREFERENCE_MODES:
+        raise ValueError(f"Unknown read preference {mode!r}, expected one of {', '.join(READ_PREFERENCE_MODES)}")
+    if mode == "primary":
+        return Primary()
+    if max_staleness_seconds != -1 and max_staleness_seconds < MIN_MAX_STALENESS_SECONDS:
+        raise ValueError(f"max staleness must be at least {MIN_MAX_STALENESS_SECONDS} seconds")
+    return READ_PREFERENCE_MODES[mode](max_staleness=max_staleness_seconds)
+
+
+def for_reads(collection: Optional[Collection], preference: Optional[_ServerMode]) -> Optional[Collection]:
+    """Return `collection` configured to read with `preference`, or unchanged if none is set."""
+    if collection is None or preference is None:
+        return collection
+    return collection.with_options(read_preference=preference)
+
+
+def encode_causal_token(session: ClientSession) -> Optional[str]:
+    """Serialize the session's operation and cluster time; None on a standalone server."""
+    if session.operation_time is None or session.cluster_time is None:
+        return None
+    raw = bson.encode({"operationTime": session.operation_time, "clusterTime": session.cluster_time})
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_causal_token(token: str) -> Optional[dict]:
+    """Parse a token from `encode_causal_token`; None if it is malformed."""
+    try:
+        times = bson.decode(base64.urlsafe_b64decode(token.encode()))
+    except (BSONError, binascii.Error, ValueError):
+        return None
+    if not isinstance(times.get("operationTime"), bson.Timestamp) or not isinstance(times.get("clusterTime"), dict):
+        return None
+    return times
+
+
+class ReadRouter:
+    """Routes reads away from the primary while keeping read-your-writes.
+
+    List and search reads use `preference` (e.g. secondaryPreferred) and may be
+    slightly stale. Writes run in a causally consistent session whose cluster
+    time is returned to the client as `X-Causal-Token`; a detail read carrying
+    that token runs in a session advanced to it, so a secondary only answers
+    once it has applied the client's write. Detail reads without a token stay
+    on the primary.
+    """
+
+    def __init__(self, client: MongoClient, preference: Optional[_ServerMode] = None):
+        """Initialize ReadRouter.
+
+        Args:
+            client: The application's MongoDB client.
+            preference: Read preference for list, search and causally consistent
+                detail reads; None keeps all reads on the primary and disables sessions.
+        """
+        self.client = client
+        self.preference = preference
+
+    @property
+    def enabled(self) -> bool:
+        """Whether any reads are routed away from the primary."""
+        return self.preference is not None
+
+    @contextmanager
+    def write_session(self) -> Iterator[Optional[ClientSession]]:
+        """Session for a write whose effects the client may read back; None if routing is off."""
+        if not self.enabled:
+            yield None
+            return
+        with self.client.start_session(causal_consistency=True) as session:
+            yield session
+            token = encode_causal_token(session)
+            if token:
+                g.causal_token = token
+
+    @contextmanager
+    def read_session(self) -> Iterator[Optional[ClientSession]]:
+        """Session for a detail read, advanced to the request's causal token.
+
+        Yields None (read from the primary) if routing is off or the request
+        carries no valid token.
+        """
+        token = request.headers.get(CAUSAL_TOKEN_HEADER)
+        times = decode_causal_token(token) if self.enabled and token else None
+        if not times:
+            yield None
+            return
+        with self.client.start_session(causal_consistency=True) as session:
+            session.advance_cluster_time(times["clusterTime"])
+            session.advance_operation_time(times["operationTime"])
+            yield session
+
+
+def register_read_routing(app, router: ReadRouter):
+    """Registers the `X-Causal-Token` response header for writes made through `router`."""
+    app.config["read_router"] = router
+
+    @app.after_request
+    def add_causal_token(response):
+        """Return the causal token of the request's write session, if any."""
+        token = g.pop("causal_token", None)
+        if token:
+            response.headers[CAUSAL_TOKEN_HEADER] = token
+        return response
@@ -1,15 +1,29 @@
 from flask_openapi3 import APIBlueprint, Tag
-from flask import current_app
-from typing import List
+from flask import Response, current_app, request, stream_with_context
+from pydantic import BaseModel
+from typing import Callable, List
 
 from src.api_models import (
-    TripBody, TripResponse, TripIdPath, TripSearchQuery,
+    TripBody, TripResponse, TripIdPath, TripListQuery, TripPageQuery, TripSearchResponse, TripStreamQuery,
     ErrorResponse, JoinTripBody, TripRequestBody, TripRequestResponse, 
-    TripRequestUpdateBody, RequestIdPath, TripRequestSearchQuery
+    TripRequestUpdateBody, RequestIdPath, TripRequestSearchQuery,
+    AcceptTripRequestBody, AcceptTripRequestResponse,
+    BatchGetBody, TripBatchResponse, TripRequestBatchResponse,
+    PassengerIdPath, NotificationQuery, MarkNotificationsReadBody, MarkNotificationsReadResponse,
+    RecommendationQuery, RecommendationResponse
 )
 from src.bll_models import Trip, TripRequest
+from src.booking_manager import BookingManager, BookingError
+from src.coalescing import SingleFlight
+from src.events import EventBus, TooManySubscribersError, stream_events, trip_filter
+from src.idempotency import IdempotencyStore, IdempotencyError
+from src.notification_manager import NotificationManager
+from src.ranking import rank_trips
+from src.read_routing import ReadRouter
+from src.write_behind import BufferFullError
 from src.trip_manager import TripManager
 from src.trip_request_manager import TripRequestManager
+from shared.server_timing import phase
 
 trips_tag = Tag(name='Trips', description='Operations related to trips')
 trip_requests_tag = Tag(name='Trip Requests', description='Operations related to trip requests')
@@ -22,55 +36,189 @@ api = APIBlueprint(
 )
 
 
+# Used when the app registers no read routing: all reads go to the primary
+_PRIMARY_ONLY = ReadRouter(client=None)
+
+
+def read_router() -> ReadRouter:
+    """Return the app's ReadRouter (see `register_read_routing`)."""
+    return current_app.config.get("read_router", _PRIMARY_ONLY)
+
+
+def idempotent(scope: str, body: BaseModel, func: Callable):
+    """Run a write route body, honoring the request's optional `Idempotency-Key` header.
+
+    `body` is only dumped for fingerprinting when a key is present.
+
+    Replays of an already completed request return the stored response with an
+    `Idempotent-Replayed: true` header instead of executing `func` again.
+    """
+    store: IdempotencyStore = current_app.config.get("idempotency_store")
+    key = request.headers.get("Idempotency-Key")
+    if store is None or not key:
+        return func()
+    try:
+        response, status, replayed = store.execute(key, scope, body.model_dump(mode="json"), func)
+    except IdempotencyError as e:
+        return {"message": str(e)}, e.status_code
+    if replayed:
+        return response, status, {"Idempotent-Replayed": "true"}
+    return response, status
+
+
 @api.post('/', summary="Create a new trip", tags=[trips_tag])
 def create_trip(body: TripBody) -> dict:
     """
     Creates a new trip based on the provided details.
     The server assigns a unique `trip_id`.
+    Retries carrying the same `Idempotency-Key` header create the trip only once.
     """
     manager: TripManager = current_app.config["trip_manager"]
-    trip_id = manager.create_trip(Trip(**body.model_dump()))
-    return {"trip_id": trip_id}
+
+    def create():
+        # TripBody is validated by flask-openapi3 with the Trip rules; no second pass
+        with read_router().write_session() as session:
+            trip_id = manager.create_trip(Trip.from_body(body), session=session)
+        return {"trip_id": trip_id}
+
+    return idempotent("create_trip", body, create)
 
 
 @api.get('/', summary="List all available trips", tags=[trips_tag])
-def get_all_trips(query: TripSearchQuery) -> List[dict]:
+def get_all_trips(query: TripListQuery) -> Response:
     """
-    Returns a list of all available trips.
-    Supports optional filtering by pickup location, destination, and date.
-    
+    Returns a list of all upcoming and ongoing trips, or also past ones with `include_past`.
+    Supports optional filtering by pickup location, destination, date, free seats,
+    driver and passenger, and pagination with `limit`/`offset`. With `near_lat`,
+    `near_lon` and `radius_km` only trips picking up within the radius are
+    returned, nearest first.
     """
     manager: TripManager = current_app.config["trip_manager"]
-    all_trips = manager.get_all_trips(
+    coalescer: SingleFlight = current_app.config.get("trips_list_coalescer")
+
+    def load() -> str:
+        all_trips = manager.get_all_trips(
+            pickup=query.pickup,
+            destination=query.destination,
+            trip_date=query.date,
+            min_seats=query.min_seats,
+            near_lat=query.near_lat,
+            near_lon=query.near_lon,
+            radius_km=query.radius_km,
+            include_past=query.include_past,
+            driver_id=query.driver_id,
+            passenger_id=query.passenger_id,
+            limit=query.limit,
+            offset=query.offset,
+        )
+        # Trip has exactly the TripResponse fields; dumping it directly skips a validation pass
+        with phase("serialize"):
+            data = [trip.model_dump() for trip in all_trips]
+        return current_app.json.dumps(data)
+
+    # Identical concurrent queries share one execution and its serialized body
+    body = coalescer.do(query.model_dump_json(), load) if coalescer else load()
+    return Response(body, mimetype="application/json")
+
+
+@api.get('/stream', summary="Live stream of trip changes (Server-Sent Events)", tags=[trips_tag])
+def stream_trips(query: TripStreamQuery):
+    """
+    Streams `created`, `updated` and `deleted` trip events matching the filters
+    as Server-Sent Events, replacing polling of `GET /trips`. Deletions and
+    updates that only carry a `trip_id` are always sent. A reconnecting client
+    resumes after its `Last-Event-ID`; a `reset` event means events were missed
+    and the client should reload the list.
+    """
+    bus: EventBus = current_app.config["event_bus"]
+    try:
+        subscription = bus.subscribe(
+            matches=trip_filter(query.pickup, query.destination, query.date, query.min_seats),
+            last_event_id=request.headers.get("Last-Event-ID"),
+        )
+    except TooManySubscribersError as e:
+        return {"message": str(e)}, 503, {"Retry-After": "5"}
+
+    heartbeat = current_app.config.get("event_stream_heartbeat", 15.0)
+    return Response(
+        stream_with_context(stream_events(bus, subscription, heartbeat_seconds=heartbeat)),
+        mimetype="text/event-stream",
+        # Keep proxies from buffering or caching the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@api.get('/search', summary="Search trips with pagination and facet counts", tags=[trips_tag],
+         responses={200: TripSearchResponse})
+def search_trips(query: TripPageQuery) -> dict:
+    """
+    Returns one page of trips matching the filters of `GET /trips` and the total
+    number of matches. With `facets=true` the response also contains counts per
+    destination, per day and per price range, computed in the same round trip.
+    """
+    manager: TripManager = current_app.config["trip_manager"]
+    result = manager.search_trips(
         pickup=query.pickup,
         destination=query.destination,
         trip_date=query.date,
+        min_seats=query.min_seats,
+        near_lat=query.near_lat,
+        near_lon=query.near_lon,
+        radius_km=query.radius_km,
+        limit=query.limit,
+        offset=query.offset,
+        facets=query.facets,
+        driver_id=query.driver_id,
+        passenger_id=query.passenger_id,
     )
-    return [TripResponse(**trip.model_dump()).model_dump() for trip in all_trips]
+    with phase("serialize"):
+        result["results"] = [trip.model_dump() for trip in result["results"]]
+    return result
 
 
-@api.get('/<trip_id>', summary="Get a trip by ID", tags=[trips_tag])
+@api.get('/<trip_id>', summary="Get a trip by ID", tags=[trips_tag], responses={200: TripResponse})
 def get_trip_by_id(path: TripIdPath) -> dict:
     """
     Returns the details of a specific trip by its ID.
+    Send the `X-Causal-Token` of a preceding write to read it back from a secondary.
     """
     manager: TripManager = current_app.config["trip_manager"]
-    trip = manager.get_trip_by_id(path.trip_id)
+    with read_router().read_session() as session:
+        trip = manager.get_trip_by_id(path.trip_id, session=session)
     if trip:
-        return TripResponse(**trip.model_dump()).model_dump()
+        return trip.model_dump()
     return {"message": "Trip not found"}, 404
 
 
+@api.post('/batch-get', summary="Get several trips by ID", tags=[trips_tag],
+          responses={200: TripBatchResponse})
+def get_trips_by_ids(body: BatchGetBody) -> dict:
+    """
+    Returns the trips with the given IDs in the requested order, fetched in a
+    single database round trip, and lists the IDs that were not found.
+    """
+    manager: TripManager = current_app.config["trip_manager"]
+    trips, missing = manager.get_trips_by_ids(body.ids)
+    with phase("serialize"):
+        return {"results": [trip.model_dump() for trip in trips], "missing": missing}
+
+
 @api.post('/<trip_id>/join', summary="Join a trip as a passenger", tags=[trips_tag])
 def join_trip(path: TripIdPath, body: JoinTripBody) -> dict:
     """
     Allows a passenger to join an existing trip.
+    Retries carrying the same `Idempotency-Key` header get the original response.
     """
     manager: TripManager = current_app.config["trip_manager"]
-    updated_trip = manager.add_passenger_to_trip(path.trip_id, body.passenger_id)
-    if updated_trip:
-        return {"message": "Passenger added successfully"}
-    return {"message": "Trip not found or could not be updated"}, 404
+
+    def join():
+        with read_router().write_session() as session:
+            updated_trip = manager.add_passenger_to_trip(path.trip_id, body.passenger_id, session=session)
+        if updated_trip:
+            return {"message": "Passenger added successfully"}
+        return {"message": "Trip not found or could not be updated"}, 404
+
+    return idempotent(f"join_trip:{path.trip_id}", body, join)
 
 
 @api.delete('/<trip_id>', summary="Delete a trip", tags=[trips_tag])
@@ -79,7 +227,9 @@ def delete_trip(path: TripIdPath) -> dict:
     Deletes a trip by its ID.
     """
     manager: TripManager = current_app.config["trip_manager"]
-    if manager.delete_trip(path.trip_id):
+    with read_router().write_session() as session:
+        deleted = manager.delete_trip(path.trip_id, session=session)
+    if deleted:
         return {"message": "Trip deleted successfully"}
     return {"message": "Trip not found"}, 404
 
@@ -88,42 +238,157 @@ def delete_trip(path: TripIdPath) -> dict:
 def create_trip_request(body: TripRequestBody) -> dict:
     """
     Creates a new trip request.
+    Retries carrying the same `Idempotency-Key` header create the request only once.
     """
     manager: TripRequestManager = current_app.config["trip_request_manager"]
-    trip_request_id = manager.create_trip_request(TripRequest(**body.model_dump()))
-    return {"request_id": trip_request_id}
+
+    def create():
+        try:
+            # TripRequestBody is validated by flask-openapi3 with the TripRequest rules; no second pass
+            trip_request = TripRequest.from_body(body)
+            if manager.write_behind:
+                # Not in MongoDB until the next flush, so there is no write a causal token could point at
+                trip_request_id = manager.create_trip_request(trip_request)
+            else:
+                with read_router().write_session() as session:
+                    trip_request_id = manager.create_trip_request(trip_request, session=session)
+        except BufferFullError:
+            return {"message": "Too many pending trip requests, please retry later"}, 503
+        return {"request_id": trip_request_id}
+
+    return idempotent("create_trip_request", body, create)
 
 
 @api.get('/requests', summary="List all trip requests", tags=[trip_requests_tag])
 def get_all_trip_requests(query: TripRequestSearchQuery) -> List[dict]:
     """
-    Returns a list of all trip requests.
-    Supports optional filtering by destination.
+    Returns a list of all trip requests whose start window has not passed,
+    or also expired ones with `include_past`.
+    Supports optional filtering by destination, passenger, status and overlap of
+    the start window with `window_start`/`window_end`, and pagination with
+    `limit`/`offset`.
+    """
+    manager: TripRequestManager = current_app.config["trip_request_manager"]
+    all_requests = manager.get_all_trip_requests(
+        destination=query.destination,
+        include_past=query.include_past,
+        passenger_id=query.passenger_id,
+        status=query.status,
+        limit=query.limit,
+        offset=query.offset,
+        destination_exact=query.destination_exact,
+        window_start=query.window_start,
+        window_end=query.window_end,
+    )
+    # TripRequest has exactly the TripRequestResponse fields; dumping it directly skips a validation pass
+    with phase("serialize"):
+        return [req.model_dump() for req in all_requests]
+
+
+@api.post('/requests/batch-get', summary="Get several trip requests by ID", tags=[trip_requests_tag],
+          responses={200: TripRequestBatchResponse})
+def get_trip_requests_by_ids(body: BatchGetBody) -> dict:
+    """
+    Returns the trip requests with the given IDs in the requested order,
+    fetched in a single database round trip, and lists the IDs that were not found.
     """
     manager: TripRequestManager = current_app.config["trip_request_manager"]
-    all_requests = manager.get_all_trip_requests(destination=query.destination)
-    return [TripRequestResponse(**req.model_dump()).model_dump() for req in all_requests]
+    trip_requests, missing = manager.get_trip_requests_by_ids(body.ids)
+    with phase("serialize"):
+        return {"results": [req.model_dump() for req in trip_requests], "missing": missing}
 
 
-@api.get('/requests/<request_id>', summary="Get a trip request by ID", tags=[trip_requests_tag])
+@api.get('/requests/<request_id>', summary="Get a trip request by ID", tags=[trip_requests_tag],
+         responses={200: TripRequestResponse})
 def get_trip_request_by_id(path: RequestIdPath) -> dict:
     """
     Returns the details of a specific trip request by its ID.
+    Send the `X-Causal-Token` of a preceding write to read it back from a secondary.
     """
     manager: TripRequestManager = current_app.config["trip_request_manager"]
-    trip_request = manager.get_trip_request_by_id(path.request_id)
+    with read_router().read_session() as session:
+        trip_request = manager.get_trip_request_by_id(path.request_id, session=session)
     if trip_request:
-        return TripRequestResponse(**trip_request.model_dump()).model_dump()
+        return trip_request.model_dump()
     return {"message": "Trip request not found"}, 404
 
 
+@api.get('/requests/<request_id>/recommended-trips', summary="Rank trips matching a trip request",
+         tags=[trip_requests_tag], responses={200: RecommendationResponse})
+def get_recommended_trips(path: RequestIdPath, query: RecommendationQuery) -> dict:
+    """
+    Returns the `k` upcoming trips with a free seat that best match a trip request,
+    best first. Trips to a similar destination starting near the request's window
+    are scored on start time, cost, free seats and destination similarity; the
+    weights of these features can be set per call.
+    """
+    request_manager: TripRequestManager = current_app.config["trip_request_manager"]
+    trip_manager: TripManager = current_app.config["trip_manager"]
+    trip_request = request_manager.get_trip_request_by_id(path.request_id)
+    if not trip_request:
+        return {"message": "Trip request not found"}, 404
+    candidates = trip_manager.get_candidate_trips(
+        trip_request.destination, trip_request.earliest_start_date, trip_request.latest_start_date,
+        passenger_id=trip_request.passenger_id,
+    )
+    ranked = rank_trips(trip_request, candidates, k=query.k, weights=query.weights())
+    # Only the returned trips are hydrated
+    with phase("hydrate"):
+        trips = [(Trip.from_db(t), score) for t, score in ranked]
+    with phase("serialize"):
+        return {"results": [{"trip": trip.model_dump(), "score": score} for trip, score in trips]}
+
+
 @api.put('/requests/<request_id>', summary="Update a trip request", tags=[trip_requests_tag])
 def update_trip_request(path: RequestIdPath, body: TripRequestUpdateBody) -> dict:
     """
     Updates a trip request's status.
     """
     manager: TripRequestManager = current_app.config["trip_request_manager"]
-    success = manager.update_trip_request(path.request_id, body.trip_id, body.status)
+    with read_router().write_session() as session:
+        success = manager.update_trip_request(path.request_id, body.trip_id, body.status, session=session)
     if success:
         return {"message": "Trip request updated successfully"}
-    return {"message": "Trip request not found or could not be updated"}, 404
\ No newline at end of file
+    return {"message": "Trip request not found or could not be updated"}, 404
+
+
+@api.post('/requests/<request_id>/accept', summary="Accept a trip request and seat its passenger", tags=[trip_requests_tag])
+def accept_trip_request(path: RequestIdPath, body: AcceptTripRequestBody) -> dict:
+    """
+    Seats the requesting passenger on the given trip and marks the request as
+    accepted in a single atomic operation. Returns the resulting seat count.
+    """
+    manager: BookingManager = current_app.config["booking_manager"]
+    try:
+        with read_router().write_session() as session:
+            trip = manager.accept_trip_request(path.request_id, body.trip_id, session=session)
+    except BookingError as e:
+        return {"message": str(e)}, 409
+    return AcceptTripRequestResponse(
+        message="Trip request accepted",
+        trip_id=trip.trip_id,
+        passenger_count=len(trip.passengers),
+        seats_left=trip.capacity - len(trip.passengers),
+    ).model_dump()
+
+
+@api.get('/notifications/<passenger_id>', summary="Get a passenger's trip notifications", tags=[trip_requests_tag])
+def get_notifications(path: PassengerIdPath, query: NotificationQuery) -> List[dict]:
+    """
+    Returns the passenger's notifications about new trips matching one of their
+    pending trip requests, newest first.
+    """
+    manager: NotificationManager = current_app.config["notification_manager"]
+    return manager.get_notifications(path.passenger_id, unread_only=query.unread_only, limit=query.limit)
+
+
+@api.post('/notifications/<passenger_id>/read', summary="Mark a passenger's notifications as read",
+          tags=[trip_requests_tag], responses={200: MarkNotificationsReadResponse})
+def mark_notifications_read(path: PassengerIdPath, body: MarkNotificationsReadBody):
+    """
+    Marks the passenger's notifications about the given trips as read, or all of
+    them if no trip ids are given.
+    """
+    manager: NotificationManager = current_app.config["notification_manager"]
+    marked = manager.mark_read(path.passenger_id, body.trip_ids)
+    return MarkNotificationsReadResponse(marked=marked).model_dump(), 200
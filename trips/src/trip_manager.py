@@ -1,53 +1,472 @@
-from typing import List, Optional
-from datetime import datetime, date
-from uuid import uuid4
+import re
+from typing import List, Optional, Tuple
+from datetime import datetime, date, timedelta, UTC
 from pymongo.collection import Collection
-from pymongo import MongoClient
-from src.bll_models import Trip
+from pymongo import MongoClient, GEOSPHERE, ReturnDocument
+from pymongo.client_session import ClientSession
+from pymongo.database import Database
+from pymongo.read_preferences import _ServerMode
+from src.bll_models import Trip, geo_point, normalize_destination
+from src.events import EventBus
+from src.ids import new_id
+from src.notification_manager import NotificationManager
+from src.partitioning import PartitionSet, list_partitions
+from src.read_routing import for_reads
+from shared.server_timing import phase
+
+
+# Projection leaving out Mongo's `_id`, which the models do not use
+NO_ID = {"_id": 0}
+
+# Order of paginated trip listings; trip_id breaks ties so pages do not overlap
+TRIP_ORDER = [("start_datetime", 1), ("trip_id", 1)]
+
+# Secondary indexes of the trips collection, built by a migration (src/migrations.py)
+# rather than at startup; new partitions get them when first used
+TRIP_INDEXES = [
+    # Bounds the "upcoming" filter and the archiver's expiry scan
+    [("return_datetime", 1)],
+    # Only trips with coordinates carry `pickup_point`; 2dsphere indexes skip the rest
+    [("pickup_point", GEOSPHERE)],
+    # Itinerary screens: trips a driver offers / a passenger joined, in start order.
+    # `passengers` is an array, so the second index is multikey.
+    [("driver_id", 1), ("start_datetime", 1)],
+    [("passengers", 1), ("start_datetime", 1)],
+    # Start-ordered pages (TRIP_ORDER) and the start windows of recommendation candidates
+    TRIP_ORDER,
+]
+
+# Lower bounds of the price facet buckets; the last bucket is open-ended
+PRICE_BUCKETS = [0, 10, 25, 50, 100]
+
+
+def _naive(value: datetime) -> datetime:
+    """A datetime as naive UTC, comparable with the datetimes read from MongoDB."""
+    return value.astimezone(UTC).replace(tzinfo=None) if value.tzinfo else value
 
 
 class TripManager:
     """Manages trip creation and storage operations."""
 
-    def __init__(self, db_collection: Collection):
+    def __init__(
+        self,
+        db_collection: Collection,
+        archive_collection: Optional[Collection] = None,
+        event_bus: Optional[EventBus] = None,
+        notification_manager: Optional[NotificationManager] = None,
+        read_preference: Optional[_ServerMode] = None,
+        partitions: Optional[PartitionSet] = None,
+    ):
         """Initialize TripManager.
         
         Args:
             db_collection: MongoDB collection for storing trips.
+            archive_collection: Optional collection holding past trips moved out by the archiver.
+            event_bus: Optional bus that trip created/updated/deleted events are published to.
+            notification_manager: Optional; notifies passengers whose pending requests
+                match a newly created trip.
+            read_preference: Optional read preference (e.g. secondaryPreferred) for list
+                and search queries and for detail reads in a causally consistent session.
+            partitions: Optional monthly partitions (see `create_trip_partitions`). New
+                trips are stored there instead of in `db_collection`, which then only
+                holds trips not yet migrated; listings read it until it is empty.
         """
         self.db_collection = db_collection
-        self.db_collection.create_index("trip_id", unique=True)
+        self.archive_collection = archive_collection
+        self.event_bus = event_bus
+        self.notification_manager = notification_manager
+        self.partitions = partitions
+        self.read_preference = read_preference
+        self.read_collection = for_reads(db_collection, read_preference)
+        self.archive_read_collection = for_reads(archive_collection, read_preference)
+        # With partitions: set once `db_collection` is found empty, i.e. fully migrated
+        self._legacy_migrated = False
+        self.create_indexes(self.db_collection)
+
+    @staticmethod
+    def create_indexes(collection: Collection) -> None:
+        """Create the unique trip id index; the others are built by migrations (`TRIP_INDEXES`)."""
+        collection.create_index("trip_id", unique=True)
 
-    def create_trip(self, trip: Trip) -> str:
+    @staticmethod
+    def create_partition_indexes(collection: Collection) -> None:
+        """Create all trip indexes on a partition, which is still empty when first used."""
+        TripManager.create_indexes(collection)
+        for keys in TRIP_INDEXES:
+            collection.create_index(keys)
+
+    def create_trip(self, trip: Trip, session: Optional[ClientSession] = None) -> str:
         """Create a new trip and store it in the database.
+
+        The trip must already be validated, i.e. built via the model constructor
+        or `Trip.from_body`; it is not validated a second time here.
         
         Returns:
-            The created Trip object.
+            The id of the created trip.
         """
-        trip.validate()  # Re-validate before insertion
-        trip_dict = trip.model_dump()
+        trip_dict = trip.to_dict()
 
-        trip_id = trip_dict.get("trip_id") or str(uuid4())
+        trip_id = trip_dict.get("trip_id") or new_id()
         trip_dict["trip_id"] = trip_id  # Use trip_id as the application-level identifier
-        self.db_collection.insert_one(trip_dict)
+        pickup_point = trip.pickup_point()
+        if pickup_point:
+            trip_dict["pickup_point"] = pickup_point
+        collection = self.db_collection
+        if self.partitions:
+            collection = self.partitions.collection_for(trip.start_datetime)
+            # Directory first: a trip is never stored without a way to find it by id
+            self.partitions.register(trip_id, collection.name, session=session)
+        try:
+            collection.insert_one(trip_dict, session=session)
+        except Exception:
+            if self.partitions:
+                self.partitions.forget(trip_id, session=session)
+            raise
         trip.trip_id = trip_id
+        trip_dict.pop("_id", None)  # added by insert_one
+        self.publish_event("created", trip_dict)
+        if self.notification_manager:
+            self.notification_manager.notify_trip_created(trip_dict)
         
         return trip.trip_id
 
+    def publish_event(self, event_type: str, data: dict) -> None:
+        """Publish a trip change to live search streams, if an event bus is configured.
+
+        Writes that are part of a transaction must publish only after it committed.
+        """
+        if self.event_bus:
+            self.event_bus.publish(event_type, data)
+
     def get_all_trips(
         self,
         pickup: Optional[str] = None,
         destination: Optional[str] = None,
         trip_date: Optional[datetime] = None,
+        min_seats: Optional[int] = None,
+        near_lat: Optional[float] = None,
+        near_lon: Optional[float] = None,
+        radius_km: Optional[float] = None,
+        include_past: bool = False,
+        driver_id: Optional[str] = None,
+        passenger_id: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
     ) -> List[Trip]:
-        """Retrieve all trips, optionally filtered by pickup, destination, and date.
+        """Retrieve all trips, optionally filtered by pickup, destination, date, seats and distance.
 
         Args:
             pickup: Optional pickup location substring (case-insensitive contains).
             destination: Optional destination substring (case-insensitive contains).
             trip_date: Optional datetime; matches trips that start on the same calendar day.
+            min_seats: Optional minimum number of free seats.
+            near_lat: Optional latitude; together with `near_lon` and `radius_km` restricts
+                the result to trips picking up within `radius_km`, ordered nearest first.
+            near_lon: Optional longitude, see `near_lat`.
+            radius_km: Optional search radius in kilometres, see `near_lat`.
+            include_past: If set, also return trips that already returned, including
+                archived ones. By default only upcoming and ongoing trips are searched.
+            driver_id: Optional driver; only trips offered by this driver.
+            passenger_id: Optional passenger; only trips this passenger has joined.
+            limit: Optional page size. Pages are ordered by start time, or nearest
+                first for radius searches; without a limit the order is unspecified.
+            offset: Number of matching trips to skip; only used together with `limit`.
+        """
+        query = self._build_query(pickup, destination, trip_date, min_seats, include_past, driver_id, passenger_id)
+        collections = self._listing_collections(trip_date, include_past)
+
+        near = geo_point(near_lat, near_lon)
+        # With several collections every one must return its first offset + limit
+        # matches; the page is cut after merging them
+        skip = offset if len(collections) == 1 else 0
+        page_end = None if limit is None else offset + limit
+
+        all_trips_data = []
+        for collection in collections:
+            if near and radius_km:
+                pipeline = [self._geo_near_stage(near, radius_km, query)]
+                if limit is not None:
+                    pipeline += [{"$skip": skip}, {"$limit": page_end - skip}]
+                pipeline.append({"$project": NO_ID})
+                all_trips_data.extend(collection.aggregate(pipeline))
+            else:
+                cursor = collection.find(query, NO_ID)
+                if limit is not None:
+                    cursor = cursor.sort(TRIP_ORDER).skip(skip).limit(page_end - skip)
+                all_trips_data.extend(cursor)
+
+        if limit is not None and len(collections) > 1:
+            if near and radius_km:
+                all_trips_data.sort(key=lambda t: t["distance_m"])
+            else:
+                all_trips_data.sort(key=lambda t: (t["start_datetime"], t["trip_id"]))
+            all_trips_data = all_trips_data[offset:page_end]
+        if self.partitions:
+            self.partitions.remember(all_trips_data)
+        with phase("hydrate"):
+            return [Trip.from_db(t) for t in all_trips_data]
+
+    def search_trips(
+        self,
+        pickup: Optional[str] = None,
+        destination: Optional[str] = None,
+        trip_date: Optional[datetime] = None,
+        min_seats: Optional[int] = None,
+        near_lat: Optional[float] = None,
+        near_lon: Optional[float] = None,
+        radius_km: Optional[float] = None,
+        limit: int = 20,
+        offset: int = 0,
+        facets: bool = False,
+        driver_id: Optional[str] = None,
+        passenger_id: Optional[str] = None,
+    ) -> dict:
+        """Search trips with pagination, answered by a single `$facet` aggregation.
+
+        Takes the same filters as `get_all_trips` and only searches upcoming and
+        ongoing trips. Results are ordered by start time, or nearest first for
+        radius searches.
+
+        Returns:
+            A dict with the page of `results` (Trip objects), the `total` number of
+            matches and, if `facets` is set, `facets` with per-destination, per-day
+            and price-bucket counts over all matches.
+        """
+        query = self._build_query(
+            pickup, destination, trip_date, min_seats, driver_id=driver_id, passenger_id=passenger_id
+        )
+
+        near = geo_point(near_lat, near_lon)
+        if near and radius_km:
+            pipeline = [self._geo_near_stage(near, radius_km, query)]
+        else:
+            pipeline = [{"$match": query}, {"$sort": dict(TRIP_ORDER)}]
+
+        # With several partitions every one must return its first offset + limit
+        # matches; the page is cut after merging them
+        collections = self._listing_collections(trip_date, include_past=False)
+        skip = offset if len(collections) == 1 else 0
+        branches = {
+            "results": [{"$skip": skip}, {"$limit": offset + limit - skip}, {"$project": NO_ID}],
+            "total": [{"$count": "count"}],
+        }
+        if facets:
+            branches.update(self._facet_branches())
+        pipeline.append({"$facet": branches})
+
+        partials = [next(iter(c.aggregate(pipeline)), {}) for c in collections]
+        if len(partials) == 1:
+            data = partials[0]
+        else:
+            data = self._merge_facets(partials, bool(near and radius_km))
+            data["results"] = data["results"][offset:offset + limit]
+        if self.partitions:
+            self.partitions.remember(data.get("results", []))
+        total = data.get("total") or [{"count": 0}]
+        with phase("hydrate"):
+            result = {
+                "results": [Trip.from_db(t) for t in data.get("results", [])],
+                "total": total[0]["count"],
+            }
+        if facets:
+            result["facets"] = {
+                "destination": self._facet_counts(data.get("destination", [])),
+                "day": self._facet_counts(data.get("day", [])),
+                "price": self._facet_counts(data.get("price", []), labels=self._price_labels()),
+            }
+        return result
+
+    def get_candidate_trips(
+        self,
+        destination: str,
+        window_start: datetime,
+        window_end: datetime,
+        passenger_id: Optional[str] = None,
+        slack: timedelta = timedelta(days=2),
+        limit: int = 5000,
+    ) -> List[dict]:
+        """Upcoming trips with a free seat to a similar destination starting near a time window, for ranking.
+
+        Candidates share at least one word with `destination` (ignoring case), so
+        "Lake Tahoe" also finds "South Lake Tahoe". Trips starting inside the
+        window come first; the remaining room is filled with the trips closest to
+        it from the `slack` on either side, so a busy period before the window
+        cannot crowd out the trips inside it.
+
+        Returns raw documents rather than Trip objects: the candidates are scored
+        in bulk (see `src.ranking`) and only the few returned are worth hydrating.
+
+        Args:
+            destination: The wanted destination.
+            window_start: Earliest wanted start time.
+            window_end: Latest wanted start time.
+            passenger_id: Optional passenger; trips they drive or already joined are left out.
+            slack: Trips starting up to this long outside the window are still candidates.
+            limit: Maximum number of candidates.
         """
+        query: dict = {
+            "return_datetime": {"$gte": datetime.now(UTC)},
+            "$expr": {"$lt": [{"$size": "$passengers"}, "$capacity"]},
+        }
+        words = [re.escape(word) for word in normalize_destination(destination).split()]
+        if words:
+            query["destination"] = {"$regex": rf"\b({'|'.join(words)})\b", "$options": "i"}
+        if passenger_id:
+            query["driver_id"] = {"$ne": passenger_id}
+            query["passengers"] = {"$ne": passenger_id}
+
+        def fetch(start: dict, direction: int, room: int) -> List[dict]:
+            """The `room` trips nearest to the window within the `start` bounds."""
+            low = start.get("$gte", start.get("$gt"))
+            high = start.get("$lte", start.get("$lt"))
+            found = []
+            for collection in self._window_collections(low, high):
+                cursor = collection.find({**query, "start_datetime": start}, NO_ID)
+                found.extend(cursor.sort([("start_datetime", direction)]).limit(room))
+            found.sort(key=lambda t: t["start_datetime"], reverse=direction < 0)
+            return found[:room]
+
+        candidates = fetch({"$gte": window_start, "$lte": window_end}, 1, limit)
+        room = limit - len(candidates)
+        if room > 0:
+            before = fetch({"$gte": window_start - slack, "$lt": window_start}, -1, room)
+            after = fetch({"$gt": window_end, "$lte": window_end + slack}, 1, room)
+            # Closest to the window first, from either side
+            outside = sorted(
+                before + after,
+                key=lambda t: max(_naive(window_start) - _naive(t["start_datetime"]),
+                                  _naive(t["start_datetime"]) - _naive(window_end)),
+            )
+            candidates.extend(outside[:room])
+        return candidates
+
+    def _window_collections(self, start: datetime, end: datetime) -> List[Collection]:
+        """Collections holding upcoming trips that start within [start, end]."""
+        if self.partitions is None:
+            return [self.read_collection]
+        return self._partition_collections(start, end)
+
+    def _partition_collections(self, start: Optional[datetime], end: Optional[datetime]) -> List[Collection]:
+        """Partitions overlapping [start, end], plus the trips collection until it is migrated."""
+        collections = [self.partitions.collection(name, for_read=True) for name in self.partitions.names(start, end)]
+        if not self._legacy_migrated:
+            # New trips only go to partitions, so once empty it stays empty
+            if self.db_collection.find_one({}, {"_id": 1}) is None:
+                self._legacy_migrated = True
+            else:
+                collections.append(self.read_collection)
+        return collections
+
+    @staticmethod
+    def _merge_facets(partials: List[dict], by_distance: bool) -> dict:
+        """Combine the `$facet` outputs of several partitions into one.
+
+        Results are merged in search order, totals and facet counts are summed.
+        """
+        results = [t for data in partials for t in data.get("results", [])]
+        if by_distance:
+            results.sort(key=lambda t: t["distance_m"])
+        else:
+            results.sort(key=lambda t: (t["start_datetime"], t["trip_id"]))
+        merged = {
+            "results": results,
+            "total": [{"count": sum((data.get("total") or [{"count": 0}])[0]["count"] for data in partials)}],
+        }
+        for facet in ("destination", "day", "price"):
+            counts: dict = {}
+            for data in partials:
+                for group in data.get(facet, []):
+                    counts[group["_id"]] = counts.get(group["_id"], 0) + group["count"]
+            groups = [{"_id": value, "count": count} for value, count in counts.items()]
+            if facet == "destination":
+                groups.sort(key=lambda g: (-g["count"], g["_id"]))
+            else:
+                groups.sort(key=lambda g: g["_id"])
+            merged[facet] = groups
+        return merged
+
+    def _listing_collections(self, trip_date: Optional[datetime], include_past: bool) -> List[Collection]:
+        """Collections a listing or search reads: the trips collection or the partitions
+        overlapping the searched period, plus the archive for history views."""
+        if self.partitions is None:
+            collections = [self.read_collection]
+        else:
+            start, end = None, None
+            if trip_date:
+                start = end = datetime(trip_date.year, trip_date.month, trip_date.day)
+            elif not include_past:
+                # Trips that started earlier may still be ongoing
+                start = datetime.now(UTC) - self.partitions.lookback
+            collections = self._partition_collections(start, end)
+        if include_past and self.archive_read_collection is not None:
+            collections.append(self.archive_read_collection)
+        return collections
+
+    def _trip_collection(self, trip_id: str) -> Collection:
+        """The collection holding a trip for writes: its partition, or the trips collection."""
+        if self.partitions:
+            name = self.partitions.locate(trip_id)
+            if name:
+                return self.partitions.collection(name)
+        return self.db_collection
+
+    @staticmethod
+    def _facet_branches() -> dict:
+        """`$facet` sub-pipelines computing the per-destination, per-day and price counts."""
+        return {
+            "destination": [
+                {"$group": {"_id": "$destination", "count": {"$sum": 1}}},
+                {"$sort": {"count": -1, "_id": 1}},
+            ],
+            "day": [
+                {"$group": {
+                    "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": "$start_datetime"}},
+                    "count": {"$sum": 1},
+                }},
+                {"$sort": {"_id": 1}},
+            ],
+            "price": [
+                {"$bucket": {
+                    "groupBy": "$cost_per_passenger",
+                    "boundaries": PRICE_BUCKETS,
+                    "default": PRICE_BUCKETS[-1],
+                    "output": {"count": {"$sum": 1}},
+                }},
+            ],
+        }
+
+    @staticmethod
+    def _price_labels() -> dict:
+        """Map each price bucket's lower bound to a readable range label."""
+        labels = {lo: f"{lo}-{hi}" for lo, hi in zip(PRICE_BUCKETS, PRICE_BUCKETS[1:])}
+        labels[PRICE_BUCKETS[-1]] = f"{PRICE_BUCKETS[-1]}+"
+        return labels
+
+    @staticmethod
+    def _facet_counts(groups: List[dict], labels: Optional[dict] = None) -> List[dict]:
+        """Convert `$group`/`$bucket` output into `{"value", "count"}` dicts."""
+        labels = labels or {}
+        return [{"value": labels.get(g["_id"], str(g["_id"])), "count": g["count"]} for g in groups]
+
+    def _build_query(
+        self,
+        pickup: Optional[str] = None,
+        destination: Optional[str] = None,
+        trip_date: Optional[datetime] = None,
+        min_seats: Optional[int] = None,
+        include_past: bool = False,
+        driver_id: Optional[str] = None,
+        passenger_id: Optional[str] = None,
+    ) -> dict:
+        """Build the MongoDB filter shared by all trip search paths."""
         query: dict = {}
+        if not include_past:
+            query["return_datetime"] = {"$gte": datetime.now(UTC)}
+        if driver_id:
+            query["driver_id"] = driver_id
+        if passenger_id:
+            # Matches any element of the `passengers` array
+            query["passengers"] = passenger_id
         if pickup:
             query["pickup_location"] = {"$regex": pickup, "$options": "i"}
         if destination:
@@ -61,34 +480,177 @@ class TripManager:
                 day_start = datetime(trip_date.year, trip_date.month, trip_date.day, 0, 0, 0)  # type: ignore[attr-defined]
             day_end = day_start.replace(hour=23, minute=59, second=59, microsecond=999999)
             query["start_datetime"] = {"$gte": day_start, "$lte": day_end}
+        if min_seats:
+            query["$expr"] = {
+                "$gte": [{"$subtract": ["$capacity", {"$size": "$passengers"}]}, min_seats]
+            }
+        return query
 
-        all_trips_data = self.db_collection.find(query)
-        return [Trip(**t) for t in all_trips_data]
+    @staticmethod
+    def _geo_near_stage(near: dict, radius_km: float, query: dict) -> dict:
+        """Build a `$geoNear` stage over `pickup_point`; it must be the first pipeline stage."""
+        return {
+            "$geoNear": {
+                "near": near,
+                "key": "pickup_point",
+                "distanceField": "distance_m",
+                "maxDistance": radius_km * 1000,
+                "spherical": True,
+                "query": query,
+            }
+        }
 
-    def get_trip_by_id(self, trip_id: str) -> Optional[Trip]:
-        """Find a single trip by its `trip_id`. Returns None if not found."""
-        data = self.db_collection.find_one({"trip_id": trip_id})
+    def get_trip_by_id(self, trip_id: str, session: Optional[ClientSession] = None) -> Optional[Trip]:
+        """Find a single trip by its `trip_id`, falling back to the archive. Returns None if not found.
+
+        Reads from the primary, or with the configured read preference when given
+        a causally consistent `session` that guarantees the caller's writes are seen.
+        """
+        collection = self._trip_collection(trip_id)
+        if session is not None:
+            collection = for_reads(collection, self.read_preference)
+        data = collection.find_one({"trip_id": trip_id}, NO_ID, session=session)
+        if not data and self.archive_collection is not None:
+            data = self.archive_collection.find_one({"trip_id": trip_id}, NO_ID)
         if not data:
             return None
-        return Trip(**data)
+        return Trip.from_db(data)
+
+    def get_trips_by_ids(self, trip_ids: List[str]) -> Tuple[List[Trip], List[str]]:
+        """Find several trips with a single `$in` query (plus one on the archive for misses).
 
-    def add_passenger_to_trip(self, trip_id: str, passenger_id: str) -> bool:
+        Returns:
+            The found trips in the order of `trip_ids`, and the ids that were not found.
+        """
+        wanted = list(dict.fromkeys(trip_ids))  # drop duplicates, keep order
+        by_collection = {}
+        if self.partitions:
+            # One directory query for uncached ids, then one query per partition
+            located = self.partitions.locate_many(wanted)
+            for trip_id in wanted:
+                by_collection.setdefault(located.get(trip_id), []).append(trip_id)
+        else:
+            by_collection[None] = wanted
+        found = {}
+        for name, ids in by_collection.items():
+            collection = self.partitions.collection(name) if name else self.db_collection
+            found.update((t["trip_id"], t) for t in collection.find({"trip_id": {"$in": ids}}, NO_ID))
+        misses = [trip_id for trip_id in wanted if trip_id not in found]
+        if misses and self.archive_collection is not None:
+            found.update(
+                (t["trip_id"], t)
+                for t in self.archive_collection.find({"trip_id": {"$in": misses}}, NO_ID)
+            )
+
+        with phase("hydrate"):
+            trips = [Trip.from_db(found[trip_id]) for trip_id in wanted if trip_id in found]
+        missing = [trip_id for trip_id in wanted if trip_id not in found]
+        return trips, missing
+
+    def add_passenger_to_trip(
+        self, trip_id: str, passenger_id: str, session: Optional[ClientSession] = None
+    ) -> bool:
         """Add a passenger to a trip in the database.
 
         Returns True if the passenger was added; False if the trip is full or passenger already present.
         """
         # Ensure capacity before adding and avoid duplicates atomically
-        result = self.db_collection.update_one(
+        result = self._trip_collection(trip_id).update_one(
             {
                 "trip_id": trip_id,
                 "$expr": {"$lt": [{"$size": "$passengers"}, "$capacity"]},
                 "passengers": {"$ne": passenger_id},
             },
             {"$addToSet": {"passengers": passenger_id}},
+            session=session,
         )
-        return result.modified_count == 1
+        if result.modified_count != 1:
+            return False
+        # Only the id is known here; filtered streams pass such events through
+        self.publish_event("updated", {"trip_id": trip_id})
+        return True
+
+    def seat_passenger(
+        self, trip_id: str, passenger_id: str, session: Optional[ClientSession] = None
+    ) -> Optional[Trip]:
+        """Add a passenger to a trip and return the updated trip in the same round trip.
 
-    def delete_trip(self, trip_id: str) -> bool:
+        Applies the same capacity and duplicate checks as `add_passenger_to_trip`.
+        Does not publish an event, since it may run inside a transaction; see `publish_event`.
+
+        Args:
+            session: Optional session, e.g. to take part in a multi-document transaction.
+
+        Returns:
+            The updated Trip, or None if the trip was not found, is full or already has the passenger.
+        """
+        data = self._trip_collection(trip_id).find_one_and_update(
+            {
+                "trip_id": trip_id,
+                "$expr": {"$lt": [{"$size": "$passengers"}, "$capacity"]},
+                "passengers": {"$ne": passenger_id},
+            },
+            {"$addToSet": {"passengers": passenger_id}},
+            projection=NO_ID,
+            return_document=ReturnDocument.AFTER,
+            session=session,
+        )
+        if not data:
+            return None
+        return Trip.from_db(data)
+
+    def delete_trip(self, trip_id: str, session: Optional[ClientSession] = None) -> bool:
         """Delete a trip by id. Returns True if a document was deleted."""
-        result = self.db_collection.delete_one({"trip_id": trip_id})
-        return result.deleted_count == 1
+        result = self._trip_collection(trip_id).delete_one({"trip_id": trip_id}, session=session)
+        if result.deleted_count != 1:
+            return False
+        if self.partitions:
+            self.partitions.forget(trip_id, session=session)
+        self.publish_event("deleted", {"trip_id": trip_id})
+        return True
+
+    def hot_set_stats(self) -> dict:
+        """Report the size of the hot trips collection and how much of it awaits archival."""
+        collections = [self.db_collection]
+        if self.partitions:
+            collections += [self.partitions.collection(name) for name in self.partitions.names()]
+        now = datetime.now(UTC)
+        stats = {
+            "hot": sum(c.estimated_document_count() for c in collections),
+            "expired": sum(c.count_documents({"return_datetime": {"$lt": now}}) for c in collections),
+        }
+        if self.partitions:
+            stats["partitions"] = len(collections) - 1
+        if self.archive_collection is not None:
+            stats["archived"] = self.archive_collection.estimated_document_count()
+        return stats
+
+
+def trip_collection_names(db: Database) -> List[str]:
+    """Names of the collections holding hot trips: `trips` and its monthly partitions, if any."""
+    return ["trips", *list_partitions(db, "trips")]
+
+
+def create_trip_partitions(
+    db: Database,
+    read_preference: Optional[_ServerMode] = None,
+    lookback: timedelta = timedelta(days=31),
+    cache_size: int = 100_000,
+) -> PartitionSet:
+    """Monthly trip partitions routed by `start_datetime`, see `PartitionSet`.
+
+    Args:
+        lookback: Longest supported trip; upcoming searches also read the
+            partitions of this period, since trips that started then may still be ongoing.
+    """
+    return PartitionSet(
+        db,
+        base_name="trips",
+        id_field="trip_id",
+        key_field="start_datetime",
+        directory_collection=db.get_collection("trip_partitions"),
+        create_indexes=TripManager.create_partition_indexes,
+        read_preference=read_preference,
+        lookback=lookback,
+        cache_size=cache_size,
+    )
@@ -1,50 +1,306 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from datetime import datetime, UTC
-from uuid import uuid4
 from pymongo.collection import Collection
-from pymongo import MongoClient
-from src.bll_models import TripRequest
+from pymongo import MongoClient, ReturnDocument
+from pymongo.client_session import ClientSession
+from pymongo.read_preferences import _ServerMode
+from src.bll_models import TripRequest, TripRequestStatus, normalize_destination
+from src.ids import new_id
+from src.notification_manager import NotificationManager
+from src.read_routing import for_reads
+from src.write_behind import WriteBehindBuffer
+from shared.server_timing import phase
+
+
+# Projection leaving out Mongo's `_id`, which the models do not use
+NO_ID = {"_id": 0}
+
+# Order of paginated request listings; request_id breaks ties so pages do not overlap
+REQUEST_ORDER = [("earliest_start_date", 1), ("request_id", 1)]
+
+# Secondary indexes of the trip requests collection, built by a migration (src/migrations.py)
+REQUEST_INDEXES = [
+    # Bounds the "upcoming" filter and the archiver's expiry scan
+    [("latest_start_date", 1)],
+    # "My requests" screen: a passenger's requests, optionally by status, in start order
+    [("passenger_id", 1), ("status", 1), ("earliest_start_date", 1)],
+    # Incremental exports scan by update time (src/exporter.py); _id orders ties
+    [("updated_at", 1), ("_id", 1)],
+    # Driver search, e.g. pending requests to X starting next weekend. The window
+    # predicate bounds `earliest_start_date`; `latest_start_date` is checked on the
+    # index keys, so non-overlapping requests are never fetched.
+    [("status", 1), ("destination_key", 1), ("earliest_start_date", 1), ("latest_start_date", 1)],
+]
 
 
 class TripRequestManager:
     """Manages trip request creation and storage operations."""
 
-    def __init__(self, db_collection: Collection):
-        """Initialize TripRequestManager."""
+    def __init__(
+        self,
+        db_collection: Collection,
+        archive_collection: Optional[Collection] = None,
+        write_behind: Optional[WriteBehindBuffer] = None,
+        notification_manager: Optional[NotificationManager] = None,
+        read_preference: Optional[_ServerMode] = None,
+    ):
+        """Initialize TripRequestManager.
+
+        Args:
+            db_collection: MongoDB collection for storing trip requests.
+            archive_collection: Optional collection holding expired requests moved out by the archiver.
+            write_behind: Optional buffer; if set, new requests are inserted in batches
+                after being journaled locally instead of one `insert_one` per request.
+                Its `on_flush` hook should be `notification_manager.index_stored_requests`,
+                so postings only ever point at stored requests.
+            notification_manager: Optional; pending requests are registered with it so
+                their passengers are notified of matching new trips.
+            read_preference: Optional read preference (e.g. secondaryPreferred) for list
+                queries and for detail reads in a causally consistent session.
+        """
         self.trip_requests_collection = db_collection
+        self.archive_collection = archive_collection
+        self.write_behind = write_behind
+        self.notification_manager = notification_manager
+        self.read_collection = for_reads(db_collection, read_preference)
+        self.archive_read_collection = for_reads(archive_collection, read_preference)
+        # The other indexes (REQUEST_INDEXES) are built by migrations, not at startup
         self.trip_requests_collection.create_index("request_id", unique=True)
 
-    def create_trip_request(self, trip_request: TripRequest) -> str:
-        """Create a new trip request and store it in the database."""
-        trip_request_dict = trip_request.model_dump()
+    def create_trip_request(self, trip_request: TripRequest, session: Optional[ClientSession] = None) -> str:
+        """Create a new trip request and store it in the database.
+
+        In write-behind mode the request is only journaled locally here and reaches
+        the database with the next batch; it can already be read back by id from
+        this process, and is indexed for notifications by the flush. Raises
+        BufferFullError if the buffer has no room.
+        """
+        trip_request_dict = trip_request.to_dict()
         
-        request_id = trip_request_dict.get("request_id") or str(uuid4())
+        request_id = trip_request_dict.get("request_id") or new_id()
         trip_request_dict["request_id"] = request_id
-        self.trip_requests_collection.insert_one(trip_request_dict)
+        trip_request_dict["destination_key"] = normalize_destination(trip_request.destination)
         trip_request.request_id = request_id
+        if self.write_behind:
+            self.write_behind.put(trip_request_dict)
+            return request_id
+        self.trip_requests_collection.insert_one(trip_request_dict, session=session)
+        if self.notification_manager and trip_request.status == TripRequestStatus.PENDING:
+            self.notification_manager.index_request(trip_request)
             
         return trip_request.request_id
 
-    def get_trip_request_by_id(self, request_id: str) -> Optional[TripRequest]:
-        """Find a single trip request by its `request_id`."""
-        data = self.trip_requests_collection.find_one({"request_id": request_id})
+    def _flush_buffered(self, request_id: str) -> None:
+        """Write the request to the database first if write-behind still buffers it,
+        so updates find it there."""
+        if self.write_behind and self.write_behind.get(request_id) is not None:
+            self.write_behind.flush()
+
+    def get_trip_request_by_id(
+        self, request_id: str, session: Optional[ClientSession] = None
+    ) -> Optional[TripRequest]:
+        """Find a single trip request by its `request_id`, falling back to the archive.
+
+        Reads from the primary, or with the configured read preference when given
+        a causally consistent `session` that guarantees the caller's writes are seen.
+        """
+        if self.write_behind:
+            buffered = self.write_behind.get(request_id)
+            if buffered:
+                return TripRequest.from_db(buffered)
+        collection = self.trip_requests_collection if session is None else self.read_collection
+        data = collection.find_one({"request_id": request_id}, NO_ID, session=session)
+        if not data and self.archive_collection is not None:
+            data = self.archive_collection.find_one({"request_id": request_id}, NO_ID)
         if not data:
             return None
-        return TripRequest(**data)
+        return TripRequest.from_db(data)
+
+    def get_trip_requests_by_ids(self, request_ids: List[str]) -> Tuple[List[TripRequest], List[str]]:
+        """Find several trip requests with a single `$in` query.
+
+        Requests still buffered by write-behind are served from memory; only the
+        remaining ids go to the database (and misses there to the archive).
+
+        Returns:
+            The found requests in the order of `request_ids`, and the ids that were not found.
+        """
+        wanted = list(dict.fromkeys(request_ids))  # drop duplicates, keep order
+        found = {}
+        if self.write_behind:
+            for request_id in wanted:
+                buffered = self.write_behind.get(request_id)
+                if buffered:
+                    found[request_id] = buffered
+
+        for collection in (self.trip_requests_collection, self.archive_collection):
+            misses = [request_id for request_id in wanted if request_id not in found]
+            if not misses or collection is None:
+                continue
+            found.update(
+                (r["request_id"], r)
+                for r in collection.find({"request_id": {"$in": misses}}, NO_ID)
+            )
+
+        with phase("hydrate"):
+            trip_requests = [TripRequest.from_db(found[r]) for r in wanted if r in found]
+        missing = [request_id for request_id in wanted if request_id not in found]
+        return trip_requests, missing
+
+    def get_all_trip_requests(
+        self,
+        destination: Optional[str] = None,
+        include_past: bool = False,
+        passenger_id: Optional[str] = None,
+        status: Optional[TripRequestStatus] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        destination_exact: Optional[str] = None,
+        window_start: Optional[datetime] = None,
+        window_end: Optional[datetime] = None,
+    ) -> List[TripRequest]:
+        """Retrieve all trip requests, optionally filtered by destination, passenger, status and start window.
+
+        By default only requests whose start window has not passed yet are returned;
+        `include_past` also returns expired and archived requests.
+
+        Args:
+            destination: Optional destination substring (case-insensitive contains).
+            destination_exact: Optional destination compared exactly after normalizing
+                case and spacing; unlike `destination` it can use an index.
+            window_start: Optional start of a period; only requests whose start window
+                overlaps it are returned.
+            window_end: Optional end of that period, see `window_start`.
+            limit: Optional page size. Pages are ordered by earliest start date;
+                without a limit the order is unspecified.
+            offset: Number of matching requests to skip; only used together with `limit`.
+        """
+        query = self._build_query(
+            destination, include_past, passenger_id, status, destination_exact, window_start, window_end
+        )
+
+        collections = [self.read_collection]
+        if include_past and self.archive_read_collection is not None:
+            collections.append(self.archive_read_collection)
+
+        # With several collections every one must return its first offset + limit
+        # matches; the page is cut after merging them
+        skip = offset if len(collections) == 1 else 0
+        page_end = None if limit is None else offset + limit
+
+        all_requests_data = []
+        for collection in collections:
+            cursor = collection.find(query, NO_ID)
+            if limit is not None:
+                cursor = cursor.sort(REQUEST_ORDER).skip(skip).limit(page_end - skip)
+            all_requests_data.extend(cursor)
 
-    def get_all_trip_requests(self, destination: Optional[str] = None) -> List[TripRequest]:
-        """Retrieve all trip requests, optionally filtered by destination."""
+        if limit is not None and len(collections) > 1:
+            all_requests_data.sort(key=lambda r: (r["earliest_start_date"], r["request_id"]))
+            all_requests_data = all_requests_data[offset:page_end]
+        with phase("hydrate"):
+            return [TripRequest.from_db(r) for r in all_requests_data]
+
+    def _build_query(
+        self,
+        destination: Optional[str] = None,
+        include_past: bool = False,
+        passenger_id: Optional[str] = None,
+        status: Optional[TripRequestStatus] = None,
+        destination_exact: Optional[str] = None,
+        window_start: Optional[datetime] = None,
+        window_end: Optional[datetime] = None,
+    ) -> dict:
+        """Build the MongoDB filter for trip request searches."""
         query: dict = {}
+        if status:
+            query["status"] = TripRequestStatus(status).value
+        if destination_exact:
+            query["destination_key"] = normalize_destination(destination_exact)
         if destination:
             query["destination"] = {"$regex": destination, "$options": "i"}
+        if passenger_id:
+            query["passenger_id"] = passenger_id
 
-        all_requests_data = self.trip_requests_collection.find(query)
-        return [TripRequest(**r) for r in all_requests_data]
+        # A request's start window [earliest, latest] overlaps [window_start, window_end]
+        # iff earliest <= window_end and latest >= window_start
+        if window_end:
+            query["earliest_start_date"] = {"$lte": window_end}
+        latest_bound = None if include_past else datetime.now(UTC)
+        if window_start and (latest_bound is None or window_start > latest_bound):
+            latest_bound = window_start
+        if latest_bound:
+            query["latest_start_date"] = {"$gte": latest_bound}
+        return query
 
-    def update_trip_request(self, request_id: str, trip_id: str, status: str) -> bool:
+    def update_trip_request(
+        self, request_id: str, trip_id: str, status: str, session: Optional[ClientSession] = None
+    ) -> bool:
         """Update a trip request's status and assign a trip_id."""
+        self._flush_buffered(request_id)
         result = self.trip_requests_collection.update_one(
             {"request_id": request_id},
-            {"$set": {"status": status, "trip_id": trip_id, "updated_at": datetime.now(UTC)}}
+            {"$set": {"status": status, "trip_id": trip_id, "updated_at": datetime.now(UTC)}},
+            session=session,
+        )
+        if result.modified_count > 0 and self.notification_manager and status != TripRequestStatus.PENDING:
+            self.notification_manager.unindex_request(request_id)
+        return result.modified_count > 0
+
+    def accept_trip_request(
+        self, request_id: str, trip_id: str, session: Optional[ClientSession] = None
+    ) -> Optional[TripRequest]:
+        """Mark a pending trip request as accepted for `trip_id`.
+
+        Args:
+            session: Optional session, e.g. to take part in a multi-document transaction.
+
+        Returns:
+            The updated TripRequest, or None if the request was not found or is not pending.
+        """
+        self._flush_buffered(request_id)
+        data = self.trip_requests_collection.find_one_and_update(
+            {"request_id": request_id, "status": TripRequestStatus.PENDING.value},
+            {"$set": {
+                "status": TripRequestStatus.ACCEPTED.value,
+                "trip_id": trip_id,
+                "updated_at": datetime.now(UTC),
+            }},
+            projection=NO_ID,
+            return_document=ReturnDocument.AFTER,
+            session=session,
+        )
+        if not data:
+            return None
+        if self.notification_manager:
+            # Same session, so an aborted booking keeps the request's postings
+            self.notification_manager.unindex_request(request_id, session=session)
+        return TripRequest.from_db(data)
+
+    def revert_acceptance(self, request_id: str, trip_id: str) -> bool:
+        """Set a request accepted for `trip_id` back to pending (compensation step)."""
+        result = self.trip_requests_collection.update_one(
+            {"request_id": request_id, "status": TripRequestStatus.ACCEPTED.value, "trip_id": trip_id},
+            {"$set": {
+                "status": TripRequestStatus.PENDING.value,
+                "trip_id": None,
+                "updated_at": datetime.now(UTC),
+            }},
         )
+        if result.modified_count > 0 and self.notification_manager:
+            data = self.trip_requests_collection.find_one({"request_id": request_id}, NO_ID)
+            if data:
+                self.notification_manager.index_request(TripRequest.from_db(data))
         return result.modified_count > 0
+
+    def hot_set_stats(self) -> dict:
+        """Report the size of the hot requests collection and how much of it awaits archival."""
+        stats = {
+            "hot": self.trip_requests_collection.estimated_document_count(),
+            "expired": self.trip_requests_collection.count_documents(
+                {"latest_start_date": {"$lt": datetime.now(UTC)}}
+            ),
+        }
+        if self.archive_collection is not None:
+            stats["archived"] = self.archive_collection.estimated_document_count()
+        return stats
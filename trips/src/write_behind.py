@@ -0,0 +1,271 @@
+import atexit
+import fcntl
+import glob
+import logging
+import os
+import threading
+import time
+from typing import Callable, List, Optional
+
+from bson import json_util
+from pymongo.collection import Collection
+from pymongo.errors import BulkWriteError
+
+from src.metrics import metrics
+
+
+logger = logging.getLogger("trips-ms")
+
+# MongoDB's duplicate key error code
+DUPLICATE_KEY = 11000
+
+
+class BufferFullError(Exception):
+    """Raised when the write-behind buffer stays full for longer than the put timeout."""
+
+
+class WriteBehindBuffer:
+    """Acknowledges inserts once they are journaled locally and writes them to MongoDB in batches.
+
+    Each document is appended to a local journal segment and fsynced before
+    `put` returns. The fsync runs outside the buffer lock and covers every
+    document appended before it (group commit), so concurrent puts share disk
+    flushes instead of queueing for their own. Datetimes are journaled with
+    millisecond precision, the same precision MongoDB stores them with. A
+    background thread flushes buffered documents with
+    `insert_many` once `max_batch` documents are waiting or `flush_interval`
+    seconds have passed, then deletes the journal segments they came from.
+
+    Segments are locked by the process writing them. On start, segments no
+    live process holds (left behind by a crash) are replayed, so an
+    acknowledged insert is never lost.
+
+    An optional `on_flush` hook runs on each batch once it is stored and before
+    its journal segments are deleted, e.g. to index the new documents. If the
+    hook raises, the batch is flushed again, so it must be safe to repeat.
+    """
+
+    def __init__(
+        self,
+        db_collection: Collection,
+        journal_dir: str,
+        key_field: str,
+        max_batch: int = 500,
+        flush_interval: float = 0.2,
+        max_buffer: int = 10000,
+        put_timeout: float = 1.0,
+        on_flush: Optional[Callable[[List[dict]], None]] = None,
+    ):
+        """Initialize WriteBehindBuffer and replay documents left in the journal.
+
+        Args:
+            db_collection: MongoDB collection the documents are inserted into.
+            journal_dir: Local directory holding the journal segments.
+            key_field: Unique application-level id of the documents, e.g. "request_id".
+            max_batch: Flush as soon as this many documents are buffered.
+            flush_interval: Flush at least this often (seconds) while documents are buffered.
+            max_buffer: Maximum number of buffered documents before `put` blocks.
+            put_timeout: Seconds `put` waits for room before raising BufferFullError.
+            on_flush: Optional hook called with each batch after it is inserted.
+        """
+        self.db_collection = db_collection
+        self.journal_dir = journal_dir
+        self.key_field = key_field
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.put_timeout = put_timeout
+        self.on_flush = on_flush
+
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        # Held while fsyncing the journal; taken before `_cond`, never while holding it
+        self._sync_lock = threading.Lock()
+        self._written = 0
+        self._synced = 0
+        self._pending: dict = {}
+        self._stopped = False
+        self._segment_seq = 0
+        self._segments: list = []
+
+        os.makedirs(journal_dir, exist_ok=True)
+        self._replay_journal()
+        self._journal = self._open_segment()
+
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def put(self, doc: dict) -> None:
+        """Durably queue a document for insertion.
+
+        Blocks while the buffer is full (backpressure).
+
+        Raises:
+            BufferFullError: If no room became available within `put_timeout`.
+        """
+        line = json_util.dumps(doc) + "\n"
+        with self._cond:
+            deadline = time.monotonic() + self.put_timeout
+            while len(self._pending) >= self.max_buffer:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._stopped:
+                    metrics.incr("write_behind.rejected")
+                    raise BufferFullError("Write-behind buffer is full")
+                self._cond.wait(remaining)
+
+            self._journal.write(line)
+            self._journal.flush()
+            self._written += 1
+            seq = self._written
+            self._pending[doc[self.key_field]] = doc
+            metrics.gauge("write_behind.buffered", len(self._pending))
+            if len(self._pending) >= self.max_batch:
+                self._cond.notify_all()
+
+        try:
+            self._sync(seq)
+        except Exception:
+            with self._cond:
+                self._pending.pop(doc[self.key_field], None)
+            raise
+
+    def _sync(self, seq: int) -> None:
+        """Make the journal durable up to the `seq`-th appended document.
+
+        A single fsync covers everything appended before it, so a put whose
+        document was already covered by a concurrent put's fsync returns at once.
+        """
+        with self._sync_lock:
+            if self._synced >= seq:
+                return
+            with self._cond:
+                # Segments only rotate in `flush`, which syncs them under `_sync_lock` first
+                written = self._written
+                journal = self._journal
+            os.fsync(journal.fileno())
+            metrics.observe("write_behind.fsync_batch", written - self._synced)
+            self._synced = written
+
+    def get(self, key: str) -> Optional[dict]:
+        """Return a buffered document that has not been flushed yet (read-your-writes)."""
+        with self._cond:
+            return self._pending.get(key)
+
+    def flush(self) -> int:
+        """Insert all buffered documents into MongoDB.
+
+        Returns:
+            The number of documents written.
+        """
+        with self._flush_lock:
+            with self._sync_lock:
+                with self._cond:
+                    batch: List[dict] = list(self._pending.values())
+                    if not batch:
+                        return 0
+                    # Seal the segments holding `batch`; new puts go to a fresh segment
+                    sealed = self._segments
+                    self._segments = []
+                    self._journal = self._open_segment()
+                    written = self._written
+                if self._synced < written:
+                    # Puts still waiting for their fsync may have appended to a sealed segment
+                    for _, journal in sealed:
+                        os.fsync(journal.fileno())
+                    self._synced = written
+
+            try:
+                for i in range(0, len(batch), self.max_batch):
+                    self._insert(batch[i:i + self.max_batch])
+                if self.on_flush:
+                    self.on_flush(batch)
+            except Exception:
+                with self._cond:
+                    self._segments = sealed + self._segments
+                raise
+
+            for path, journal in sealed:
+                os.unlink(path)
+                journal.close()
+
+            with self._cond:
+                for doc in batch:
+                    self._pending.pop(doc[self.key_field], None)
+                metrics.gauge("write_behind.buffered", len(self._pending))
+                self._cond.notify_all()
+            return len(batch)
+
+    def close(self) -> None:
+        """Stop the background thread and flush what is left (called on shutdown)."""
+        with self._cond:
+            if self._stopped:
+                return
+            self._stopped = True
+            self._cond.notify_all()
+        self._thread.join()
+        self.flush()
+        for path, journal in self._segments:
+            if not self._pending:
+                os.unlink(path)
+            journal.close()
+
+    def _insert(self, docs: List[dict]) -> None:
+        """Insert a batch, ignoring documents that already made it in before a crash."""
+        start = time.perf_counter()
+        try:
+            # Copies, because insert_many adds an `_id` to the documents it is given
+            self.db_collection.insert_many([dict(d) for d in docs], ordered=False)
+        except BulkWriteError as e:
+            if any(err["code"] != DUPLICATE_KEY for err in e.details.get("writeErrors", [])):
+                raise
+        metrics.observe("write_behind.flush_ms", (time.perf_counter() - start) * 1000)
+        metrics.incr("write_behind.flushed", len(docs))
+
+    def _run(self) -> None:
+        """Background loop flushing by size or time threshold."""
+        while True:
+            with self._cond:
+                if not self._stopped and len(self._pending) < self.max_batch:
+                    self._cond.wait(self.flush_interval)
+                if self._stopped:
+                    return
+            try:
+                self.flush()
+            except Exception:
+                logger.error("Write-behind flush failed, retrying", exc_info=True)
+                time.sleep(self.flush_interval)
+
+    def _open_segment(self):
+        """Open and lock a new journal segment owned by this process."""
+        self._segment_seq += 1
+        name = f"{os.getpid()}-{time.time_ns()}-{self._segment_seq}"
+        tmp_path = os.path.join(self.journal_dir, f".{name}.tmp")
+        path = os.path.join(self.journal_dir, f"{name}.ndjson")
+        journal = open(tmp_path, "a", encoding="utf-8")
+        fcntl.flock(journal, fcntl.LOCK_EX)
+        # Only make the segment visible to `_replay_journal` once it is locked
+        os.rename(tmp_path, path)
+        self._segments.append((path, journal))
+        return journal
+
+    def _replay_journal(self) -> None:
+        """Take over segments of dead processes and buffer their unflushed documents."""
+        for path in sorted(glob.glob(os.path.join(self.journal_dir, "*.ndjson"))):
+            journal = open(path, "a+", encoding="utf-8")
+            try:
+                fcntl.flock(journal, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                # Still owned by a live worker
+                journal.close()
+                continue
+
+            journal.seek(0)
+            for line in journal:
+                if line.strip():
+                    doc = json_util.loads(line)
+                    self._pending[doc[self.key_field]] = doc
+            self._segments.append((path, journal))
+
+        if self._pending:
+            logger.info(f"Replaying {len(self._pending)} journaled documents")
@@ -0,0 +1,66 @@
+import pytest
+from datetime import datetime, timedelta, UTC
+
+from src.bll_models import TripRequest, TripRequestStatus
+from src.trip_request_manager import TripRequestManager
+
+
+def winning_stages(explain: dict) -> list:
+    """Flatten the winning plan of an explain() result into its stage dicts."""
+    stages = []
+    plan = explain["queryPlanner"]["winningPlan"]
+    plan = plan.get("queryPlan", plan)  # slot-based engine wraps the classic plan
+    todo = [plan]
+    while todo:
+        stage = todo.pop()
+        stages.append(stage)
+        todo.extend(stage.get("inputStages", []))
+        if "inputStage" in stage:
+            todo.append(stage["inputStage"])
+    return stages
+
+
+@pytest.fixture
+def trip_request_manager(trip_requests_collection):
+    """TripRequestManager on the real collection, so its indexes exist."""
+    manager = TripRequestManager(db_collection=trip_requests_collection)
+    now = datetime.now(UTC)
+    for i in range(20):
+        manager.create_trip_request(TripRequest(
+            passenger_id=f"pass{i % 4}",
+            destination="Lake Tahoe" if i % 2 else "Yosemite",
+            earliest_start_date=now + timedelta(days=i),
+            latest_start_date=now + timedelta(days=i + 2),
+        ))
+    return manager
+
+
+def test_driver_search_uses_status_destination_index(trip_request_manager, trip_requests_collection):
+    """The window search is answered by an index scan bounded on earliest_start_date."""
+    window_start = datetime.now(UTC) + timedelta(days=5)
+    query = trip_request_manager._build_query(
+        status=TripRequestStatus.PENDING,
+        destination_exact="lake tahoe",
+        window_start=window_start,
+        window_end=window_start + timedelta(days=2),
+    )
+
+    stages = winning_stages(trip_requests_collection.find(query).explain())
+
+    ixscans = [s for s in stages if s["stage"] == "IXSCAN"]
+    assert ixscans, "expected an index scan"
+    assert ixscans[0]["keyPattern"] == {
+        "status": 1, "destination_key": 1, "earliest_start_date": 1, "latest_start_date": 1
+    }
+    assert not any(s["stage"] == "COLLSCAN" for s in stages)
+
+
+def test_passenger_requests_use_passenger_status_index(trip_request_manager, trip_requests_collection):
+    """The passenger's request list is answered by the (passenger_id, status) index."""
+    query = trip_request_manager._build_query(passenger_id="pass1", status=TripRequestStatus.PENDING)
+
+    stages = winning_stages(trip_requests_collection.find(query).explain())
+
+    ixscans = [s for s in stages if s["stage"] == "IXSCAN"]
+    assert ixscans, "expected an index scan"
+    assert list(ixscans[0]["keyPattern"])[:2] == ["passenger_id", "status"]
@@ -0,0 +1,78 @@
+import threading
+import time
+
+import pytest
+
+from src.admission import AdmissionController, AdmissionRejected, Priority
+
+
+def test_acquire_within_limit_does_not_wait():
+    """Test that requests below the concurrency limit are admitted immediately."""
+    controller = AdmissionController(max_concurrent=2, max_queue=2)
+
+    assert controller.acquire() == 0.0
+    assert controller.acquire() == 0.0
+    assert controller.in_flight == 2
+
+
+def test_queue_full_is_rejected():
+    """Test that a request is shed when the queue has no room for its priority."""
+    controller = AdmissionController(max_concurrent=1, max_queue=0)
+    controller.acquire()
+
+    with pytest.raises(AdmissionRejected, match="queue full"):
+        controller.acquire(Priority.HIGH)
+
+
+def test_queue_timeout_is_rejected():
+    """Test that a request waiting longer than its queue timeout is shed."""
+    controller = AdmissionController(max_concurrent=1, max_queue=4, queue_timeouts={Priority.LOW: 0.01})
+    controller.acquire()
+
+    with pytest.raises(AdmissionRejected, match="queue timeout"):
+        controller.acquire(Priority.LOW)
+    assert controller.queued == 0
+
+
+def test_low_priority_gets_smaller_queue_share():
+    """Test that list polling cannot fill the queue reserved for writes."""
+    controller = AdmissionController(max_concurrent=1, max_queue=2)
+    controller.acquire()
+    waiter = threading.Thread(target=controller.acquire, args=(Priority.HIGH,))
+    waiter.start()
+    while controller.queued < 1:
+        time.sleep(0.001)
+
+    with pytest.raises(AdmissionRejected, match="queue full"):
+        controller.acquire(Priority.LOW)
+
+    controller.release()
+    waiter.join()
+
+
+def test_release_hands_slot_to_highest_priority():
+    """Test that a freed slot goes to the waiting request with the highest priority."""
+    controller = AdmissionController(max_concurrent=1, max_queue=4)
+    controller.acquire()
+    admitted = []
+
+    def request(priority):
+        controller.acquire(priority)
+        admitted.append(priority)
+
+    low = threading.Thread(target=request, args=(Priority.LOW,))
+    low.start()
+    while controller.queued < 1:
+        time.sleep(0.001)
+    high = threading.Thread(target=request, args=(Priority.HIGH,))
+    high.start()
+    while controller.queued < 2:
+        time.sleep(0.001)
+
+    controller.release()
+    high.join()
+    controller.release()
+    low.join()
+
+    assert admitted == [Priority.HIGH, Priority.LOW]
+    assert controller.in_flight == 1
@@ -0,0 +1,60 @@
+from datetime import datetime, UTC
+
+import pytest
+from pymongo import ReplaceOne
+
+from src.archiver import Archiver
+
+
+@pytest.fixture
+def collections(mocker):
+    """Fixture for mocked source and archive collections."""
+    source, archive = mocker.MagicMock(), mocker.MagicMock()
+    source.name = "trips"
+    return source, archive
+
+
+def test_archive_expired_moves_batches(collections):
+    """Test that expired documents are copied to the archive and then deleted from the source."""
+    source, archive = collections
+    now = datetime(2025, 6, 1, tzinfo=UTC)
+    first = [{"_id": 1}, {"_id": 2}]
+    second = [{"_id": 3}]
+    source.find.return_value.limit.side_effect = [first, second]
+    source.delete_many.return_value.deleted_count = 2
+
+    archiver = Archiver(source, archive, "return_datetime", batch_size=2, pause_seconds=0)
+    archiver.archive_expired(now=now)
+
+    source.find.assert_called_with({"return_datetime": {"$lt": now}})
+    assert archive.bulk_write.call_count == 2
+    assert archive.bulk_write.call_args_list[0][0][0] == [
+        ReplaceOne({"_id": 1}, {"_id": 1}, upsert=True),
+        ReplaceOne({"_id": 2}, {"_id": 2}, upsert=True),
+    ]
+    source.delete_many.assert_called_with({"_id": {"$in": [3]}, "return_datetime": {"$lt": now}})
+
+
+def test_archive_expired_nothing_to_do(collections):
+    """Test that no writes happen when nothing has expired."""
+    source, archive = collections
+    source.find.return_value.limit.return_value = []
+
+    moved = Archiver(source, archive, "return_datetime").archive_expired()
+
+    assert moved == 0
+    archive.bulk_write.assert_not_called()
+    source.delete_many.assert_not_called()
+
+
+def test_archived_partition_documents_leave_the_directory(collections, mocker):
+    """Test that trips archived from a partition are forgotten, except ones no longer expired."""
+    source, archive = collections
+    source.find.return_value.limit.return_value = [{"_id": 1, "trip_id": "a"}, {"_id": 2, "trip_id": "b"}]
+    source.delete_many.return_value.deleted_count = 1
+    source.distinct.return_value = [2]
+    partitions = mocker.MagicMock(id_field="trip_id")
+
+    Archiver(source, archive, "return_datetime", partitions=partitions).archive_expired()
+
+    partitions.forget_many.assert_called_once_with(["a"])
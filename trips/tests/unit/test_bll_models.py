@@ -1,6 +1,7 @@
 import pytest
 from pydantic import ValidationError
 from datetime import datetime, timedelta, timezone
+from src.api_models import TripBody, TripRequestBody
 from src.bll_models import Trip, TripRequest, TripRequestStatus
 
 
@@ -272,3 +273,142 @@ def test_trip_request_to_dict():
     assert request_dict["trip_id"] == "trip456"
     assert isinstance(request_dict["created_at"], datetime)
     assert isinstance(request_dict["updated_at"], datetime)
+
+
+def test_trip_coordinates_must_be_paired():
+    """Test that a pickup latitude without longitude raises an error."""
+    with pytest.raises(ValidationError, match="must be given together"):
+        Trip(
+            driver_id="driver123",
+            driver_car="Tesla Model 3",
+            capacity=3,
+            destination="Lake Tahoe",
+            pickup_location="San Francisco",
+            start_datetime=datetime(2025, 6, 1, 10, 0),
+            return_datetime=datetime(2025, 6, 1, 18, 0),
+            cost_per_passenger=25.0,
+            pickup_lat=37.77,
+        )
+
+
+def test_trip_pickup_point():
+    """Test that the pickup point is GeoJSON with [lon, lat] ordering."""
+    trip = Trip(
+        driver_id="driver123",
+        driver_car="Tesla Model 3",
+        capacity=3,
+        destination="Lake Tahoe",
+        pickup_location="San Francisco",
+        start_datetime=datetime(2025, 6, 1, 10, 0),
+        return_datetime=datetime(2025, 6, 1, 18, 0),
+        cost_per_passenger=25.0,
+        pickup_lat=37.77,
+        pickup_lon=-122.42,
+    )
+    assert trip.pickup_point() == {"type": "Point", "coordinates": [-122.42, 37.77]}
+
+
+@pytest.fixture
+def stored_trip_over_capacity():
+    """Fixture for a stored trip document that would fail validation."""
+    return {
+        "_id": "mongo-id",
+        "pickup_point": {"type": "Point", "coordinates": [0, 0]},
+        "trip_id": "trip1",
+        "driver_id": "driver123",
+        "driver_car": "Tesla Model 3",
+        "capacity": 1,
+        "destination": "Lake Tahoe",
+        "pickup_location": "San Francisco",
+        "start_datetime": datetime(2025, 6, 1, 10, 0),
+        "return_datetime": datetime(2025, 6, 1, 18, 0),
+        "cost_per_passenger": 25.0,
+        # Would fail validation: more passengers than capacity
+        "passengers": ["pass1", "pass2"],
+    }
+
+
+def test_trip_from_db_skips_validation_and_ignores_storage_fields(mocker, stored_trip_over_capacity):
+    """Test that trusted hydration builds a Trip without re-running validators."""
+    mocker.patch("src.bll_models.VALIDATE_ON_READ", False)
+
+    trip = Trip.from_db(stored_trip_over_capacity)
+
+    assert trip.trip_id == "trip1"
+    assert trip.passengers == ["pass1", "pass2"]
+    assert "_id" not in trip.model_dump()
+
+
+def test_trip_from_db_validates_in_debug_mode(mocker, stored_trip_over_capacity):
+    """Test that the debug switch re-enables validation of stored documents."""
+    mocker.patch("src.bll_models.VALIDATE_ON_READ", True)
+
+    with pytest.raises(ValidationError, match="exceeds capacity"):
+        Trip.from_db(stored_trip_over_capacity)
+
+
+def test_trip_request_from_db_restores_status_enum():
+    """Test that trusted hydration turns the stored status string back into the enum."""
+    now = datetime.now(timezone.utc)
+    trip_request = TripRequest.from_db({
+        "request_id": "req123",
+        "passenger_id": "pass123",
+        "destination": "Disneyland",
+        "earliest_start_date": now,
+        "latest_start_date": now + timedelta(days=1),
+        "status": "accepted",
+        "trip_id": "trip456",
+        "created_at": now,
+        "updated_at": now,
+    })
+
+    assert trip_request.status is TripRequestStatus.ACCEPTED
+    assert trip_request.to_dict()["status"] == "accepted"
+
+
+def test_trip_from_body_matches_validated_trip():
+    """Test that a Trip built from a validated TripBody stores the same data as a validated Trip."""
+    body = TripBody(
+        driver_id="driver123",
+        driver_car="Tesla Model 3",
+        capacity=3,
+        destination="Lake Tahoe",
+        pickup_location="San Francisco",
+        start_datetime=datetime(2025, 6, 1, 10, 0),
+        return_datetime=datetime(2025, 6, 1, 18, 0),
+        cost_per_passenger=25.0,
+    )
+
+    assert Trip.from_body(body).to_dict() == Trip(**body.model_dump()).to_dict()
+
+
+def test_trip_body_enforces_trip_rules():
+    """Test that the request body already rejects what the Trip model would reject."""
+    with pytest.raises(ValidationError, match="return_datetime must be after start_datetime"):
+        TripBody(
+            driver_id="driver123",
+            driver_car="Tesla Model 3",
+            capacity=3,
+            destination="Lake Tahoe",
+            pickup_location="San Francisco",
+            start_datetime=datetime(2025, 6, 1, 18, 0),
+            return_datetime=datetime(2025, 6, 1, 10, 0),
+            cost_per_passenger=25.0,
+        )
+
+
+def test_trip_request_from_body_is_pending():
+    """Test that a TripRequest built from a validated body gets the server-side defaults."""
+    now = datetime.now(timezone.utc)
+    body = TripRequestBody(
+        passenger_id="pass123",
+        destination="Disneyland",
+        earliest_start_date=now + timedelta(days=1),
+        latest_start_date=now + timedelta(days=2),
+    )
+
+    trip_request = TripRequest.from_body(body)
+
+    assert trip_request.status == TripRequestStatus.PENDING
+    assert trip_request.to_dict()["status"] == "pending"
+    assert isinstance(trip_request.created_at, datetime)
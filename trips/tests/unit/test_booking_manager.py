@@ -0,0 +1,103 @@
+from datetime import datetime, timedelta, UTC
+
+import pytest
+from pymongo.errors import OperationFailure
+
+from src.bll_models import Trip, TripRequest
+from src.booking_manager import BookingManager, BookingError
+
+
+@pytest.fixture
+def trip():
+    """Fixture for a trip that has just been given its second passenger."""
+    return Trip(
+        trip_id="trip1",
+        driver_id="driver123",
+        driver_car="Tesla Model 3",
+        capacity=3,
+        destination="Lake Tahoe",
+        pickup_location="San Francisco",
+        start_datetime=datetime(2025, 6, 1, 10, 0),
+        return_datetime=datetime(2025, 6, 1, 18, 0),
+        cost_per_passenger=25.0,
+        passengers=["other", "pass123"],
+    )
+
+
+@pytest.fixture
+def trip_request():
+    """Fixture for an accepted trip request."""
+    now = datetime.now(UTC)
+    return TripRequest(
+        request_id="req1",
+        passenger_id="pass123",
+        destination="Lake Tahoe",
+        earliest_start_date=now + timedelta(days=1),
+        latest_start_date=now + timedelta(days=2),
+    )
+
+
+@pytest.fixture
+def managers(mocker):
+    """Fixture for mocked trip and trip request managers."""
+    return mocker.MagicMock(), mocker.MagicMock()
+
+
+@pytest.fixture
+def session(managers):
+    """Fixture for the mocked session; with_transaction simply runs the callback."""
+    trip_manager, _ = managers
+    client = trip_manager.db_collection.database.client
+    session = client.start_session.return_value.__enter__.return_value
+    session.with_transaction.side_effect = lambda callback: callback(session)
+    return session
+
+
+def test_accept_trip_request_in_transaction(managers, session, trip, trip_request):
+    """Test that both writes run within the same transaction session."""
+    trip_manager, trip_request_manager = managers
+    trip_request_manager.accept_trip_request.return_value = trip_request
+    trip_manager.seat_passenger.return_value = trip
+
+    result = BookingManager(trip_manager, trip_request_manager).accept_trip_request("req1", "trip1")
+
+    assert result is trip
+    trip_request_manager.accept_trip_request.assert_called_once_with("req1", "trip1", session=session)
+    trip_manager.seat_passenger.assert_called_once_with("trip1", "pass123", session=session)
+
+
+def test_accept_trip_request_trip_full_aborts(managers, session, trip_request):
+    """Test that a full trip raises inside the transaction so the request update is rolled back."""
+    trip_manager, trip_request_manager = managers
+    trip_request_manager.accept_trip_request.return_value = trip_request
+    trip_manager.seat_passenger.return_value = None
+
+    with pytest.raises(BookingError, match="full"):
+        BookingManager(trip_manager, trip_request_manager).accept_trip_request("req1", "trip1")
+    trip_request_manager.revert_acceptance.assert_not_called()
+
+
+def test_accept_trip_request_not_pending(managers, session):
+    """Test that a request that is not pending is rejected before seating anyone."""
+    trip_manager, trip_request_manager = managers
+    trip_request_manager.accept_trip_request.return_value = None
+
+    with pytest.raises(BookingError, match="not pending"):
+        BookingManager(trip_manager, trip_request_manager).accept_trip_request("req1", "trip1")
+    trip_manager.seat_passenger.assert_not_called()
+
+
+def test_accept_trip_request_standalone_fallback_compensates(managers, session, trip_request):
+    """Test that without transaction support a failed seat reverts the request to pending."""
+    trip_manager, trip_request_manager = managers
+    session.with_transaction.side_effect = OperationFailure("Transaction numbers ...", code=20)
+    trip_request_manager.accept_trip_request.return_value = trip_request
+    trip_manager.seat_passenger.return_value = None
+    manager = BookingManager(trip_manager, trip_request_manager)
+
+    with pytest.raises(BookingError):
+        manager.accept_trip_request("req1", "trip1")
+
+    assert manager.transactions_supported is False
+    trip_manager.seat_passenger.assert_called_once_with("trip1", "pass123")
+    trip_request_manager.revert_acceptance.assert_called_once_with("req1", "trip1")
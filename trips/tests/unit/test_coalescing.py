@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+
+from src.coalescing import SingleFlight
+
+
+def run_concurrently(flight: SingleFlight, key: str, fn, callers: int) -> list:
+    """Call `flight.do(key, fn)` from several threads; returns their results or exceptions."""
+    results = [None] * callers
+
+    def call(i):
+        try:
+            results[i] = flight.do(key, fn)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(callers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def slow(result, calls: list, delay: float = 0.1):
+    """Build a function that records its calls and returns `result` after `delay` seconds."""
+    def fn():
+        calls.append(1)
+        time.sleep(delay)
+        if isinstance(result, Exception):
+            raise result
+        return result
+    return fn
+
+
+def test_concurrent_identical_calls_share_one_execution():
+    """Test that concurrent callers with the same key get the leader's result."""
+    flight, calls = SingleFlight("test"), []
+
+    results = run_concurrently(flight, "q", slow("[]", calls), callers=20)
+
+    assert len(calls) == 1
+    assert results == ["[]"] * 20
+
+
+def test_different_keys_run_separately():
+    """Test that only identical keys are coalesced."""
+    flight, calls = SingleFlight("test"), []
+    fn = slow("[]", calls, delay=0.01)
+
+    flight.do("a", fn)
+    flight.do("b", fn)
+
+    assert len(calls) == 2
+
+
+def test_window_reuses_finished_result():
+    """Test that a finished result is reused within the window and recomputed after it."""
+    flight, calls = SingleFlight("test", window=0.05), []
+    fn = slow("[]", calls, delay=0)
+
+    flight.do("q", fn)
+    flight.do("q", fn)
+    assert len(calls) == 1
+
+    time.sleep(0.06)
+    flight.do("q", fn)
+    assert len(calls) == 2
+
+
+def test_without_window_sequential_calls_execute():
+    """Test that with no window only concurrent calls are merged."""
+    flight, calls = SingleFlight("test"), []
+    fn = slow("[]", calls, delay=0)
+
+    flight.do("q", fn)
+    flight.do("q", fn)
+
+    assert len(calls) == 2
+
+
+def test_errors_are_shared_but_not_reused():
+    """Test that waiting callers get the leader's error and later callers retry."""
+    flight, calls = SingleFlight("test", window=10), []
+
+    results = run_concurrently(flight, "q", slow(ValueError("boom"), calls), callers=5)
+
+    assert len(calls) == 1
+    assert all(isinstance(r, ValueError) for r in results)
+    with pytest.raises(ValueError):
+        flight.do("q", slow(ValueError("boom"), calls, delay=0))
+    assert len(calls) == 2
@@ -0,0 +1,98 @@
+import gzip
+
+import brotli
+import zstandard
+from flask import Flask, Response
+
+from src.compression import choose_encoding, register_compression
+
+
+def make_app():
+    """Build a minimal app with compression and a few test routes."""
+    app = Flask(__name__)
+    register_compression(app, min_size=100)
+
+    @app.get("/big")
+    def big():
+        return {"trips": ["trip"] * 100}
+
+    @app.get("/small")
+    def small():
+        return {"trip": "trip1"}
+
+    @app.get("/stream")
+    def stream():
+        return Response((f"line {i}\n" for i in range(50)), mimetype="application/x-ndjson")
+
+    return app
+
+
+def test_choose_encoding_respects_quality_and_preference():
+    """Test Accept-Encoding negotiation."""
+    encodings = ["br", "zstd", "gzip"]
+    assert choose_encoding("gzip, deflate, br", encodings) == "br"
+    assert choose_encoding("gzip;q=1.0, br;q=0.5", encodings) == "gzip"
+    assert choose_encoding("identity", encodings) is None
+    assert choose_encoding("*;q=0.1", encodings) == "br"
+    assert choose_encoding("br;q=0, gzip", encodings) == "gzip"
+
+
+def test_large_response_is_compressed():
+    """Test that responses above the threshold are compressed with the negotiated encoding."""
+    client = make_app().test_client()
+
+    for encoding, decompress in [
+        ("gzip", gzip.decompress),
+        ("br", brotli.decompress),
+        ("zstd", zstandard.ZstdDecompressor().decompress),
+    ]:
+        response = client.get("/big", headers={"Accept-Encoding": encoding})
+        assert response.headers["Content-Encoding"] == encoding
+        assert "Accept-Encoding" in response.headers["Vary"]
+        assert b'"trips"' in decompress(response.get_data())
+
+
+def test_small_response_is_not_compressed():
+    """Test that responses below the threshold are sent uncompressed."""
+    response = make_app().test_client().get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+    assert response.get_json() == {"trip": "trip1"}
+
+
+def test_streamed_response_is_compressed_incrementally():
+    """Test that streamed bodies are compressed chunk by chunk."""
+    response = make_app().test_client().get("/stream", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Content-Length" not in response.headers
+    assert gzip.decompress(response.get_data()).decode().count("line") == 50
+
+
+def test_streamed_response_records_ratio_and_cpu(mocker):
+    """Test that streams report the same compression metrics as buffered responses, for every encoding."""
+    metrics = mocker.patch("src.compression.metrics")
+    decompress = {"gzip": gzip.decompress, "br": brotli.decompress,
+                  "zstd": lambda data: zstandard.ZstdDecompressor().decompressobj().decompress(data)}
+
+    for encoding, decode in decompress.items():
+        metrics.reset_mock()
+        response = make_app().test_client().get("/stream", headers={"Accept-Encoding": encoding})
+        body = response.get_data()
+        response.close()
+
+        text = decode(body)
+        assert text.decode().count("line") == 50
+        observed = {c.args[0]: c.args[1] for c in metrics.observe.call_args_list}
+        assert observed[f"compression.{encoding}.ratio"] == len(text) / len(body)
+        assert observed[f"compression.{encoding}.cpu_ms"] >= 0
+        metrics.incr.assert_any_call("compression.bytes_in", len(text))
+        metrics.incr.assert_any_call("compression.bytes_out", len(body))
+
+
+def test_cpu_cost_is_measured_per_thread(mocker):
+    """Test that the CPU metric counts only the compressing thread, not the whole process."""
+    metrics = mocker.patch("src.compression.metrics")
+    mocker.patch("src.compression.time.thread_time", side_effect=[1.0, 1.25])
+
+    make_app().test_client().get("/big", headers={"Accept-Encoding": "gzip"})
+
+    metrics.observe.assert_any_call("compression.gzip.cpu_ms", 250.0)
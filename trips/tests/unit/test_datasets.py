@@ -0,0 +1,79 @@
+from collections import Counter
+from datetime import datetime, UTC
+
+import pytest
+
+from src.bll_models import Trip, TripRequest
+from src.datasets import DatasetGenerator, PROFILES, seed
+
+
+ANCHOR = datetime(2025, 6, 2, tzinfo=UTC)
+
+
+@pytest.fixture
+def generator():
+    """Fixture for a generator of the tiny profile with a pinned anchor."""
+    return DatasetGenerator(PROFILES["tiny"], ANCHOR)
+
+
+def test_generation_is_deterministic(generator):
+    """Test that the same profile and anchor always produce the same documents."""
+    again = DatasetGenerator(PROFILES["tiny"], ANCHOR)
+
+    assert list(generator.trips()) == list(again.trips())
+    assert list(generator.trip_requests()) == list(again.trip_requests())
+
+
+def test_documents_are_valid(generator):
+    """Test that generated documents pass model validation and have unique ids."""
+    trips = list(generator.trips())
+    requests = list(generator.trip_requests())
+
+    for doc in trips:
+        Trip(**{k: v for k, v in doc.items() if k != "pickup_point"})
+        assert len(doc["passengers"]) <= doc["capacity"]
+    for doc in requests:
+        TripRequest(**{k: v for k, v in doc.items() if k != "destination_key"})
+    assert len({doc["trip_id"] for doc in trips}) == PROFILES["tiny"].trips
+    assert len({doc["request_id"] for doc in requests}) == PROFILES["tiny"].requests
+
+
+def test_distributions(generator):
+    """Test destination skew, partially full trips and the past share."""
+    trips = list(generator.trips())
+
+    destinations = Counter(doc["destination"] for doc in trips).most_common()
+    assert destinations[0][0] == "San Francisco"
+    assert destinations[0][1] > 5 * destinations[len(destinations) // 2][1]
+    partial = sum(1 for doc in trips if 0 < len(doc["passengers"]) < doc["capacity"])
+    assert partial > len(trips) // 4
+    past = sum(1 for doc in trips if doc["start_datetime"] < ANCHOR)
+    assert 0.1 < past / len(trips) < 0.3
+
+
+def test_accepted_requests_reference_generated_trips(generator):
+    """Test that accepted requests point at trips of the same dataset."""
+    trip_ids = {doc["trip_id"] for doc in generator.trips()}
+    accepted = [doc for doc in generator.trip_requests() if doc["status"] == "accepted"]
+
+    assert accepted
+    assert all(doc["trip_id"] in trip_ids for doc in accepted)
+
+
+def test_seed_loads_in_batches_then_indexes(mocker):
+    """Test that seeding drops, bulk-inserts and only then builds the indexes."""
+    db = mocker.MagicMock()
+    collections = {}
+    db.get_collection.side_effect = lambda name: collections.setdefault(name, mocker.MagicMock())
+    profile = PROFILES["tiny"].model_copy(update={"trips": 25, "requests": 10})
+
+    description = seed(db, profile, ANCHOR, batch_size=10, prefix="bench_")
+
+    trips = db.get_collection("bench_trips")
+    assert description["counts"] == {"trips": 25, "trip_requests": 10}
+    assert [len(c.args[0]) for c in trips.insert_many.call_args_list] == [10, 10, 5]
+    assert db.get_collection("bench_trip_requests").insert_many.call_count == 1
+    calls = [name for name, _, _ in trips.mock_calls]
+    assert calls.index("drop") < calls.index("insert_many") < calls.index("create_index")
+    db.get_collection("datasets").replace_one.assert_called_once()
+    assert db.get_collection("datasets").replace_one.call_args[0][0] == {"_id": "bench_"}
@@ -0,0 +1,187 @@
+from datetime import datetime
+
+from bson import ObjectId
+
+import pytest
+from pydantic import ValidationError
+
+from src.api_models import TripStreamQuery
+
+from src.events import EventBus, MongoEventBus, TooManySubscribersError, format_sse, stream_events, trip_filter
+from src.trip_manager import TripManager
+
+
+@pytest.fixture
+def trip_data():
+    """Fixture for a trip document as published by TripManager."""
+    return {
+        "trip_id": "trip1",
+        "driver_id": "driver123",
+        "capacity": 3,
+        "destination": "Lake Tahoe",
+        "pickup_location": "San Francisco",
+        "start_datetime": datetime(2025, 6, 1, 10, 0),
+        "passengers": ["pass1"],
+    }
+
+
+def test_subscribers_receive_matching_events(trip_data):
+    """Test that only events passing the subscription's filter are queued."""
+    bus = EventBus()
+    tahoe = bus.subscribe(matches=trip_filter(destination="tahoe"))
+    yosemite = bus.subscribe(matches=trip_filter(destination="yosemite"))
+
+    bus.publish("created", trip_data)
+
+    assert tahoe.get(timeout=0)["data"]["trip_id"] == "trip1"
+    assert yosemite.get(timeout=0) is None
+
+
+def test_trip_filter_semantics(trip_data):
+    """Test the filter mirrors GET /trips and passes id-only events through."""
+    event = {"data": trip_data}
+    assert trip_filter(pickup="francisco", trip_date=datetime(2025, 6, 1))(event)
+    assert not trip_filter(trip_date=datetime(2025, 6, 2))(event)
+    assert trip_filter(min_seats=2)(event)
+    assert not trip_filter(min_seats=3)(event)
+    assert trip_filter(destination="nowhere")({"data": {"trip_id": "trip1"}})
+    assert trip_filter() is None
+
+
+def test_failing_subscriber_does_not_break_publish(trip_data):
+    """Test that a subscription raising in its filter neither fails publish nor starves the others."""
+    bus = EventBus()
+
+    def broken(event):
+        raise ValueError("boom")
+
+    bus.subscribe(matches=broken)
+    healthy = bus.subscribe()
+
+    bus.publish("created", trip_data)
+
+    assert healthy.get(timeout=0)["data"]["trip_id"] == "trip1"
+
+
+def test_stream_query_rejects_invalid_patterns():
+    """Test that stream filters that are not valid regular expressions are rejected."""
+    with pytest.raises(ValidationError):
+        TripStreamQuery(pickup="(")
+    assert TripStreamQuery(destination="lake.*").destination == "lake.*"
+
+
+def test_resume_after_last_event_id(trip_data):
+    """Test that a reconnecting client gets the events it missed."""
+    bus = EventBus()
+    bus.publish("created", trip_data)
+    bus.publish("deleted", {"trip_id": "trip1"})
+
+    subscription = bus.subscribe(last_event_id="1")
+
+    assert subscription.get(timeout=0)["type"] == "deleted"
+    assert subscription.get(timeout=0) is None
+    assert not subscription.overflowed
+
+
+def test_resume_with_unknown_id_requests_reload():
+    """Test that an id which fell out of the history marks the subscription overflowed."""
+    bus = EventBus(history=1)
+    bus.publish("deleted", {"trip_id": "a"})
+    bus.publish("deleted", {"trip_id": "b"})
+
+    assert bus.subscribe(last_event_id="1").overflowed
+
+
+def test_slow_client_overflows_instead_of_blocking():
+    """Test that a full client queue is cleared and flagged, never blocking the publisher."""
+    bus = EventBus(client_queue_size=2)
+    subscription = bus.subscribe()
+
+    for i in range(3):
+        bus.publish("deleted", {"trip_id": str(i)})
+
+    assert subscription.overflowed
+    assert subscription.get(timeout=0) is None
+
+
+def test_max_subscribers():
+    """Test that subscriptions beyond the limit are refused and freed ones reused."""
+    bus = EventBus(max_subscribers=1)
+    subscription = bus.subscribe()
+    with pytest.raises(TooManySubscribersError):
+        bus.subscribe()
+    bus.unsubscribe(subscription)
+    bus.subscribe()
+
+
+def test_stream_events_heartbeat_reset_and_unsubscribe():
+    """Test the SSE generator's messages and that closing it unsubscribes."""
+    bus = EventBus()
+    subscription = bus.subscribe()
+    stream = stream_events(bus, subscription, heartbeat_seconds=0, retry_ms=1000)
+
+    assert next(stream) == "retry: 1000\n\n"
+    assert next(stream).startswith(": heartbeat")
+    subscription.overflowed = True
+    assert next(stream) == "event: reset\ndata: {}\n\n"
+
+    stream.close()
+    assert bus._subscribers == []
+
+
+def test_format_sse(trip_data):
+    """Test the SSE wire format, with datetimes as ISO strings."""
+    message = format_sse({"id": "7", "type": "created", "data": {"start_datetime": trip_data["start_datetime"]}})
+    assert message == 'id: 7\nevent: created\ndata: {"start_datetime": "2025-06-01T10:00:00"}\n\n'
+
+
+def test_trip_manager_publishes_writes(mocker, trip_data):
+    """Test that TripManager publishes created and deleted events after successful writes."""
+    bus = mocker.MagicMock()
+    collection = mocker.MagicMock()
+    collection.delete_one.return_value.deleted_count = 0
+    manager = TripManager(db_collection=collection, event_bus=bus)
+
+    assert manager.delete_trip("missing") is False
+    bus.publish.assert_not_called()
+
+    collection.delete_one.return_value.deleted_count = 1
+    manager.delete_trip("trip1")
+    bus.publish.assert_called_once_with("deleted", {"trip_id": "trip1"})
+
+
+class FakeTailableCursor:
+    """Tailable cursor returning its documents once, then dying."""
+
+    def __init__(self, docs):
+        self.docs = docs
+        self.alive = True
+
+    def max_await_time_ms(self, ms):
+        return self
+
+    def __iter__(self):
+        docs, self.docs, self.alive = self.docs, [], False
+        return iter(docs)
+
+
+def test_mongo_bus_resumes_in_insertion_order(mocker):
+    """Test that reopening the cursor does not skip an event with a smaller ObjectId inserted later."""
+    collection = mocker.MagicMock()
+    collection.find_one.return_value = None
+    bus = MongoEventBus(collection, await_seconds=0.01)
+    bus.close()
+    dispatch = mocker.patch.object(bus, "_dispatch")
+
+    seen, last, other_worker = ObjectId.from_datetime(datetime(2026, 1, 1)), ObjectId(), ObjectId("0" * 24)
+    docs = [{"_id": i, "type": "created", "data": {}} for i in (seen, last, other_worker)]
+    collection.find.return_value = FakeTailableCursor(docs)
+    collection.find_one.return_value = {"_id": last}
+    bus._stopped.clear()
+    bus._last_id = last
+
+    bus._follow()
+
+    assert collection.find.call_args[0][0] == {}
+    dispatch.assert_called_once_with({"id": str(other_worker), "type": "created", "data": {}})
+    assert bus._last_id == other_worker
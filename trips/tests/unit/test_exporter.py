@@ -0,0 +1,74 @@
+from datetime import datetime, UTC
+
+import pytest
+from bson import ObjectId
+
+from src.exporter import Exporter, build_exporters
+
+
+@pytest.fixture
+def collection(mocker):
+    """Fixture for a mocked collection whose cursor yields two trip requests."""
+    collection = mocker.MagicMock()
+    collection.find.return_value.sort.return_value = [
+        {"request_id": "req1", "status": "pending", "updated_at": datetime(2025, 6, 1, 10, 0), "tags": None},
+        {"request_id": "req2", "status": "accepted", "updated_at": datetime(2025, 6, 2, 10, 0)},
+    ]
+    return collection
+
+
+def test_ndjson_export_in_batches(collection):
+    """Test that documents are emitted one chunk per batch and the watermark advances."""
+    exporter = Exporter([collection], ["request_id", "status", "updated_at"], "updated_at", batch_size=1)
+    since = datetime(2025, 6, 1, tzinfo=UTC)
+
+    chunks = list(exporter.export("ndjson", since=since))
+
+    assert chunks == [
+        '{"request_id": "req1", "status": "pending", "updated_at": "2025-06-01T10:00:00", "tags": null}\n',
+        '{"request_id": "req2", "status": "accepted", "updated_at": "2025-06-02T10:00:00"}\n',
+    ]
+    assert exporter.last_watermark == datetime(2025, 6, 2, 10, 0)
+    query, projection = collection.find.call_args[0]
+    assert query == {"updated_at": {"$gte": since}}
+    assert projection == {"request_id": 1, "status": 1, "updated_at": 1, "_id": False}
+    assert collection.find.call_args[1] == {"batch_size": 1}
+    collection.find.return_value.sort.assert_called_with([("updated_at", 1), ("_id", 1)])
+
+
+def test_csv_export(collection):
+    """Test the CSV header and rows."""
+    exporter = Exporter([collection], ["request_id", "status"], "updated_at")
+    assert "".join(exporter.export("csv")) == "request_id,status\r\nreq1,pending\r\nreq2,accepted\r\n"
+
+
+def test_trips_watermark_is_creation_time(mocker):
+    """Test that trips are exported by ObjectId creation time, with lists flattened in CSV."""
+    created = datetime(2025, 6, 1, 12, 0, tzinfo=UTC)
+    collection = mocker.MagicMock()
+    collection.find.return_value.sort.return_value = [
+        {"_id": ObjectId.from_datetime(created), "trip_id": "trip1", "passengers": ["a", "b"]},
+    ]
+    exporter = Exporter([collection], ["trip_id", "passengers"], "_id")
+
+    assert "".join(exporter.export("csv", since=created)) == "trip_id,passengers\r\ntrip1,a;b\r\n"
+    assert exporter.last_watermark == created
+    assert collection.find.call_args[0][0] == {"_id": {"$gte": ObjectId.from_datetime(created)}}
+
+
+def test_build_exporters_with_archive(mocker):
+    """Test that the archive collections are exported after the hot ones."""
+    db = mocker.MagicMock()
+    exporters = build_exporters(db, include_archive=True)
+
+    assert exporters["trips"].watermark_field == "_id"
+    assert exporters["trip_requests"].watermark_field == "updated_at"
+    assert [c.args[0] for c in db.get_collection.call_args_list] == [
+        "trips", "trips_archive", "trip_requests", "trip_requests_archive",
+    ]
+
+
+def test_unknown_format(collection):
+    """Test that an unknown format is rejected."""
+    with pytest.raises(ValueError):
+        list(Exporter([collection], ["request_id"], "updated_at").export("xml"))
@@ -0,0 +1,120 @@
+from datetime import datetime, timedelta, UTC
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+from src.idempotency import IdempotencyStore, IdempotencyError
+
+
+@pytest.fixture
+def mock_db_collection(mocker):
+    """Fixture for a mocked MongoDB collection."""
+    return mocker.MagicMock()
+
+
+@pytest.fixture
+def store(mock_db_collection):
+    """Fixture for an IdempotencyStore with a mocked DB collection."""
+    return IdempotencyStore(db_collection=mock_db_collection)
+
+
+def test_first_request_executes_and_stores_response(store, mock_db_collection, mocker):
+    """Test that the first use of a key runs the write and stores its response."""
+    func = mocker.Mock(return_value={"trip_id": "trip1"})
+
+    result = store.execute("key1", "create_trip", {"a": 1}, func)
+
+    assert result == ({"trip_id": "trip1"}, 200, False)
+    func.assert_called_once()
+    update = mock_db_collection.update_one.call_args[0]
+    owner = mock_db_collection.insert_one.call_args[0][0]["owner"]
+    assert update[0] == {"key": "create_trip:key1", "owner": owner}
+    assert update[1]["$set"] == {"completed": True, "body": {"trip_id": "trip1"}, "status_code": 200}
+
+
+def test_replay_returns_stored_response(store, mock_db_collection, mocker):
+    """Test that a retried request gets the stored response without executing the write."""
+    first = {"trip_id": "trip1"}
+    func = mocker.Mock(return_value=first)
+    store.execute("key1", "create_trip", {"a": 1}, func)
+    stored = mock_db_collection.insert_one.call_args[0][0]
+
+    mock_db_collection.insert_one.side_effect = DuplicateKeyError("dup")
+    mock_db_collection.find_one.return_value = {**stored, "completed": True, "body": first, "status_code": 200}
+
+    result = store.execute("key1", "create_trip", {"a": 1}, func)
+
+    assert result == (first, 200, True)
+    func.assert_called_once()
+
+
+def test_key_reuse_with_different_payload_is_rejected(store, mock_db_collection, mocker):
+    """Test that a key cannot be reused for a different request body."""
+    mock_db_collection.insert_one.side_effect = DuplicateKeyError("dup")
+    mock_db_collection.find_one.return_value = {"fingerprint": "other", "completed": True}
+
+    with pytest.raises(IdempotencyError) as exc_info:
+        store.execute("key1", "create_trip", {"a": 1}, mocker.Mock())
+    assert exc_info.value.status_code == 422
+
+
+def test_in_progress_key_is_rejected(store, mock_db_collection, mocker):
+    """Test that a retry arriving while the first request still runs gets a conflict."""
+    fingerprint = IdempotencyStore._fingerprint({"a": 1})
+    mock_db_collection.insert_one.side_effect = DuplicateKeyError("dup")
+    mock_db_collection.find_one.return_value = {
+        "fingerprint": fingerprint, "completed": False, "locked_until": datetime.now(UTC) + timedelta(seconds=30),
+    }
+    func = mocker.Mock()
+
+    with pytest.raises(IdempotencyError) as exc_info:
+        store.execute("key1", "create_trip", {"a": 1}, func)
+    assert exc_info.value.status_code == 409
+    func.assert_not_called()
+    mock_db_collection.find_one_and_update.assert_not_called()
+
+
+def test_expired_lease_is_taken_over(store, mock_db_collection, mocker):
+    """Test that a retry after a crashed first request takes the key over and executes the write."""
+    fingerprint = IdempotencyStore._fingerprint({"a": 1})
+    mock_db_collection.insert_one.side_effect = DuplicateKeyError("dup")
+    mock_db_collection.find_one.return_value = {
+        "fingerprint": fingerprint, "completed": False, "owner": "crashed",
+        "locked_until": datetime(2025, 1, 1),  # naive, as read from MongoDB
+    }
+    func = mocker.Mock(return_value={"trip_id": "trip1"})
+
+    assert store.execute("key1", "create_trip", {"a": 1}, func) == ({"trip_id": "trip1"}, 200, False)
+
+    claim_filter, claim = mock_db_collection.find_one_and_update.call_args[0]
+    assert claim_filter["completed"] is False
+    assert "$lte" in claim_filter["locked_until"]
+    new_owner = claim["$set"]["owner"]
+    assert new_owner != "crashed"
+    assert mock_db_collection.update_one.call_args[0][0] == {"key": "create_trip:key1", "owner": new_owner}
+
+
+def test_lost_takeover_race_is_rejected(store, mock_db_collection, mocker):
+    """Test that only one retry can take over an expired key."""
+    fingerprint = IdempotencyStore._fingerprint({"a": 1})
+    mock_db_collection.insert_one.side_effect = DuplicateKeyError("dup")
+    mock_db_collection.find_one.return_value = {
+        "fingerprint": fingerprint, "completed": False, "locked_until": datetime(2025, 1, 1),
+    }
+    mock_db_collection.find_one_and_update.return_value = None
+    func = mocker.Mock()
+
+    with pytest.raises(IdempotencyError) as exc_info:
+        store.execute("key1", "create_trip", {"a": 1}, func)
+    assert exc_info.value.status_code == 409
+    func.assert_not_called()
+
+
+def test_failed_write_releases_key(store, mock_db_collection, mocker):
+    """Test that the key is released when the write raises, so the client can retry."""
+    func = mocker.Mock(side_effect=RuntimeError("db down"))
+
+    with pytest.raises(RuntimeError):
+        store.execute("key1", "create_trip", {"a": 1}, func)
+    owner = mock_db_collection.insert_one.call_args[0][0]["owner"]
+    mock_db_collection.delete_one.assert_called_once_with({"key": "create_trip:key1", "owner": owner})
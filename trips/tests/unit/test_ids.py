@@ -0,0 +1,40 @@
+import uuid
+from datetime import datetime, timedelta, UTC
+
+from src.ids import id_timestamp, min_id_at, new_id
+
+
+def test_new_id_is_uuid7():
+    """Test the version and variant bits of minted ids."""
+    parsed = uuid.UUID(new_id())
+
+    assert parsed.version == 7
+    assert parsed.variant == uuid.RFC_4122
+
+
+def test_ids_increase_within_a_millisecond(mocker):
+    """Test that ids stay strictly ordered, as strings, even when the clock stands still."""
+    mocker.patch("src.ids.time.time_ns", return_value=1_750_000_000_000 * 1_000_000)
+
+    ids = [new_id() for _ in range(5000)]
+
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+
+
+def test_id_timestamp_roundtrip():
+    """Test that the creation time is recovered from UUIDv7 ids only."""
+    before = datetime.now(UTC) - timedelta(milliseconds=1)
+    created = id_timestamp(new_id())
+
+    assert before <= created <= datetime.now(UTC) + timedelta(seconds=1)
+    assert id_timestamp(str(uuid.uuid4())) is None
+    assert id_timestamp("not-an-id") is None
+
+
+def test_min_id_at_bounds_later_ids():
+    """Test that `min_id_at` sorts before ids minted at or after the time."""
+    bound = min_id_at(datetime.now(UTC) - timedelta(seconds=1))
+
+    assert bound < new_id()
+    assert min_id_at(datetime(2025, 1, 1, tzinfo=UTC)) < bound
@@ -0,0 +1,173 @@
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+from src.migrations import (
+    Backfill, CreateIndex, EachBatch, Migration, MigrationLockedError, MigrationRunner, Step,
+    LOCK_ID, MIGRATIONS, MIGRATIONS_COLLECTION,
+)
+
+
+@pytest.fixture
+def db(mocker):
+    """Fixture for a mocked database with one mocked collection per name."""
+    db = mocker.MagicMock()
+    collections = {}
+
+    def get_collection(name):
+        if name not in collections:
+            collections[name] = mocker.MagicMock()
+        return collections[name]
+
+    db.get_collection.side_effect = get_collection
+    db.get_collection(MIGRATIONS_COLLECTION).find_one.return_value = None
+    return db
+
+
+def set_destination_key(doc):
+    """Update used by the test backfill."""
+    return {"$set": {"destination_key": doc["destination"].lower()}}
+
+
+@pytest.fixture
+def migrations():
+    """Fixture for a migration history with a backfill followed by an index build."""
+    return [
+        Migration(1, "Add destination keys", [
+            Backfill("keys", "requests", {"destination_key": {"$exists": False}}, set_destination_key),
+            CreateIndex("requests", [("destination_key", 1)]),
+        ]),
+    ]
+
+
+def batches(collection, *pages):
+    """Make successive backfill reads of `collection` return `pages`."""
+    collection.find.return_value.sort.return_value.limit.side_effect = list(pages)
+
+
+def test_run_applies_steps_in_order_and_records_them(db, migrations):
+    """Test that backfill batches are written with the filter rechecked, then the index is built."""
+    requests = db.get_collection("requests")
+    batches(requests, [{"_id": 1, "destination": "Reno"}, {"_id": 2, "destination": "Yosemite"}], [])
+
+    assert MigrationRunner(db, migrations, rate=0).run() == [1]
+
+    updates = requests.bulk_write.call_args[0][0]
+    assert updates[0]._filter == {"destination_key": {"$exists": False}, "_id": 1}
+    assert updates[1]._doc == {"$set": {"destination_key": "yosemite"}}
+    # The second read continues after the checkpoint
+    assert requests.find.call_args_list[1][0][0]["_id"] == {"$gt": 2}
+    requests.create_index.assert_called_once_with([("destination_key", 1)])
+    state_updates = [c[0][1]["$set"] for c in db.get_collection(MIGRATIONS_COLLECTION).update_one.call_args_list]
+    assert {"steps.keys.checkpoint": 2, "steps.keys.processed": 2} in state_updates
+    assert "applied_at" in state_updates[-1]
+
+
+def test_run_resumes_from_checkpoint_and_skips_done_steps(db, migrations):
+    """Test that an interrupted migration continues where it stopped."""
+    db.get_collection(MIGRATIONS_COLLECTION).find_one.return_value = {
+        "_id": 1, "steps": {"keys": {"checkpoint": 40}, "index:requests:destination_key_1": {"done": True}},
+    }
+    requests = db.get_collection("requests")
+    batches(requests, [])
+
+    MigrationRunner(db, migrations, rate=0).run()
+
+    assert requests.find.call_args[0][0]["_id"] == {"$gt": 40}
+    requests.create_index.assert_not_called()
+
+
+def test_applied_migrations_are_skipped(db, migrations):
+    """Test that applied migrations are not run again and `target` bounds the run."""
+    db.get_collection(MIGRATIONS_COLLECTION).find_one.return_value = {"_id": 1, "applied_at": "earlier"}
+    runner = MigrationRunner(db, migrations + [Migration(2, "Later", [])], rate=0)
+
+    assert runner.run(target=1) == []
+    db.get_collection("requests").find.assert_not_called()
+
+
+def test_status(db, migrations):
+    """Test the state reported per migration."""
+    db.get_collection(MIGRATIONS_COLLECTION).find.return_value = [{"_id": 1, "steps": {}}]
+    runner = MigrationRunner(db, migrations + [Migration(2, "Later", [])])
+
+    assert [(m["version"], m["state"]) for m in runner.status()] == [(1, "partial"), (2, "pending")]
+
+
+def test_throttle_adapts_batch_size_and_limits_rate(db, mocker):
+    """Test that slow batches shrink the batch size and the rate limit pauses between batches."""
+    sleep = mocker.patch("src.migrations.time.sleep")
+    runner = MigrationRunner(db, [], batch_size=400, rate=1000, max_batch_seconds=0.5)
+
+    assert runner.throttle(400, elapsed=1.0, batch_size=400) == 200
+    assert runner.throttle(200, elapsed=0.05, batch_size=200) == 400
+    assert runner.throttle(200, elapsed=0.3, batch_size=200) == 200
+    sleep.assert_called_with(0.0)
+    runner.throttle(400, elapsed=0.1, batch_size=400)
+    sleep.assert_called_with(pytest.approx(0.3))
+
+
+def test_versions_must_be_unique(db):
+    """Test that the history is validated."""
+    with pytest.raises(ValueError):
+        MigrationRunner(db, [Migration(1, "a", []), Migration(1, "b", [])])
+    with pytest.raises(ValueError):
+        Migration(1, "a", [CreateIndex("c", [("f", 1)]), CreateIndex("c", [("f", 1)])])
+
+
+def test_builtin_backfills():
+    """Test the updates of the shipped migrations."""
+    steps = {step.name: step for migration in MIGRATIONS for step in migration.steps}
+
+    assert steps["destination_key"].update({"destination": " Lake  Tahoe"}) == {
+        "$set": {"destination_key": "lake tahoe"}
+    }
+    assert "index:trips:pickup_point_2dsphere" in steps
+    assert "index:trip_requests:status_1_destination_key_1_earliest_start_date_1_latest_start_date_1" in steps
+
+
+def test_each_batch_hands_batches_to_its_function(db, mocker):
+    """Test that EachBatch passes every batch to its function with the same checkpointing."""
+    handle = mocker.MagicMock(return_value=1)
+    requests = db.get_collection("requests")
+    batches(requests, [{"_id": 1}, {"_id": 2}], [])
+    migration = Migration(1, "Derive", [EachBatch("derive", "requests", {"status": "pending"}, handle)])
+
+    MigrationRunner(db, [migration], rate=0).run()
+
+    handle.assert_called_once_with(db, [{"_id": 1}, {"_id": 2}])
+    requests.bulk_write.assert_not_called()
+    assert requests.find.call_args[0][0] == {"status": "pending", "_id": {"$gt": 2}}
+
+
+def test_run_refuses_while_another_runner_holds_the_lease(db, migrations):
+    """Test that a second runner does not apply migrations concurrently."""
+    state = db.get_collection(MIGRATIONS_COLLECTION)
+    state.find_one_and_update.side_effect = DuplicateKeyError("lock held")
+
+    with pytest.raises(MigrationLockedError):
+        MigrationRunner(db, migrations, rate=0).run()
+
+    db.get_collection("requests").find.assert_not_called()
+    state.delete_one.assert_not_called()
+
+
+def test_run_stops_when_the_lease_is_lost(db, migrations):
+    """Test that a runner whose lease was taken over stops and releases nothing it does not own."""
+    state = db.get_collection(MIGRATIONS_COLLECTION)
+    state.update_one.return_value.matched_count = 0
+    requests = db.get_collection("requests")
+    batches(requests, [{"_id": 1, "destination": "Reno"}], [])
+    runner = MigrationRunner(db, migrations, rate=0)
+
+    with pytest.raises(MigrationLockedError):
+        runner.run()
+
+    assert state.find_one_and_update.call_args[0][0]["_id"] == LOCK_ID
+    state.delete_one.assert_called_once_with({"_id": LOCK_ID, "owner": runner.owner})
+    requests.create_index.assert_not_called()
+
+
+def test_step_is_abstract():
+    """Test that steps must implement run."""
+    with pytest.raises(TypeError):
+        Step()
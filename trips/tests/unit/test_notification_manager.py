@@ -0,0 +1,196 @@
+from datetime import datetime, timedelta, UTC
+
+import pytest
+
+from src.bll_models import MAX_REQUEST_WINDOW, Trip, TripRequest
+from src.notification_manager import NotificationManager, index_key, index_unindexed_requests
+from src.trip_manager import TripManager
+from src.trip_request_manager import TripRequestManager
+
+
+@pytest.fixture
+def inbox(mocker):
+    """Fixture for a mocked notifications collection."""
+    return mocker.MagicMock()
+
+
+@pytest.fixture
+def index(mocker):
+    """Fixture for a mocked inverted index collection."""
+    return mocker.MagicMock()
+
+
+@pytest.fixture
+def notification_manager(inbox, index):
+    """Fixture for a NotificationManager fanning out synchronously."""
+    return NotificationManager(db_collection=inbox, index_collection=index)
+
+
+@pytest.fixture
+def trip_request():
+    """Fixture for a pending request with a three-day start window."""
+    return TripRequest(
+        request_id="req1",
+        passenger_id="pass123",
+        destination=" Lake  Tahoe",
+        earliest_start_date=datetime(2025, 6, 1, 8, 0, tzinfo=UTC),
+        latest_start_date=datetime(2025, 6, 3, 20, 0, tzinfo=UTC),
+    )
+
+
+def test_index_key_is_normalized():
+    """Test that keys ignore case and spacing of the destination."""
+    assert index_key("  Lake   TAHOE ", datetime(2025, 6, 1).date()) == "lake tahoe|2025-06-01"
+
+
+def test_index_request_writes_one_posting_per_day(notification_manager, index, trip_request):
+    """Test that a request is posted under every day of its start window."""
+    assert notification_manager.index_request(trip_request) == 3
+
+    postings = index.insert_many.call_args[0][0]
+    assert [p["key"] for p in postings] == [
+        "lake tahoe|2025-06-01", "lake tahoe|2025-06-02", "lake tahoe|2025-06-03"
+    ]
+    assert all(p["request_id"] == "req1" and p["passenger_id"] == "pass123" for p in postings)
+
+
+def test_fan_out_looks_up_one_key_and_fills_inboxes(notification_manager, index, inbox):
+    """Test that a new trip queries only its key and notifies every matching passenger but the driver."""
+    start = datetime(2025, 6, 2, 10, 0)
+    index.find.return_value = [
+        {"request_id": "req1", "passenger_id": "pass1"},
+        {"request_id": "req2", "passenger_id": "driver123"},
+    ]
+
+    count = notification_manager.fan_out({
+        "trip_id": "trip1", "driver_id": "driver123", "destination": "Lake Tahoe", "start_datetime": start,
+    })
+
+    assert count == 1
+    index.find.assert_called_once_with(
+        {
+            "key": "lake tahoe|2025-06-02",
+            "earliest_start_date": {"$lte": start},
+            "latest_start_date": {"$gte": start},
+        },
+        {"_id": 0, "request_id": 1, "passenger_id": 1},
+    )
+    notifications = inbox.insert_many.call_args[0][0]
+    assert notifications[0]["passenger_id"] == "pass1"
+    assert notifications[0]["trip_id"] == "trip1"
+    assert notifications[0]["read"] is False
+
+
+def test_fan_out_without_matches_writes_nothing(notification_manager, index, inbox):
+    """Test that no insert is issued when no request matches."""
+    index.find.return_value = []
+    assert notification_manager.fan_out({
+        "trip_id": "trip1", "destination": "Nowhere", "start_datetime": datetime(2025, 6, 2),
+    }) == 0
+    inbox.insert_many.assert_not_called()
+
+
+def test_managers_trigger_indexing_and_fan_out(mocker, trip_request):
+    """Test that creating a request indexes it and creating a trip fans out."""
+    notification_manager = mocker.MagicMock()
+    trip_manager = TripManager(db_collection=mocker.MagicMock(), notification_manager=notification_manager)
+    trip_request_manager = TripRequestManager(
+        db_collection=mocker.MagicMock(), notification_manager=notification_manager
+    )
+
+    trip_request_manager.create_trip_request(trip_request)
+    notification_manager.index_request.assert_called_once_with(trip_request)
+
+    trip_manager.create_trip(Trip(
+        driver_id="driver123",
+        driver_car="Tesla Model 3",
+        capacity=3,
+        destination="Lake Tahoe",
+        pickup_location="San Francisco",
+        start_datetime=datetime(2025, 6, 2, 10, 0),
+        return_datetime=datetime(2025, 6, 2, 18, 0),
+        cost_per_passenger=25.0,
+    ))
+    trip = notification_manager.notify_trip_created.call_args[0][0]
+    assert trip["destination"] == "Lake Tahoe"
+    assert "_id" not in trip
+
+
+def test_accepting_a_request_removes_its_postings(mocker, trip_request):
+    """Test that an accepted request is unindexed within the booking's session."""
+    notification_manager = mocker.MagicMock()
+    collection = mocker.MagicMock()
+    collection.find_one_and_update.return_value = trip_request.to_dict()
+    manager = TripRequestManager(db_collection=collection, notification_manager=notification_manager)
+    session = mocker.MagicMock()
+
+    manager.accept_trip_request("req1", "trip1", session=session)
+
+    notification_manager.unindex_request.assert_called_once_with("req1", session=session)
+
+
+def test_postings_are_bounded_by_the_longest_window(trip_request):
+    """Test that windows longer than MAX_REQUEST_WINDOW are rejected, and stored ones are clamped."""
+    with pytest.raises(ValueError):
+        TripRequest(**{**trip_request.model_dump(), "latest_start_date": datetime(2026, 6, 1, tzinfo=UTC)})
+
+    stored = TripRequest.from_db({
+        **trip_request.model_dump(), "latest_start_date": datetime(9999, 1, 1), "status": "pending",
+    })
+    postings = NotificationManager.postings(stored)
+    assert len(postings) == MAX_REQUEST_WINDOW.days + 1
+    assert postings[-1]["key"] == index_key("lake tahoe", datetime(2025, 6, 1).date() + MAX_REQUEST_WINDOW)
+
+
+def test_index_unindexed_requests_skips_indexed_and_expired(index, trip_request):
+    """Test the backfill of postings for requests stored before the index existed."""
+    now = datetime.now(UTC).replace(tzinfo=None)
+    stored = [
+        {**trip_request.model_dump(), "request_id": rid, "status": "pending",
+         "earliest_start_date": now + timedelta(days=1), "latest_start_date": now + timedelta(days=2)}
+        for rid in ("new", "indexed")
+    ]
+    expired = {**stored[0], "request_id": "expired", "earliest_start_date": now - timedelta(days=3),
+               "latest_start_date": now - timedelta(days=2)}
+    index.distinct.return_value = ["indexed"]
+
+    assert index_unindexed_requests(index, stored + [expired]) == 1
+
+    postings = index.insert_many.call_args[0][0]
+    assert {p["request_id"] for p in postings} == {"new"}
+    assert index.distinct.call_args[0][1] == {"request_id": {"$in": ["new", "indexed"]}}
+
+
+def test_write_behind_requests_are_indexed_once_stored(mocker, notification_manager, index, trip_request):
+    """Test that a buffered request gets postings only with the flush that stores it."""
+    now = datetime.now(UTC)
+    trip_request = trip_request.model_copy(update={
+        "earliest_start_date": now + timedelta(days=1), "latest_start_date": now + timedelta(days=2),
+    })
+    collection = mocker.MagicMock()
+    write_behind = mocker.MagicMock()
+    manager = TripRequestManager(
+        db_collection=collection, write_behind=write_behind, notification_manager=notification_manager
+    )
+
+    manager.create_trip_request(trip_request)
+    index.insert_many.assert_not_called()
+
+    index.distinct.return_value = []
+    notification_manager.index_stored_requests(
+        [write_behind.put.call_args[0][0], {**trip_request.to_dict(), "request_id": "req2", "status": "accepted"}]
+    )
+    postings = index.insert_many.call_args[0][0]
+    assert {p["request_id"] for p in postings} == {"req1"}
+
+
+def test_mark_read_and_inbox_ttl(notification_manager, inbox):
+    """Test that notifications can be marked read, all or by trip, and expire from the inbox."""
+    inbox.create_index.assert_any_call("created_at", expireAfterSeconds=90 * 24 * 60 * 60)
+    inbox.update_many.return_value.modified_count = 2
+
+    assert notification_manager.mark_read("pass1") == 2
+    inbox.update_many.assert_called_with({"passenger_id": "pass1", "read": False}, {"$set": {"read": True}})
+
+    notification_manager.mark_read("pass1", ["trip1"])
+    assert inbox.update_many.call_args[0][0]["trip_id"] == {"$in": ["trip1"]}
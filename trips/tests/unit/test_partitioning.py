@@ -0,0 +1,279 @@
+from datetime import datetime, UTC
+
+import pytest
+
+from src.archiver import build_archivers
+from src.bll_models import Trip
+from src.exporter import build_exporters
+from src.partitioning import PartitionSet
+from src.trip_manager import TripManager, NO_ID, TRIP_ORDER
+
+
+@pytest.fixture
+def db(mocker):
+    """Fixture for a mocked database with one mocked collection per name."""
+    db = mocker.MagicMock()
+    collections = {}
+
+    def get_collection(name):
+        if name not in collections:
+            collections[name] = mocker.MagicMock()
+            collections[name].name = name
+            collections[name].with_options.return_value = collections[name]
+        return collections[name]
+
+    db.get_collection.side_effect = get_collection
+    db.list_collection_names.return_value = ["trips_2026_05", "trips_2026_06", "trips_2026_07", "trips_2025_12"]
+    return db
+
+
+@pytest.fixture
+def partitions(db):
+    """Fixture for monthly trip partitions."""
+    return PartitionSet(
+        db, "trips", "trip_id", "start_datetime", db.get_collection("trip_partitions"),
+        create_indexes=TripManager.create_partition_indexes,
+    )
+
+
+@pytest.fixture
+def trip_manager(db, partitions):
+    """Fixture for a partitioned TripManager."""
+    return TripManager(db_collection=db.get_collection("trips"), partitions=partitions)
+
+
+@pytest.fixture
+def valid_trip_data():
+    """Fixture for valid trip data dictionary."""
+    return {
+        "driver_id": "driver123",
+        "driver_car": "Tesla Model 3",
+        "capacity": 3,
+        "destination": "Lake Tahoe",
+        "pickup_location": "San Francisco",
+        "start_datetime": datetime(2026, 6, 1, 10, 0),
+        "return_datetime": datetime(2026, 6, 1, 18, 0),
+        "cost_per_passenger": 25.0,
+    }
+
+
+def test_names_filters_overlapping_months(partitions):
+    """Test that only partitions overlapping the range are returned, in month order."""
+    assert partitions.names() == ["trips_2025_12", "trips_2026_05", "trips_2026_06", "trips_2026_07"]
+    assert partitions.names(datetime(2026, 6, 15), None) == ["trips_2026_06", "trips_2026_07"]
+    assert partitions.names(datetime(2026, 5, 3), datetime(2026, 5, 3)) == ["trips_2026_05"]
+
+
+def test_locate_uses_cache_before_directory(partitions, db):
+    """Test that ids are resolved from the LRU cache, then from the directory."""
+    directory = db.get_collection("trip_partitions")
+    directory.find_one.return_value = {"_id": "trip1", "p": "trips_2026_06"}
+    partitions.remember([{"trip_id": "trip2", "start_datetime": datetime(2026, 7, 2)}])
+
+    assert partitions.locate("trip2") == "trips_2026_07"
+    directory.find_one.assert_not_called()
+    assert partitions.locate("trip1") == "trips_2026_06"
+    assert partitions.locate("trip1") == "trips_2026_06"
+    directory.find_one.assert_called_once_with({"_id": "trip1"})
+
+
+def test_cache_evicts_least_recently_used(partitions, db):
+    """Test the LRU bound of the id cache."""
+    partitions.cache_size = 2
+    partitions.remember([{"trip_id": f"trip{i}", "start_datetime": datetime(2026, 6, 1)} for i in range(3)])
+    db.get_collection("trip_partitions").find_one.return_value = None
+
+    assert partitions.locate("trip0") is None
+    assert partitions.locate("trip2") == "trips_2026_06"
+
+
+def test_create_trip_routes_by_start_month(trip_manager, db, valid_trip_data):
+    """Test that a new trip is registered in the directory and stored in its month's partition."""
+    trip_id = trip_manager.create_trip(Trip(**valid_trip_data))
+
+    partition = db.get_collection("trips_2026_06")
+    partition.insert_one.assert_called_once()
+    partition.create_index.assert_any_call("trip_id", unique=True)
+    partition.create_index.assert_any_call(TRIP_ORDER)
+    db.get_collection("trips").create_index.assert_called_once_with("trip_id", unique=True)
+    db.get_collection("trip_partitions").insert_one.assert_called_once_with(
+        {"_id": trip_id, "p": "trips_2026_06"}, session=None
+    )
+    db.get_collection("trips").insert_one.assert_not_called()
+
+
+def test_get_all_trips_reads_only_overlapping_partitions(trip_manager, db, valid_trip_data, mocker):
+    """Test that a date search reads one partition and an upcoming search skips old months."""
+    db.get_collection("trips_2026_06").find.return_value = [{**valid_trip_data, "trip_id": "trip1"}]
+
+    trips = trip_manager.get_all_trips(trip_date=datetime(2026, 6, 1))
+
+    assert [t.trip_id for t in trips] == ["trip1"]
+    db.get_collection("trips_2026_05").find.assert_not_called()
+    db.get_collection("trips_2026_07").find.assert_not_called()
+    # The listed trip can now be opened without a directory read
+    assert trip_manager.partitions.locate("trip1") == "trips_2026_06"
+
+    mock_now = mocker.patch("src.trip_manager.datetime", wraps=datetime)
+    mock_now.now.return_value = datetime(2026, 7, 10, tzinfo=UTC)
+    db.get_collection("trips_2026_06").find.return_value = mocker.MagicMock()
+    trip_manager.get_all_trips(limit=10)
+    db.get_collection("trips_2025_12").find.assert_not_called()
+    db.get_collection("trips_2026_06").find.assert_called()
+    db.get_collection("trips_2026_07").find.assert_called()
+
+
+def test_get_all_trips_merges_partitions_in_order(trip_manager, db, valid_trip_data, mocker):
+    """Test that pages spanning partitions are merged by start time and then cut."""
+    mock_now = mocker.patch("src.trip_manager.datetime", wraps=datetime)
+    mock_now.now.return_value = datetime(2026, 7, 10, tzinfo=UTC)
+    june = [{**valid_trip_data, "trip_id": f"june{i}", "start_datetime": datetime(2026, 6, 20 + i)} for i in range(2)]
+    july = [{**valid_trip_data, "trip_id": f"july{i}", "start_datetime": datetime(2026, 7, 20 + i),
+             "return_datetime": datetime(2026, 7, 21 + i)} for i in range(2)]
+    db.get_collection("trips_2026_06").find.return_value.sort.return_value.skip.return_value.limit.return_value = june
+    db.get_collection("trips_2026_07").find.return_value.sort.return_value.skip.return_value.limit.return_value = july
+
+    trips = trip_manager.get_all_trips(limit=2, offset=1)
+
+    assert [t.trip_id for t in trips] == ["june1", "july0"]
+    db.get_collection("trips_2026_07").find.return_value.sort.return_value.skip.assert_called_with(0)
+
+
+def test_search_trips_merges_facets(trip_manager, db, valid_trip_data, mocker):
+    """Test that per-partition $facet outputs are combined."""
+    mock_now = mocker.patch("src.trip_manager.datetime", wraps=datetime)
+    mock_now.now.return_value = datetime(2026, 7, 10, tzinfo=UTC)
+    db.get_collection("trips_2026_06").aggregate.return_value = iter([{
+        "results": [{**valid_trip_data, "trip_id": "june"}],
+        "total": [{"count": 3}],
+        "destination": [{"_id": "Lake Tahoe", "count": 3}],
+        "day": [], "price": [{"_id": 25, "count": 3}],
+    }])
+    db.get_collection("trips_2026_07").aggregate.return_value = iter([{
+        "results": [{**valid_trip_data, "trip_id": "july", "start_datetime": datetime(2026, 7, 20),
+                     "return_datetime": datetime(2026, 7, 21)}],
+        "total": [{"count": 4}],
+        "destination": [{"_id": "Reno", "count": 4}, {"_id": "Lake Tahoe", "count": 1}],
+        "day": [], "price": [{"_id": 25, "count": 4}, {"_id": 50, "count": 1}],
+    }])
+
+    result = trip_manager.search_trips(limit=1, offset=1, facets=True)
+
+    facet = db.get_collection("trips_2026_07").aggregate.call_args[0][0][-1]["$facet"]
+    assert facet["results"][:2] == [{"$skip": 0}, {"$limit": 2}]
+    assert [t.trip_id for t in result["results"]] == ["july"]
+    assert result["total"] == 7
+    # Equal counts are ordered by value, as the single-collection $sort does
+    assert result["facets"]["destination"] == [
+        {"value": "Lake Tahoe", "count": 4}, {"value": "Reno", "count": 4},
+    ]
+    assert result["facets"]["price"] == [{"value": "25-50", "count": 7}, {"value": "50-100", "count": 1}]
+
+
+def test_id_operations_use_the_located_partition(trip_manager, db, valid_trip_data):
+    """Test that reads and writes by id go to the trip's partition in one round trip."""
+    trip_manager.partitions.remember([{"trip_id": "trip1", "start_datetime": datetime(2026, 6, 1)}])
+    partition = db.get_collection("trips_2026_06")
+    partition.find_one.return_value = {**valid_trip_data, "trip_id": "trip1"}
+
+    assert trip_manager.get_trip_by_id("trip1").trip_id == "trip1"
+    partition.find_one.assert_called_once_with({"trip_id": "trip1"}, NO_ID, session=None)
+    db.get_collection("trip_partitions").find_one.assert_not_called()
+
+    partition.delete_one.return_value.deleted_count = 1
+    assert trip_manager.delete_trip("trip1")
+    db.get_collection("trip_partitions").delete_one.assert_called_once_with({"_id": "trip1"}, session=None)
+
+
+def test_unknown_ids_fall_back_to_unpartitioned_trips(trip_manager, db, valid_trip_data):
+    """Test that trips not yet migrated are still found."""
+    db.get_collection("trip_partitions").find_one.return_value = None
+    db.get_collection("trips").find_one.return_value = {**valid_trip_data, "trip_id": "legacy"}
+
+    assert trip_manager.get_trip_by_id("legacy").trip_id == "legacy"
+
+
+def test_failed_insert_removes_directory_entry(trip_manager, db, valid_trip_data):
+    """Test that a trip whose insert fails leaves no dangling directory entry."""
+    db.get_collection("trips_2026_06").insert_one.side_effect = RuntimeError("insert failed")
+
+    with pytest.raises(RuntimeError):
+        trip_manager.create_trip(Trip(**valid_trip_data))
+
+    directory = db.get_collection("trip_partitions")
+    trip_id = directory.insert_one.call_args[0][0]["_id"]
+    directory.delete_one.assert_called_once_with({"_id": trip_id}, session=None)
+
+
+def test_listings_read_unmigrated_trips_until_empty(trip_manager, db, mocker):
+    """Test that the trips collection is listed while it holds trips and skipped once migrated."""
+    mock_now = mocker.patch("src.trip_manager.datetime", wraps=datetime)
+    mock_now.now.return_value = datetime(2026, 7, 10, tzinfo=UTC)
+    legacy = db.get_collection("trips")
+    legacy.find_one.return_value = {"_id": 1}
+
+    trip_manager.get_all_trips()
+    assert legacy.find.called
+
+    legacy.find.reset_mock()
+    legacy.find_one.return_value = None
+    trip_manager.get_all_trips()
+    trip_manager.get_all_trips()
+    legacy.find.assert_not_called()
+    # Once found empty it is not checked again
+    assert legacy.find_one.call_count == 2
+
+
+def test_migrate_moves_batches(partitions, db, valid_trip_data):
+    """Test that migration copies documents into partitions and the directory before deleting them."""
+    source = db.get_collection("trips")
+    a = {**valid_trip_data, "_id": 1, "trip_id": "a"}
+    b = {**valid_trip_data, "_id": 2, "trip_id": "b", "start_datetime": datetime(2026, 7, 11, 10, 0)}
+    source.find.return_value.limit.side_effect = [[a, b], []]
+    source.bulk_write.return_value.deleted_count = 2
+
+    assert partitions.migrate(source) == 2
+
+    assert source.find.call_args_list[0][0] == ({},)  # `_id` is kept
+    assert db.get_collection("trips_2026_06").bulk_write.called
+    assert db.get_collection("trips_2026_07").bulk_write.called
+    deletes = source.bulk_write.call_args[0][0]
+    assert [d._filter for d in deletes] == [
+        {"_id": 1, "$expr": {"$eq": ["$$ROOT", {"$literal": a}]}},
+        {"_id": 2, "$expr": {"$eq": ["$$ROOT", {"$literal": b}]}},
+    ]
+
+
+def test_migrate_recopies_documents_changed_while_moving(partitions, db, valid_trip_data, mocker):
+    """Test that a trip joined between copy and delete is copied again instead of losing the seat."""
+    source = db.get_collection("trips")
+    partition = db.get_collection("trips_2026_06")
+    copied = {**valid_trip_data, "_id": 1, "trip_id": "a", "passengers": []}
+    joined = {**copied, "passengers": ["pass1"]}
+    conflict = {**valid_trip_data, "_id": 2, "trip_id": "b"}
+    source.find.return_value.limit.side_effect = [[copied, conflict], [joined], []]
+    source.find.side_effect = lambda query, *args: (
+        [d for d in (joined, conflict) if d["_id"] in query["_id"]["$in"]]
+        if "$in" in query.get("_id", {}) else source.find.return_value
+    )
+    source.bulk_write.side_effect = [mocker.Mock(deleted_count=0), mocker.Mock(deleted_count=1)]
+    partition.replace_one.side_effect = lambda query, doc: mocker.Mock(matched_count=int(doc["trip_id"] == "a"))
+
+    assert partitions.migrate(source) == 1
+
+    partition.replace_one.assert_any_call({"_id": 1, "$expr": {"$eq": ["$$ROOT", {"$literal": copied}]}}, joined)
+    # The trip changed on both sides is left in place and not scanned again
+    assert source.find.call_args_list[-1][0][0] == {"_id": {"$nin": [2]}}
+
+
+def test_archivers_and_exporters_cover_partitions(db):
+    """Test that trips are archived and exported from the trips collection and every partition."""
+    db.list_collection_names.return_value = ["trips_2026_06", "trips_2026_05"]
+
+    archivers = build_archivers(db)
+    exporters = build_exporters(db, include_archive=True)
+
+    assert [a.source.name for a in archivers] == ["trips", "trips_2026_05", "trips_2026_06", "trip_requests"]
+    assert [c.name for c in exporters["trips"].collections] == [
+        "trips", "trips_2026_05", "trips_2026_06", "trips_archive",
+    ]
@@ -0,0 +1,98 @@
+import os
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+from src.profiling import PROFILE_ID_HEADER, ProfileStore, StackSampler, register_profiling
+
+
+def busy_loop(seconds: float) -> None:
+    """Burn CPU for `seconds`."""
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(100))
+
+
+@pytest.fixture
+def store(tmp_path):
+    """Fixture for a profile store in a temporary directory."""
+    return ProfileStore(str(tmp_path), max_profiles=3)
+
+
+def make_app(store, sample_rate=0.0):
+    """Build a minimal app with profiling and a slow route."""
+    app = Flask(__name__)
+    register_profiling(app, store, sample_rate=sample_rate, interval=0.001)
+
+    @app.get("/slow")
+    def slow():
+        busy_loop(0.05)
+        return {"status": "ok"}
+
+    return app
+
+
+def test_sampler_collapses_stacks():
+    """Test that the sampler records root-first stacks of the target thread."""
+    sampler = StackSampler(threading.get_ident(), interval=0.001).start()
+    busy_loop(0.05)
+    stacks = sampler.stop()
+
+    assert sum(stacks.values()) > 0
+    assert any("busy_loop (unit/test_profiling.py:" in stack.split(";")[-1] for stack in stacks)
+    line = sampler.collapsed().splitlines()[0]
+    assert line.rsplit(" ", 1)[1].isdigit()
+
+
+def test_store_evicts_oldest(store):
+    """Test that the store keeps at most `max_profiles` profiles."""
+    for i in range(5):
+        store.save({"profile_id": f"{i:032x}", "created_at": f"2025-06-01T10:00:0{i}"}, f"main {i}\n")
+        # Distinct mtimes for the eviction order
+        os.utime(os.path.join(store.directory, f"{i:032x}.folded"), (i, i))
+
+    assert [p["profile_id"] for p in store.list()] == [f"{i:032x}" for i in (4, 3, 2)]
+    assert store.get(f"{4:032x}") == "main 4\n"
+    assert store.get(f"{0:032x}") is None
+    assert store.get("../../etc/passwd") is None
+
+
+def test_header_with_admin_token_profiles_request(store, monkeypatch):
+    """Test that X-Profile with a valid admin token stores a profile of the request."""
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    client = make_app(store).test_client()
+
+    response = client.get("/slow", headers={"X-Profile": "1", "X-Admin-Token": "secret"})
+
+    profile_id = response.headers[PROFILE_ID_HEADER]
+    [meta] = store.list()
+    assert meta["profile_id"] == profile_id
+    assert meta["path"] == "/slow"
+    assert meta["status"] == 200
+    assert meta["trigger"] == "header"
+    assert meta["samples"] > 0
+    assert "slow (unit/test_profiling.py:" in store.get(profile_id)
+
+
+def test_header_without_admin_token_is_ignored(store, monkeypatch):
+    """Test that unauthenticated profiling requests are served without profiling."""
+    monkeypatch.setenv("ADMIN_TOKEN", "secret")
+    client = make_app(store).test_client()
+
+    response = client.get("/slow", headers={"X-Profile": "1", "X-Admin-Token": "wrong"})
+
+    assert response.status_code == 200
+    assert PROFILE_ID_HEADER not in response.headers
+    assert store.list() == []
+
+
+def test_sample_rate(store):
+    """Test that sampled requests are profiled without the header."""
+    client = make_app(store, sample_rate=1.0).test_client()
+
+    response = client.get("/slow")
+
+    assert PROFILE_ID_HEADER in response.headers
+    assert store.list()[0]["trigger"] == "sample"
@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from src.bll_models import TripRequest
+from src import ranking
+from src.ranking import destination_similarity, rank_trips, score_python
+
+
+@pytest.fixture
+def trip_request():
+    """Fixture for a trip request with a one-day start window."""
+    return TripRequest(
+        passenger_id="passenger1",
+        destination="Lake Tahoe",
+        earliest_start_date=datetime(2026, 6, 1, 8, 0),
+        latest_start_date=datetime(2026, 6, 2, 8, 0),
+    )
+
+
+def candidate(trip_id: str, start: datetime, cost: float = 20.0, capacity: int = 4,
+              passengers: int = 0, destination: str = "Lake Tahoe") -> dict:
+    """Build a stored trip document."""
+    return {
+        "trip_id": trip_id,
+        "driver_id": "driver1",
+        "driver_car": "Tesla Model 3",
+        "capacity": capacity,
+        "destination": destination,
+        "pickup_location": "San Francisco",
+        "start_datetime": start,
+        "return_datetime": start + timedelta(hours=8),
+        "cost_per_passenger": cost,
+        "passengers": [f"p{i}" for i in range(passengers)],
+    }
+
+
+@pytest.fixture
+def candidates():
+    """Fixture for candidates that each lose on one feature."""
+    start = datetime(2026, 6, 1, 12, 0)
+    return [
+        candidate("best", start),
+        candidate("late", start + timedelta(days=3)),
+        candidate("expensive", start, cost=80.0),
+        candidate("full", start, passengers=3),
+        candidate("elsewhere", start, destination="Reno"),
+    ]
+
+
+def test_destination_similarity():
+    """Test that the same place scores 1 and related names score between unrelated ones and 1."""
+    assert destination_similarity("Lake Tahoe", "  lake   TAHOE ") == 1.0
+    related = destination_similarity("Lake Tahoe", "South Lake Tahoe")
+    assert 0.5 < related < 1.0
+    assert destination_similarity("Lake Tahoe", "Reno") < related
+
+
+def test_python_scorer_features(trip_request, candidates):
+    """Test that each feature lowers the score of the candidate worse on it."""
+    scores = dict(zip([c["trip_id"] for c in candidates], score_python(trip_request, candidates)))
+
+    assert scores["best"] == pytest.approx(1.0)
+    assert all(scores["best"] > score for trip_id, score in scores.items() if trip_id != "best")
+    # Cost is normalized over the candidates: the most expensive one gets no cost score
+    assert scores["expensive"] == pytest.approx(0.8)
+    # One free seat out of SEATS_SATURATION
+    assert scores["full"] == pytest.approx(1.0 - 0.1 * 3 / 4)
+
+
+def test_weights_change_the_order(trip_request, candidates):
+    """Test that per-call weights override the defaults."""
+    ranked = rank_trips(trip_request, candidates, k=5, weights={"time": 0, "cost": 0, "seats": 0})
+
+    assert {c["trip_id"] for c, _ in ranked[:4]} == {"best", "late", "expensive", "full"}
+    assert ranked[-1][0]["trip_id"] == "elsewhere"
+
+
+def test_rank_trips_returns_top_k(trip_request, candidates):
+    """Test that the best k candidates are returned best first."""
+    ranked = rank_trips(trip_request, candidates, k=2)
+
+    assert [c["trip_id"] for c, _ in ranked] == ["best", "full"]
+    assert ranked[0][1] > ranked[1][1]
+    assert rank_trips(trip_request, [], k=2) == []
+
+
+def test_rank_trips_without_numpy(trip_request, candidates, mocker):
+    """Test the pure Python fallback ranks the same way."""
+    expected = [c["trip_id"] for c, _ in rank_trips(trip_request, candidates, k=3)]
+    mocker.patch.object(ranking, "np", None)
+
+    assert [c["trip_id"] for c, _ in rank_trips(trip_request, candidates, k=3)] == expected
+
+
+def test_numpy_scorer_matches_python(trip_request):
+    """Test that the batch scorer gives the same scores as the reference loop."""
+    np = pytest.importorskip("numpy")
+    start = datetime(2026, 5, 28)
+    destinations = ["Lake Tahoe", "South Lake Tahoe", "Reno", "Yosemite"]
+    candidates = [
+        candidate(f"t{i}", start + timedelta(hours=7 * i), cost=5.0 + (i * 13) % 60,
+                  passengers=i % 4, destination=destinations[i % 4])
+        for i in range(40)
+    ]
+
+    assert np.allclose(ranking.score_numpy(trip_request, candidates), score_python(trip_request, candidates))
@@ -0,0 +1,91 @@
+from unittest.mock import MagicMock
+
+import pytest
+from bson import Timestamp
+from flask import Flask
+from pymongo.read_preferences import SecondaryPreferred
+
+from src.read_routing import (
+    CAUSAL_TOKEN_HEADER, ReadRouter, decode_causal_token, encode_causal_token, for_reads,
+    read_preference, register_read_routing,
+)
+from src.trip_manager import TripManager
+
+
+@pytest.fixture
+def session():
+    """Fixture for a session that has seen a write on a replica set."""
+    session = MagicMock()
+    session.operation_time = Timestamp(1700000000, 3)
+    session.cluster_time = {"clusterTime": Timestamp(1700000000, 3), "signature": {"keyId": 7}}
+    return session
+
+
+def test_read_preference_validation():
+    """Test mode parsing and MongoDB's minimum max staleness."""
+    preference = read_preference("secondaryPreferred", max_staleness_seconds=120)
+    assert isinstance(preference, SecondaryPreferred)
+    assert preference.max_staleness == 120
+    with pytest.raises(ValueError):
+        read_preference("secondaryPreferred", max_staleness_seconds=30)
+    with pytest.raises(ValueError):
+        read_preference("fastest")
+
+
+def test_causal_token_round_trip(session):
+    """Test that a token carries the session's operation and cluster time."""
+    times = decode_causal_token(encode_causal_token(session))
+    assert times == {"operationTime": session.operation_time, "clusterTime": session.cluster_time}
+    assert decode_causal_token("not a token") is None
+
+
+def test_no_token_without_cluster_time(session):
+    """Test that standalone servers, which report no cluster time, yield no token."""
+    session.cluster_time = None
+    assert encode_causal_token(session) is None
+
+
+def test_write_then_detail_read_uses_causal_session(session):
+    """Test that a write returns a token and a read carrying it is advanced to it."""
+    client = MagicMock()
+    client.start_session.return_value.__enter__.return_value = session
+    app = Flask(__name__)
+    router = ReadRouter(client, read_preference("secondaryPreferred"))
+    register_read_routing(app, router)
+
+    @app.post("/write")
+    def write():
+        with router.write_session():
+            return {}
+
+    @app.get("/read")
+    def read():
+        with router.read_session() as read_session:
+            return {"session": read_session is not None}
+
+    test_client = app.test_client()
+    token = test_client.post("/write").headers[CAUSAL_TOKEN_HEADER]
+
+    assert test_client.get("/read").json == {"session": False}
+    assert test_client.get("/read", headers={CAUSAL_TOKEN_HEADER: token}).json == {"session": True}
+    session.advance_cluster_time.assert_called_with(session.cluster_time)
+    session.advance_operation_time.assert_called_with(session.operation_time)
+
+
+def test_managers_route_list_reads_only(mocker):
+    """Test that list queries use the read preference and plain detail reads stay on the primary."""
+    collection = mocker.MagicMock()
+    preference = read_preference("secondaryPreferred")
+    manager = TripManager(db_collection=collection, read_preference=preference)
+    secondary = collection.with_options.return_value
+    secondary.find.return_value = []
+    collection.find_one.return_value = None
+
+    manager.get_all_trips()
+    manager.get_trip_by_id("trip1")
+
+    collection.with_options.assert_called_with(read_preference=preference)
+    secondary.find.assert_called_once()
+    collection.find.assert_not_called()
+    collection.find_one.assert_called_once()
+    assert for_reads(collection, None) is collection
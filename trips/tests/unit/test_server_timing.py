@@ -0,0 +1,58 @@
+import re
+
+from flask import Flask
+
+from shared.server_timing import DbTimingListener, phase, register_server_timing
+
+
+def parse(header: str) -> dict:
+    """Map Server-Timing metric names to their parameters."""
+    metrics = {}
+    for metric in header.split(", "):
+        name, *params = metric.split(";")
+        metrics[name] = dict(p.split("=", 1) for p in params)
+    return metrics
+
+
+def make_app(mocker):
+    """Build a minimal app with Server-Timing and a route simulating two MongoDB round trips."""
+    app = Flask(__name__)
+    register_server_timing(app, allow_origin="*")
+    listener = DbTimingListener()
+
+    @app.get("/trips")
+    def trips():
+        listener.succeeded(mocker.MagicMock(duration_micros=1500))
+        listener.failed(mocker.MagicMock(duration_micros=500))
+        with phase("hydrate"):
+            data = [{"trip_id": str(i)} for i in range(100)]
+        return data
+
+    return app
+
+
+def test_server_timing_header(mocker):
+    """Test that the header carries DB round trips, phases and the total."""
+    response = make_app(mocker).test_client().get("/trips")
+
+    metrics = parse(response.headers["Server-Timing"])
+    assert metrics["db"] == {"dur": "2.00", "desc": '"2 round trips"'}
+    assert set(metrics) == {"db", "hydrate", "serialize", "app", "total"}
+    assert all(re.fullmatch(r"\d+\.\d{2}", m["dur"]) for m in metrics.values())
+    assert response.headers["Timing-Allow-Origin"] == "*"
+
+
+def test_requests_are_recorded_separately(mocker):
+    """Test that a worker thread's next request starts with a fresh recorder."""
+    client = make_app(mocker).test_client()
+    client.get("/trips")
+
+    metrics = parse(client.get("/trips").headers["Server-Timing"])
+    assert metrics["db"]["desc"] == '"2 round trips"'
+
+
+def test_no_recording_outside_requests(mocker):
+    """Test that phases and DB events outside a request are ignored."""
+    with phase("hydrate"):
+        pass
+    DbTimingListener().succeeded(mocker.MagicMock(duration_micros=1000))
@@ -1,9 +1,11 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+from unittest.mock import ANY
 from pydantic import ValidationError
 import pytest
 
 from src.bll_models import Trip
-from src.trip_manager import TripManager
+from src.ids import id_timestamp
+from src.trip_manager import TripManager, NO_ID
 
 
 @pytest.fixture
@@ -55,8 +57,9 @@ def test_create_and_get_trip(trip_manager, mock_db_collection, valid_trip_data):
     retrieved_trip = trip_manager.get_trip_by_id(trip_id)
 
     mock_db_collection.insert_one.assert_called_once()
-    mock_db_collection.find_one.assert_called_with({"trip_id": trip_id})
+    mock_db_collection.find_one.assert_called_with({"trip_id": trip_id}, NO_ID, session=None)
 
+    assert id_timestamp(trip_id) is not None  # time-ordered UUIDv7
     assert retrieved_trip is not None
     assert retrieved_trip.trip_id == trip_id
     assert retrieved_trip.destination == "Lake Tahoe"
@@ -86,7 +89,7 @@ def test_delete_trip_integration(trip_manager, mock_db_collection):
     success = trip_manager.delete_trip(trip_id)
 
     assert success is True
-    mock_db_collection.delete_one.assert_called_with({"trip_id": trip_id})
+    mock_db_collection.delete_one.assert_called_with({"trip_id": trip_id}, session=None)
 
 
 def test_get_all_trips(trip_manager, mock_db_collection, valid_trip_data):
@@ -99,7 +102,8 @@ def test_get_all_trips(trip_manager, mock_db_collection, valid_trip_data):
 
     assert len(trips) == 1
     assert trips[0].trip_id == "trip1"
-    mock_db_collection.find.assert_called_with({})
+    # Only upcoming and ongoing trips are searched by default
+    mock_db_collection.find.assert_called_with({"return_datetime": {"$gte": ANY}}, NO_ID)
 
 
 def test_get_all_trips_with_filters(mocker, valid_trip_data):
@@ -108,27 +112,27 @@ def test_get_all_trips_with_filters(mocker, valid_trip_data):
     manager = TripManager(db_collection=mock_collection)
 
     # Test with pickup filter
-    manager.get_all_trips(pickup="San")
-    mock_collection.find.assert_called_with({"pickup_location": {"$regex": "San", "$options": "i"}})
+    manager.get_all_trips(pickup="San", include_past=True)
+    mock_collection.find.assert_called_with({"pickup_location": {"$regex": "San", "$options": "i"}}, NO_ID)
 
     # Test with destination filter
-    manager.get_all_trips(destination="Tahoe")
-    mock_collection.find.assert_called_with({"destination": {"$regex": "Tahoe", "$options": "i"}})
+    manager.get_all_trips(destination="Tahoe", include_past=True)
+    mock_collection.find.assert_called_with({"destination": {"$regex": "Tahoe", "$options": "i"}}, NO_ID)
 
     # Test with date filter
     trip_date = datetime(2025, 6, 1)
     day_start = datetime(2025, 6, 1, 0, 0, 0)
     day_end = day_start.replace(hour=23, minute=59, second=59, microsecond=999999)
-    manager.get_all_trips(trip_date=trip_date)
-    mock_collection.find.assert_called_with({"start_datetime": {"$gte": day_start, "$lte": day_end}})
+    manager.get_all_trips(trip_date=trip_date, include_past=True)
+    mock_collection.find.assert_called_with({"start_datetime": {"$gte": day_start, "$lte": day_end}}, NO_ID)
 
     # Test with all filters combined
-    manager.get_all_trips(pickup="SF", destination="LA", trip_date=trip_date)
+    manager.get_all_trips(pickup="SF", destination="LA", trip_date=trip_date, include_past=True)
     mock_collection.find.assert_called_with({
         "pickup_location": {"$regex": "SF", "$options": "i"},
         "destination": {"$regex": "LA", "$options": "i"},
         "start_datetime": {"$gte": day_start, "$lte": day_end},
-    })
+    }, NO_ID)
 
 
 def test_get_trip_by_id_not_found(trip_manager, mock_db_collection):
@@ -151,3 +155,228 @@ def test_delete_trip_not_found(trip_manager, mock_db_collection):
     result = trip_manager.delete_trip("nonexistent")
     assert result is False
 
+
+def test_create_trip_stores_pickup_point(trip_manager, mock_db_collection, valid_trip_data):
+    """Test that trips with coordinates are stored with a GeoJSON pickup point."""
+    trip = Trip(**valid_trip_data, pickup_lat=40.4168, pickup_lon=-3.7038)
+    trip_manager.create_trip(trip)
+
+    stored = mock_db_collection.insert_one.call_args[0][0]
+    assert stored["pickup_point"] == {"type": "Point", "coordinates": [-3.7038, 40.4168]}
+
+
+def test_create_trip_without_coordinates_has_no_pickup_point(trip_manager, mock_db_collection, valid_trip_data):
+    """Test that trips without coordinates are not added to the geo index."""
+    trip_manager.create_trip(Trip(**valid_trip_data))
+
+    stored = mock_db_collection.insert_one.call_args[0][0]
+    assert "pickup_point" not in stored
+
+
+def test_get_all_trips_near_uses_geo_near(trip_manager, mock_db_collection, valid_trip_data):
+    """Test that a radius search is answered by a $geoNear aggregation combined with other filters."""
+    trip_data_with_id = valid_trip_data.copy()
+    trip_data_with_id["trip_id"] = "trip1"
+    mock_db_collection.aggregate.return_value = [trip_data_with_id]
+
+    trips = trip_manager.get_all_trips(
+        destination="Tahoe", min_seats=2, near_lat=40.0, near_lon=-3.0, radius_km=5
+    )
+
+    assert [t.trip_id for t in trips] == ["trip1"]
+    mock_db_collection.find.assert_not_called()
+    pipeline = mock_db_collection.aggregate.call_args[0][0]
+    geo_near = pipeline[0]["$geoNear"]
+    assert geo_near["near"] == {"type": "Point", "coordinates": [-3.0, 40.0]}
+    assert geo_near["maxDistance"] == 5000
+    assert geo_near["query"]["destination"] == {"$regex": "Tahoe", "$options": "i"}
+    assert "$expr" in geo_near["query"]
+
+
+def test_get_all_trips_min_seats_filter(trip_manager, mock_db_collection):
+    """Test that min_seats compares free seats (capacity minus passengers)."""
+    trip_manager.get_all_trips(min_seats=2, include_past=True)
+    mock_db_collection.find.assert_called_with({
+        "$expr": {"$gte": [{"$subtract": ["$capacity", {"$size": "$passengers"}]}, 2]}
+    }, NO_ID)
+
+
+def test_search_trips_with_facets(trip_manager, mock_db_collection, valid_trip_data):
+    """Test that results, total and facet counts come from a single $facet aggregation."""
+    trip_data_with_id = valid_trip_data.copy()
+    trip_data_with_id["trip_id"] = "trip1"
+    mock_db_collection.aggregate.return_value = iter([{
+        "results": [trip_data_with_id],
+        "total": [{"count": 7}],
+        "destination": [{"_id": "Lake Tahoe", "count": 7}],
+        "day": [{"_id": "2025-06-01", "count": 7}],
+        "price": [{"_id": 25, "count": 6}, {"_id": 100, "count": 1}],
+    }])
+
+    result = trip_manager.search_trips(destination="Tahoe", limit=1, offset=2, facets=True)
+
+    mock_db_collection.aggregate.assert_called_once()
+    pipeline = mock_db_collection.aggregate.call_args[0][0]
+    assert pipeline[0]["$match"]["destination"] == {"$regex": "Tahoe", "$options": "i"}
+    assert "return_datetime" in pipeline[0]["$match"]
+    facet = pipeline[-1]["$facet"]
+    assert facet["results"][:2] == [{"$skip": 2}, {"$limit": 1}]
+    assert set(facet) == {"results", "total", "destination", "day", "price"}
+
+    assert [t.trip_id for t in result["results"]] == ["trip1"]
+    assert result["total"] == 7
+    assert result["facets"]["destination"] == [{"value": "Lake Tahoe", "count": 7}]
+    assert result["facets"]["price"] == [{"value": "25-50", "count": 6}, {"value": "100+", "count": 1}]
+
+
+def test_search_trips_without_facets_or_matches(trip_manager, mock_db_collection):
+    """Test that facet branches are skipped when not requested and empty results count as zero."""
+    mock_db_collection.aggregate.return_value = iter([{"results": [], "total": []}])
+
+    result = trip_manager.search_trips()
+
+    facet = mock_db_collection.aggregate.call_args[0][0][-1]["$facet"]
+    assert set(facet) == {"results", "total"}
+    assert result == {"results": [], "total": 0}
+
+
+def test_get_all_trips_include_past_reads_archive(mocker, valid_trip_data):
+    """Test that include_past drops the upcoming filter and also reads the archive collection."""
+    hot, archive = mocker.MagicMock(), mocker.MagicMock()
+    manager = TripManager(db_collection=hot, archive_collection=archive)
+    hot.find.return_value = [{**valid_trip_data, "trip_id": "trip1"}]
+    archive.find.return_value = [{**valid_trip_data, "trip_id": "old"}]
+
+    trips = manager.get_all_trips(include_past=True)
+
+    assert [t.trip_id for t in trips] == ["trip1", "old"]
+    hot.find.assert_called_with({}, NO_ID)
+    archive.find.assert_called_with({}, NO_ID)
+
+
+def test_get_trip_by_id_falls_back_to_archive(mocker, valid_trip_data):
+    """Test that trips moved to the archive can still be fetched by id."""
+    hot, archive = mocker.MagicMock(), mocker.MagicMock()
+    manager = TripManager(db_collection=hot, archive_collection=archive)
+    hot.find_one.return_value = None
+    archive.find_one.return_value = {**valid_trip_data, "trip_id": "old"}
+
+    trip = manager.get_trip_by_id("old")
+
+    assert trip.trip_id == "old"
+    archive.find_one.assert_called_with({"trip_id": "old"}, NO_ID)
+
+
+def test_seat_passenger_returns_updated_trip(trip_manager, mock_db_collection, valid_trip_data):
+    """Test that seating a passenger returns the trip as it is after the update."""
+    mock_db_collection.find_one_and_update.return_value = {
+        **valid_trip_data, "trip_id": "trip1", "passengers": ["pass1"]
+    }
+
+    trip = trip_manager.seat_passenger("trip1", "pass1")
+
+    assert trip.passengers == ["pass1"]
+    filter_ = mock_db_collection.find_one_and_update.call_args[0][0]
+    assert filter_["passengers"] == {"$ne": "pass1"}
+
+
+def test_seat_passenger_full_or_duplicate(trip_manager, mock_db_collection):
+    """Test that seating returns None when the conditional update matches nothing."""
+    mock_db_collection.find_one_and_update.return_value = None
+    assert trip_manager.seat_passenger("trip1", "pass1") is None
+
+
+def test_get_trips_by_ids_preserves_order_and_reports_missing(trip_manager, mock_db_collection, valid_trip_data):
+    """Test that a multi-get is one $in query returning trips in request order."""
+    mock_db_collection.find.return_value = [
+        {**valid_trip_data, "trip_id": "trip2"},
+        {**valid_trip_data, "trip_id": "trip1"},
+    ]
+
+    trips, missing = trip_manager.get_trips_by_ids(["trip1", "nope", "trip2", "trip1"])
+
+    assert [t.trip_id for t in trips] == ["trip1", "trip2"]
+    assert missing == ["nope"]
+    mock_db_collection.find.assert_called_once_with({"trip_id": {"$in": ["trip1", "nope", "trip2"]}}, NO_ID)
+
+
+def test_get_all_trips_itinerary_filters_and_pagination(trip_manager, mock_db_collection, valid_trip_data):
+    """Test driver/passenger filters and that pagination sorts, skips and limits the cursor."""
+    cursor = mock_db_collection.find.return_value
+    cursor.sort.return_value.skip.return_value.limit.return_value = [{**valid_trip_data, "trip_id": "trip1"}]
+
+    trips = trip_manager.get_all_trips(driver_id="driver123", passenger_id="pass1", limit=10, offset=20)
+
+    assert [t.trip_id for t in trips] == ["trip1"]
+    mock_db_collection.find.assert_called_with(
+        {"return_datetime": {"$gte": ANY}, "driver_id": "driver123", "passengers": "pass1"}, NO_ID
+    )
+    cursor.sort.assert_called_with([("start_datetime", 1), ("trip_id", 1)])
+    cursor.sort.return_value.skip.assert_called_with(20)
+    cursor.sort.return_value.skip.return_value.limit.assert_called_with(10)
+
+
+def test_get_all_trips_paginates_across_archive(mocker, valid_trip_data):
+    """Test that with the archive both collections are merged before the page is cut."""
+    hot, archive = mocker.MagicMock(), mocker.MagicMock()
+    hot.find.return_value.sort.return_value.skip.return_value.limit.return_value = [
+        {**valid_trip_data, "trip_id": "late", "start_datetime": datetime(2025, 7, 1)},
+    ]
+    archive.find.return_value.sort.return_value.skip.return_value.limit.return_value = [
+        {**valid_trip_data, "trip_id": "early", "start_datetime": datetime(2024, 1, 1)},
+        {**valid_trip_data, "trip_id": "mid", "start_datetime": datetime(2025, 1, 1)},
+    ]
+    manager = TripManager(db_collection=hot, archive_collection=archive)
+
+    trips = manager.get_all_trips(passenger_id="pass1", include_past=True, limit=2, offset=1)
+
+    assert [t.trip_id for t in trips] == ["mid", "late"]
+    hot.find.return_value.sort.return_value.skip.assert_called_with(0)
+    hot.find.return_value.sort.return_value.skip.return_value.limit.assert_called_with(3)
+
+
+class FakeCursor:
+    """Just enough of a pymongo cursor over an in-memory list for candidate queries."""
+
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, keys):
+        (field, direction), = keys
+        return FakeCursor(sorted(self.docs, key=lambda d: d[field], reverse=direction < 0))
+
+    def limit(self, n):
+        return self.docs[:n]
+
+
+def in_range(value, bounds):
+    """Evaluate a `$gte`/`$gt`/`$lte`/`$lt` condition."""
+    return (
+        ("$gte" not in bounds or value >= bounds["$gte"]) and ("$gt" not in bounds or value > bounds["$gt"])
+        and ("$lte" not in bounds or value <= bounds["$lte"]) and ("$lt" not in bounds or value < bounds["$lt"])
+    )
+
+
+def test_get_candidate_trips_prefers_the_window(trip_manager, mock_db_collection, valid_trip_data):
+    """Test that trips in the slack before the window cannot crowd out trips inside it."""
+    window_start, window_end = datetime(2025, 6, 3), datetime(2025, 6, 4)
+    before = [{**valid_trip_data, "trip_id": f"b{i}", "start_datetime": window_start - timedelta(minutes=10 + i)}
+              for i in range(10)]
+    inside = [{**valid_trip_data, "trip_id": f"i{i}", "start_datetime": window_start + timedelta(hours=i)}
+              for i in range(3)]
+    after = [{**valid_trip_data, "trip_id": "a0", "start_datetime": window_end + timedelta(minutes=5)}]
+    trips = before + inside + after
+    mock_db_collection.find.side_effect = lambda query, projection: FakeCursor(
+        [t for t in trips if in_range(t["start_datetime"], query["start_datetime"])]
+    )
+
+    candidates = trip_manager.get_candidate_trips(
+        "lake  tahoe", window_start, window_end, passenger_id="passenger1", limit=6
+    )
+
+    assert [t["trip_id"] for t in candidates] == ["i0", "i1", "i2", "a0", "b0", "b1"]
+    query = mock_db_collection.find.call_args[0][0]
+    assert query["destination"] == {"$regex": r"\b(lake|tahoe)\b", "$options": "i"}
+    assert query["$expr"] == {"$lt": [{"$size": "$passengers"}, "$capacity"]}
+    assert query["driver_id"] == {"$ne": "passenger1"}
+    assert query["passengers"] == {"$ne": "passenger1"}
@@ -1,7 +1,8 @@
 import pytest
+from unittest.mock import ANY
 from datetime import datetime, timedelta, UTC
 from src.bll_models import TripRequest, TripRequestStatus
-from src.trip_request_manager import TripRequestManager
+from src.trip_request_manager import TripRequestManager, NO_ID
 
 @pytest.fixture
 def valid_trip_request_data():
@@ -24,6 +25,11 @@ def trip_request_manager(mock_db_collection):
     """Fixture for a TripRequestManager with a mocked DB collection."""
     return TripRequestManager(db_collection=mock_db_collection)
 
+
+def test_only_the_unique_index_is_built_at_startup(trip_request_manager, mock_db_collection):
+    """Test that secondary indexes are left to migrations."""
+    mock_db_collection.create_index.assert_called_once_with("request_id", unique=True)
+
 def test_create_and_get_trip_request(trip_request_manager, mock_db_collection, valid_trip_request_data):
     """Test creating a trip request and then retrieving it."""
     trip_request = TripRequest(**valid_trip_request_data)
@@ -37,7 +43,7 @@ def test_create_and_get_trip_request(trip_request_manager, mock_db_collection, v
     retrieved_request = trip_request_manager.get_trip_request_by_id(request_id)
 
     mock_db_collection.insert_one.assert_called_once()
-    mock_db_collection.find_one.assert_called_with({"request_id": request_id})
+    mock_db_collection.find_one.assert_called_with({"request_id": request_id}, NO_ID, session=None)
     
     assert retrieved_request is not None
     assert retrieved_request.request_id == request_id
@@ -53,12 +59,13 @@ def test_get_all_trip_requests(trip_request_manager, mock_db_collection, valid_t
 
     assert len(requests) == 1
     assert requests[0].request_id == "req1"
-    mock_db_collection.find.assert_called_with({})
+    # Only requests whose start window has not passed are returned by default
+    mock_db_collection.find.assert_called_with({"latest_start_date": {"$gte": ANY}}, NO_ID)
 
 def test_get_all_trip_requests_with_filter(trip_request_manager, mock_db_collection):
     """Test retrieving trip requests with a destination filter."""
-    trip_request_manager.get_all_trip_requests(destination="Disney")
-    mock_db_collection.find.assert_called_with({"destination": {"$regex": "Disney", "$options": "i"}})
+    trip_request_manager.get_all_trip_requests(destination="Disney", include_past=True)
+    mock_db_collection.find.assert_called_with({"destination": {"$regex": "Disney", "$options": "i"}}, NO_ID)
 
 def test_update_trip_request(trip_request_manager, mock_db_collection):
     """Test updating a trip request."""
@@ -89,3 +96,101 @@ def test_update_trip_request_not_found(trip_request_manager, mock_db_collection)
     mock_db_collection.update_one.return_value.modified_count = 0
     result = trip_request_manager.update_trip_request("nonexistent", "trip1", TripRequestStatus.ACCEPTED)
     assert result is False
+
+
+def test_create_trip_request_write_behind(mocker, mock_db_collection, valid_trip_request_data):
+    """Test that write-behind mode buffers the request and serves it back by id."""
+    write_behind = mocker.MagicMock()
+    manager = TripRequestManager(db_collection=mock_db_collection, write_behind=write_behind)
+
+    request_id = manager.create_trip_request(TripRequest(**valid_trip_request_data))
+
+    mock_db_collection.insert_one.assert_not_called()
+    buffered = write_behind.put.call_args[0][0]
+    assert buffered["request_id"] == request_id
+
+    write_behind.get.return_value = buffered
+    assert manager.get_trip_request_by_id(request_id).request_id == request_id
+    mock_db_collection.find_one.assert_not_called()
+
+
+def test_accepting_a_buffered_request_flushes_it_first(mocker, mock_db_collection, valid_trip_request_data):
+    """Test that a request still held by write-behind is stored before it is accepted."""
+    calls = mocker.MagicMock()
+    write_behind = calls.write_behind
+    write_behind.get.side_effect = lambda request_id: {"request_id": "req1"} if request_id == "req1" else None
+    mock_db_collection.find_one_and_update.side_effect = calls.find_one_and_update
+    calls.find_one_and_update.return_value = {**valid_trip_request_data, "request_id": "req1", "status": "accepted"}
+    manager = TripRequestManager(db_collection=mock_db_collection, write_behind=write_behind)
+
+    assert manager.accept_trip_request("req1", "trip1").request_id == "req1"
+    writes = ("write_behind.flush", "find_one_and_update")
+    assert [c[0] for c in calls.mock_calls if c[0] in writes] == list(writes)
+
+    write_behind.flush.reset_mock()
+    manager.accept_trip_request("req2", "trip1")
+    write_behind.flush.assert_not_called()
+
+
+def test_get_trip_requests_by_ids_only_queries_misses(mocker, mock_db_collection, valid_trip_request_data):
+    """Test that buffered requests are served from memory and only the rest hits the database."""
+    write_behind = mocker.MagicMock()
+    write_behind.get.side_effect = lambda request_id: (
+        {**valid_trip_request_data, "request_id": "req1"} if request_id == "req1" else None
+    )
+    mock_db_collection.find.return_value = [{**valid_trip_request_data, "request_id": "req2"}]
+    manager = TripRequestManager(db_collection=mock_db_collection, write_behind=write_behind)
+
+    trip_requests, missing = manager.get_trip_requests_by_ids(["req2", "req1", "req3"])
+
+    assert [r.request_id for r in trip_requests] == ["req2", "req1"]
+    assert missing == ["req3"]
+    mock_db_collection.find.assert_called_once_with({"request_id": {"$in": ["req2", "req3"]}}, NO_ID)
+
+
+def test_get_all_trip_requests_by_passenger_and_status(trip_request_manager, mock_db_collection, valid_trip_request_data):
+    """Test the passenger/status filters and paginated cursor."""
+    cursor = mock_db_collection.find.return_value
+    cursor.sort.return_value.skip.return_value.limit.return_value = [{**valid_trip_request_data, "request_id": "req1"}]
+
+    requests = trip_request_manager.get_all_trip_requests(
+        passenger_id="pass123", status=TripRequestStatus.PENDING, limit=5, offset=5
+    )
+
+    assert [r.request_id for r in requests] == ["req1"]
+    mock_db_collection.find.assert_called_with(
+        {"latest_start_date": {"$gte": ANY}, "passenger_id": "pass123", "status": "pending"}, NO_ID
+    )
+    cursor.sort.assert_called_with([("earliest_start_date", 1), ("request_id", 1)])
+    cursor.sort.return_value.skip.assert_called_with(5)
+    cursor.sort.return_value.skip.return_value.limit.assert_called_with(5)
+
+
+def test_create_trip_request_stores_destination_key(trip_request_manager, mock_db_collection, valid_trip_request_data):
+    """Test that the normalized destination is stored for indexed exact matching."""
+    trip_request = TripRequest(**{**valid_trip_request_data, "destination": "  Lake   TAHOE "})
+    trip_request_manager.create_trip_request(trip_request)
+
+    stored = mock_db_collection.insert_one.call_args[0][0]
+    assert stored["destination_key"] == "lake tahoe"
+
+
+def test_get_all_trip_requests_window_overlap(trip_request_manager, mock_db_collection):
+    """Test the status/destination/window query used by the driver search."""
+    window_start = datetime.now(UTC) + timedelta(days=5)
+    window_end = window_start + timedelta(days=2)
+
+    trip_request_manager.get_all_trip_requests(
+        status=TripRequestStatus.PENDING,
+        destination_exact="Lake Tahoe",
+        window_start=window_start,
+        window_end=window_end,
+    )
+
+    mock_db_collection.find.assert_called_with({
+        "status": "pending",
+        "destination_key": "lake tahoe",
+        "earliest_start_date": {"$lte": window_end},
+        # The later of window_start and now bounds the end of the start window
+        "latest_start_date": {"$gte": window_start},
+    }, NO_ID)
@@ -0,0 +1,124 @@
+import atexit
+import os
+import threading
+import time
+
+import pytest
+
+from src.write_behind import WriteBehindBuffer, BufferFullError
+
+
+@pytest.fixture
+def mock_db_collection(mocker):
+    """Fixture for a mocked MongoDB collection."""
+    return mocker.MagicMock()
+
+
+@pytest.fixture
+def make_buffer(tmp_path, mock_db_collection):
+    """Fixture building buffers that only flush when asked to."""
+    buffers = []
+
+    def make(collection=mock_db_collection, **kwargs):
+        kwargs.setdefault("flush_interval", 60)
+        buffer = WriteBehindBuffer(collection, str(tmp_path / "journal"), "request_id", **kwargs)
+        buffers.append(buffer)
+        return buffer
+
+    yield make
+    for buffer in buffers:
+        atexit.unregister(buffer.close)
+
+
+def test_put_is_readable_before_flush(make_buffer, mock_db_collection):
+    """Test read-your-writes for documents that have not been flushed yet."""
+    buffer = make_buffer()
+    buffer.put({"request_id": "req1", "destination": "Disneyland"})
+
+    assert buffer.get("req1") == {"request_id": "req1", "destination": "Disneyland"}
+    mock_db_collection.insert_many.assert_not_called()
+
+
+def test_flush_inserts_in_batches_and_clears_journal(make_buffer, mock_db_collection, tmp_path):
+    """Test that a flush writes buffered documents with insert_many and drops their journal."""
+    buffer = make_buffer(max_batch=2)
+    for i in range(3):
+        buffer.put({"request_id": f"req{i}"})
+
+    buffer.flush()  # the background thread may already have flushed the first full batch
+
+    inserted = [c[0][0] for c in mock_db_collection.insert_many.call_args_list]
+    assert sorted(len(docs) for docs in inserted) == [1, 2]
+    assert buffer.get("req0") is None
+    remaining = [p for p in os.listdir(tmp_path / "journal")]
+    assert len(remaining) == 1  # only the fresh, empty segment
+    assert os.path.getsize(tmp_path / "journal" / remaining[0]) == 0
+
+
+def test_failed_flush_keeps_documents(make_buffer, mock_db_collection):
+    """Test that documents stay buffered and journaled when the insert fails."""
+    buffer = make_buffer()
+    buffer.put({"request_id": "req1"})
+    mock_db_collection.insert_many.side_effect = RuntimeError("db down")
+
+    with pytest.raises(RuntimeError):
+        buffer.flush()
+
+    assert buffer.get("req1") == {"request_id": "req1"}
+
+
+def test_on_flush_runs_after_insert_and_is_retried(make_buffer, mock_db_collection, mocker):
+    """Test that the flush hook sees stored batches, and a failing hook keeps the batch buffered."""
+    on_flush = mocker.Mock(side_effect=[RuntimeError("index down"), None])
+    buffer = make_buffer(on_flush=on_flush)
+    buffer.put({"request_id": "req1"})
+
+    with pytest.raises(RuntimeError):
+        buffer.flush()
+    assert buffer.get("req1") == {"request_id": "req1"}
+
+    assert buffer.flush() == 1
+    assert mock_db_collection.insert_many.call_count == 2
+    on_flush.assert_called_with([{"request_id": "req1"}])
+    assert buffer.get("req1") is None
+
+
+def test_full_buffer_applies_backpressure(make_buffer):
+    """Test that put raises once the buffer stays full past the put timeout."""
+    buffer = make_buffer(max_buffer=1, put_timeout=0.01)
+    buffer.put({"request_id": "req1"})
+
+    with pytest.raises(BufferFullError):
+        buffer.put({"request_id": "req2"})
+
+
+def test_journal_of_crashed_process_is_replayed(make_buffer, mocker):
+    """Test that acknowledged documents survive a crash before they were flushed."""
+    crashed = make_buffer()
+    crashed.put({"request_id": "req1"})
+    # Simulate the crash: the process dies and its journal locks are released
+    for _, journal in crashed._segments:
+        journal.close()
+
+    recovered_collection = mocker.MagicMock()
+    recovered = make_buffer(collection=recovered_collection)
+
+    assert recovered.get("req1") == {"request_id": "req1"}
+    recovered.flush()
+    recovered_collection.insert_many.assert_called_once_with([{"request_id": "req1"}], ordered=False)
+
+
+def test_concurrent_puts_share_fsyncs(make_buffer, mocker):
+    """Test group commit: puts waiting for a slow fsync are covered by one fsync together."""
+    fsync = mocker.patch("src.write_behind.os.fsync", side_effect=lambda fd: time.sleep(0.02))
+    buffer = make_buffer()
+    threads = [
+        threading.Thread(target=buffer.put, args=({"request_id": f"req{i}"},)) for i in range(20)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(buffer.get(f"req{i}") for i in range(20))
+    assert fsync.call_count < 20